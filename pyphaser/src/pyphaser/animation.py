@@ -0,0 +1,77 @@
+import numpy as np
+
+from pyphaser.assets import DUDE_CLIPS
+
+
+class AnimationSet:
+    # The clips of one spritesheet, built once and shared by every sprite
+    # drawn from it. A clip is a run of frame indices into the sheet's frame
+    # list, played at a fixed rate, looping unless told otherwise. Clips are
+    # referred to by id (position in `names`, see `ids`), so frame lookups
+    # for many sprites are array operations.
+    def __init__(self, clips):
+        self.names = list(clips)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        frames = [tuple(clip[0]) for clip in clips.values()]
+        lengths = [len(clip) for clip in frames]
+        self.frames = np.array([i for clip in frames for i in clip], dtype=np.intp)
+        self.starts = np.cumsum([0] + lengths[:-1]).astype(np.intp)
+        self.lengths = np.array(lengths, dtype=np.intp)
+        self.fps = np.array([clip[1] for clip in clips.values()], dtype=np.float64)
+        self.loop = np.array([clip[2] if len(clip) > 2 else True for clip in clips.values()])
+
+    def frame_at(self, clip, time):
+        # Sheet frame index of each clip id at each clip-local time in seconds
+        step = (time * self.fps[clip]).astype(np.intp)
+        length = self.lengths[clip]
+        step = np.where(self.loop[clip], step % length, np.minimum(step, length - 1))
+        return self.frames[self.starts[clip] + step]
+
+
+DUDE = AnimationSet(DUDE_CLIPS)
+
+
+class Animator:
+    # Playback state of many sprites sharing one AnimationSet, one row per
+    # sprite: the clip id, the time into it and the current sheet frame.
+    # update(dt) advances every row at once and reports which rows changed
+    # frame, so a front-end only touches sprites whose image changed.
+    def __init__(self, animations, count=0):
+        self.animations = animations
+        self.clip = np.zeros(count, dtype=np.intp)
+        self.time = np.zeros(count)
+        self.frame = animations.frame_at(self.clip, self.time)
+
+    def __len__(self):
+        return len(self.clip)
+
+    def resize(self, count):
+        # New rows start at the beginning of clip 0
+        extra = count - len(self.clip)
+        if extra <= 0:
+            self.clip = self.clip[:count]
+            self.time = self.time[:count]
+            self.frame = self.frame[:count]
+            return
+        clip = np.zeros(extra, dtype=np.intp)
+        time = np.zeros(extra)
+        self.clip = np.concatenate([self.clip, clip])
+        self.time = np.concatenate([self.time, time])
+        self.frame = np.concatenate([self.frame, self.animations.frame_at(clip, time)])
+
+    def play(self, clip, rows=slice(None)):
+        # Switch rows to clip (one id, or one per row). Rows that change clip
+        # start it from the beginning; the others keep playing.
+        rows = np.arange(len(self.clip))[rows]
+        clip = np.broadcast_to(clip, rows.shape)
+        switched = self.clip[rows] != clip
+        rows = rows[switched]
+        self.clip[rows] = clip[switched]
+        self.time[rows] = 0.0
+
+    def update(self, dt):
+        self.time += dt
+        frame = self.animations.frame_at(self.clip, self.time)
+        changed = frame != self.frame
+        self.frame = frame
+        return changed
@@ -1,287 +1,364 @@
-from pathlib import Path
-import random
+import argparse
 import arcade
+import random
+import sys
+
+import numpy as np
+from arcade.gl import BufferDescription
+
+from pyphaser import savestate, world
+from pyphaser.animation import DUDE, Animator
+from pyphaser.capture import FrameCapture
+from pyphaser.assets import DUDE_FRAME_COUNT, DUDE_FRAME_SIZE
+from pyphaser.camera import Camera, PlatformStream, background_tiles
+from pyphaser.level import load as load_level
+from pyphaser.arcade import assets
+from pyphaser.particles import Effects
+from pyphaser.profiling import FrameProfiler
+from pyphaser.replay import Recording
+from pyphaser.timestep import FixedStep
 
 # -------------------- Settings --------------------
-SCREEN_WIDTH = 800
-SCREEN_HEIGHT = 600
+SCREEN_WIDTH = world.WIDTH
+SCREEN_HEIGHT = world.HEIGHT
 SCREEN_TITLE = "PyPhaser"
-ASSETS = Path("src/pyphaser/resources")
-GRAVITY = 1.2
-PLAYER_MOVE_SPEED = 5.0
-PLAYER_JUMP_SPEED = 26.0
-STAR_COUNT = 12
-STAR_STEP_X = 70
-STAR_START_X = 12
-STAR_GRAVITY = 0.6
-STAR_BOUNCE_MIN = 0.40
-STAR_BOUNCE_MAX = 0.80
-BOMB_MIN_SPEED_X = 3.0
-BOMB_MAX_SPEED_X = 4.5
-BOMB_GRAVITY = 0.9
-BOMB_BOUNCE = 0.95
-
-
-def slice_sheet_safe(sheet_path: Path, fw: int, fh: int, count: int):
-    try:
-        sheet = arcade.load_spritesheet(str(sheet_path))
-        frames = sheet.get_texture_grid(size=(fw, fh), columns=count, count=count)
-        if frames and len(frames) >= count:
-            return frames
-    except Exception:
-        pass
-
-    # 2) load_textures with rectangles
-    try:
-        rects = [(i * fw, 0, fw, fh) for i in range(count)]
-        frames = arcade.load_textures(str(sheet_path), rects)
-        if frames and len(frames) >= count:
-            return frames
-    except Exception:
-        pass
-
-    # 3) Last resort
-    base = arcade.load_texture(str(sheet_path))
-    return [base for _ in range(count)]
+OVERLAY_REFRESH = 15  # frames between profiler overlay refreshes
+FPS = 60  # update/draw rate; the simulation always steps at world.DT
+PARTICLE_DOT = 3  # particle size in pixels
+
+# Particles are points in world space; the fragment shader rounds them off
+# and fades them out
+PARTICLE_VERTEX_SHADER = """
+#version 330
+
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+
+uniform float height;
+
+in vec2 in_pos;
+in float in_fade;
+
+out float v_fade;
+
+void main() {
+    // World space is y-down from the top-left, arcade is y-up
+    gl_Position = window.projection * window.view * vec4(in_pos.x, height - in_pos.y, 0.0, 1.0);
+    v_fade = in_fade;
+}
+"""
+PARTICLE_FRAGMENT_SHADER = """
+#version 330
+
+uniform vec3 color;
+
+in float v_fade;
+
+out vec4 out_color;
+
+void main() {
+    float edge = length(gl_PointCoord - 0.5) * 2.0;
+    out_color = vec4(color, v_fade * (1.0 - smoothstep(0.5, 1.0, edge)));
+}
+"""
+
+
+def place(sprite: arcade.Sprite, body: world.Body, alpha=1.0):
+    # World space is y-down from the top-left, arcade is y-up from the bottom-left
+    x, y = (body.x, body.y) if alpha >= 1.0 else body.lerp(alpha)
+    sprite.center_x = x + body.w / 2
+    sprite.center_y = SCREEN_HEIGHT - (y + body.h / 2)
+
+
+class SpritePool:
+    # Sprites for one entity store. Sprite i shows live row i; sprites past
+    # the live count are hidden rather than removed, so spawning never
+    # allocates a sprite or resizes the SpriteList buffers below the peak count
+    def __init__(self, texture_name):
+        self.texture_name = texture_name
+        self.sprites = arcade.SpriteList()
+        self.active = 0
+
+    def sync(self, store, alpha=1.0):
+        count = store.count
+        sprites = self.sprites
+        while len(sprites) < count:
+            sprite = arcade.Sprite(assets.texture(self.texture_name))
+            sprite.visible = False
+            sprites.append(sprite)
+        for sprite in sprites[count:self.active]:
+            sprite.visible = False
+        half_w = store.w / 2
+        half_h = store.h / 2
+        x, y = (store.x, store.y) if alpha >= 1.0 else store.lerp(alpha)
+        for sprite, x, y in zip(sprites, x.tolist(), y.tolist()):
+            sprite.center_x = x + half_w
+            sprite.center_y = SCREEN_HEIGHT - (y + half_h)
+            if not sprite.visible:
+                sprite.visible = True
+        self.active = count
+
+
+class ParticleBatch:
+    # One emitter drawn with a single draw call. An arcade.Sprite per
+    # particle would cost a Python attribute write per particle per frame;
+    # instead the live rows are copied into one vertex buffer and drawn as
+    # points by a small shader.
+    def __init__(self, ctx, emitter):
+        self.ctx = ctx
+        self.emitter = emitter
+        self.program = ctx.program(vertex_shader=PARTICLE_VERTEX_SHADER, fragment_shader=PARTICLE_FRAGMENT_SHADER)
+        self.program["height"] = SCREEN_HEIGHT
+        self.program["color"] = tuple(channel / 255 for channel in emitter.color)
+        # x, y, fade per particle, interleaved
+        self.vertices = np.zeros((emitter.capacity, 3), dtype=np.float32)
+        self.buffer = ctx.buffer(reserve=self.vertices.nbytes)
+        self.geometry = ctx.geometry([BufferDescription(self.buffer, "2f 1f", ["in_pos", "in_fade"])],
+                                     mode=ctx.POINTS)
+
+    def draw(self):
+        emitter = self.emitter
+        count = emitter.count
+        if not count:
+            return
+        if len(self.vertices) < count:
+            self.vertices = np.zeros((emitter.capacity, 3), dtype=np.float32)
+            self.buffer.orphan(self.vertices.nbytes)
+        vertices = self.vertices[:count]
+        vertices[:, 0] = emitter.x
+        vertices[:, 1] = emitter.y
+        vertices[:, 2] = emitter.fade()
+        self.buffer.write(vertices)
+        ctx = self.ctx
+        ctx.point_size = PARTICLE_DOT
+        # SpriteLists switch blending off again after drawing
+        with ctx.enabled(ctx.BLEND):
+            ctx.blend_func = ctx.BLEND_DEFAULT
+            self.geometry.render(self.program, vertices=count)
 
 
 class Game(arcade.Window):
-    def __init__(self):
-        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, update_rate=1/60)
+    def __init__(self, level=None, seed=None, fps=FPS):
+        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, update_rate=1 / fps, draw_rate=1 / fps)
         arcade.set_background_color(arcade.color.WHITE)
 
+        # Simulation
+        # Every session gets a concrete seed so its input log can be replayed
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        level = level or load_level()
+        self.world = world.World(seed=seed, level=level)
+        self.recording = Recording(seed, level.name)
+        self.stepper = FixedStep()
+        # Particle bursts for world events, one ParticleBatch per emitter
+        self.effects = Effects()
+        self.particles = []
+        # The level scrolls under world_camera; the sky and the HUD are
+        # drawn through the fixed screen_camera
+        self.camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, self.world.width, self.world.height)
+        self.world_camera = arcade.Camera2D()
+        self.screen_camera = arcade.Camera2D()
+        self.platform_stream = None
+        self.profiler = FrameProfiler()
+        self.world.profiler = self.profiler
+        # HUD text objects keep their glyph geometry between frames (pyglet
+        # caches the glyphs in a texture); they are only re-laid out when the
+        # shown value changes
+        self.score_text = arcade.Text("Score: 0", 16, SCREEN_HEIGHT - 48, arcade.color.BLACK, 28)
+        self.shown_score = 0
+        self.game_over_text = arcade.Text("GAME OVER", SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2, arcade.color.RED, 48,
+                                          anchor_x="center", anchor_y="center")
+        self.profile_text = None  # laid out on first use, most sessions never show it
+        self.frames_drawn = 0
+        self.quit_after = None  # frame count, for smoke tests and startup timing
+        self.capture = None  # a FrameCapture fed every drawn frame
+
         # SpriteLists
         self.bg_list: arcade.SpriteList | None = None
         self.platforms: arcade.SpriteList | None = None
-        self.stars: arcade.SpriteList | None = None
-        self.bombs: arcade.SpriteList | None = None
+        self.stars: SpritePool | None = None
+        self.bombs: SpritePool | None = None
         self.player_list: arcade.SpriteList | None = None
 
-        # Player + physics
+        # Player
         self.player: arcade.Sprite | None = None
-        self.physics: arcade.PhysicsEnginePlatformer | None = None
 
-        # Anim
-        self.walk_left_frames = []
-        self.walk_right_frames = []
+        # Anim: the dude frames are shared through the asset cache, the
+        # animator holds the player's playback state
+        self.dude_frames = []
         self.turn_frame = None
-        self.anim_timer = 0.0
-        self.anim_rate = 0.1
-        self.walk_idx = 0
+        self.animation = Animator(DUDE, 1)
+
+        # Save states, loaded into the live world in place: the start of the
+        # round for restarts, one quick-save slot (F5/F9) and the last steps
+        # for rewinding (hold BACKSPACE)
+        self.start_state = None
+        self.quick_save = None
+        self.rewind = savestate.Rewind()
 
         # Input
         self.left = False
         self.right = False
         self.up = False
-
-        # Game state
-        self.score = 0
-        self.game_over = False
+        self.rewinding = False
 
     # -------------------- Setup --------------------
     def setup(self):
+        # Level geometry, textures and the start state are made once; a
+        # restart loads the start state and syncs the dynamic sprites
+        if self.platforms is None:
+            self.build_level()
+            self.start_state = savestate.save(self.world, self.animation)
+        else:
+            savestate.load(self.world, self.start_state, self.animation)
+        self.recording.clear()
+        self.rewind.clear()
+        self.stepper.reset()
+        self.effects.clear()
+        self.stars.sync(self.world.stars)
+        self.bombs.sync(self.world.bombs)
+        self.player.texture = self.turn_frame
+        place(self.player, self.world.player)
+        self.follow_player()
+
+    def follow_player(self, alpha=1.0):
+        body = self.world.player
+        x, y = (body.x, body.y) if alpha >= 1.0 else body.lerp(alpha)
+        camera = self.camera
+        camera.follow(x + body.w / 2, y + body.h / 2)
+        ox, oy = camera.offset
+        self.world_camera.position = (ox + SCREEN_WIDTH / 2, SCREEN_HEIGHT - (oy + SCREEN_HEIGHT / 2))
+        self.platform_stream.update(camera)
+        tiles = background_tiles(int(self.bg_list[0].width), ox, SCREEN_WIDTH)
+        for i, tile in enumerate(self.bg_list):
+            tile.visible = i < len(tiles)
+            if tile.visible:
+                tile.left = tiles[i]
+
+    def add_platform(self, x, y, w, h):
+        platform = arcade.Sprite(assets.texture("platform.png"))
+        platform.width = w
+        platform.height = h
+        platform.center_x = x + w / 2
+        platform.center_y = SCREEN_HEIGHT - (y + h / 2)
+        self.platforms.append(platform)
+        return platform
+
+    def build_level(self):
         self.bg_list = arcade.SpriteList()
         self.platforms = arcade.SpriteList(use_spatial_hash=True)
-        self.stars = arcade.SpriteList()
-        self.bombs = arcade.SpriteList()
         self.player_list = arcade.SpriteList()
-        self.score = 0
-        self.game_over = False
-
-        # Background
-        sky = arcade.Sprite(str(ASSETS / "sky.png"))
-        sky.center_x = SCREEN_WIDTH // 2
-        sky.center_y = SCREEN_HEIGHT // 2
-        self.bg_list.append(sky)
-
-        # Platforms (ground + ledges)
-        ground = arcade.Sprite(str(ASSETS / "platform.png"), scale=2.0)
-        # ground.center_x = 400
-        ground.center_x = SCREEN_WIDTH // 2
-        # ground.center_y = 568
-        ground.center_y = 16
-        self.platforms.append(ground)
-
-        ledge1 = arcade.Sprite(str(ASSETS / "platform.png"))
-        ledge1.center_x = 600
-        ledge1.center_y = 400
-        self.platforms.append(ledge1)
-
-        ledge2 = arcade.Sprite(str(ASSETS / "platform.png"))
-        ledge2.center_x = 50
-        ledge2.center_y = 250
-        self.platforms.append(ledge2)
-
-        ledge3 = arcade.Sprite(str(ASSETS / "platform.png"))
-        ledge3.center_x = 750
-        ledge3.center_y = 220
-        self.platforms.append(ledge3)
+        self.stars = SpritePool("star.png")
+        self.bombs = SpritePool("bomb.png")
+        self.particles = [ParticleBatch(self.ctx, emitter) for emitter in self.effects.emitters.values()]
+
+        # Background: enough copies of the sky side by side to cover the
+        # screen at any parallax offset, placed by follow_player()
+        sky = assets.texture("sky.png")
+        for _ in range(SCREEN_WIDTH // sky.width + 2):
+            tile = arcade.Sprite(sky)
+            tile.center_y = SCREEN_HEIGHT // 2
+            self.bg_list.append(tile)
+
+        # Platforms (ground + ledges) get sprites while they are near the view
+        self.platform_stream = PlatformStream(self.world, self.add_platform,
+                                              arcade.Sprite.remove_from_sprite_lists)
 
         # Player + animations (Phaser: 0..3 left, 4 idle, 5..8 right)
-        frames = slice_sheet_safe(ASSETS / "dude.png", 32, 48, 9)
-        self.walk_left_frames = frames[0:4]
-        self.turn_frame = frames[4]
-        self.walk_right_frames = frames[5:9]
+        self.dude_frames = assets.frames("dude.png", *DUDE_FRAME_SIZE, DUDE_FRAME_COUNT)
+        self.turn_frame = self.dude_frames[DUDE.frame_at(DUDE.ids["idle"], 0.0)]
 
         # IMPORTANT for 3.3.2: construct Sprite empty, then set texture (avoid texture kwarg bug)
         self.player = arcade.Sprite()
         self.player.texture = self.turn_frame
-        self.player.scale = 1.5
-        self.player.center_x = 100
-        self.player.center_y = 450
         self.player_list.append(self.player)
 
-        # Platformer physics
-        self.physics = arcade.PhysicsEnginePlatformer(
-            self.player,
-            walls=self.platforms,
-            gravity_constant=GRAVITY
-        )
-
-        # Stars
-        self.spawn_star_batch()
-
-    def spawn_star_batch(self):
-        for i in range(STAR_COUNT):
-            x = STAR_START_X + i * STAR_STEP_X
-            star = arcade.Sprite(str(ASSETS / "star.png"))
-            star.center_x = x
-            star.center_y = random.randint(380, 560)  # drop zone
-            star.change_y = 0.0
-            star.bounce = random.uniform(STAR_BOUNCE_MIN, STAR_BOUNCE_MAX)
-            self.stars.append(star)
-
-    def spawn_bomb(self):
-        bomb = arcade.Sprite(str(ASSETS / "bomb.png"))
-        # Opposite side of player
-        x = random.randint(400, 780) if self.player.center_x < 400 else random.randint(20, 400)
-        bomb.center_x = x
-        bomb.center_y = 560
-        bomb.change_x = random.uniform(BOMB_MIN_SPEED_X, BOMB_MAX_SPEED_X) * (1 if random.random() < 0.5 else -1)
-        bomb.change_y = -2.0
-        self.bombs.append(bomb)
-
     # -------------------- Events --------------------
     def on_draw(self):
         self.clear()
+        self.screen_camera.use()
         self.bg_list.draw()
+        self.world_camera.use()
         self.platforms.draw()
-        self.stars.draw()
-        self.bombs.draw()
+        self.stars.sprites.draw()
+        self.bombs.sprites.draw()
         self.player_list.draw()  # draw Sprite via SpriteList
+        for batch in self.particles:
+            batch.draw()
 
         # UI
-        arcade.draw_text(f"Score: {self.score}", 16, SCREEN_HEIGHT - 48, arcade.color.BLACK, 28)
-        if self.game_over:
-            arcade.draw_text("GAME OVER", SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2,
-                             arcade.color.RED, 48, anchor_x="center", anchor_y="center")
+        self.screen_camera.use()
+        if self.world.score != self.shown_score:
+            self.shown_score = self.world.score
+            self.score_text.text = f"Score: {self.shown_score}"
+        self.score_text.draw()
+        if self.world.game_over:
+            self.game_over_text.draw()
+        if self.capture is not None:
+            self.capture_frame()
+
+        # Profiler overlay; a frame runs from on_update to the end of on_draw
+        profiler = self.profiler
+        if profiler.enabled:
+            if self.profile_text is None:
+                self.profile_text = arcade.Text("", SCREEN_WIDTH - 8, SCREEN_HEIGHT - 8, arcade.color.BLACK, 11,
+                                                width=260, multiline=True, anchor_x="right", anchor_y="top")
+            if profiler.frame % OVERLAY_REFRESH == 0:
+                self.profile_text.text = "\n".join(profiler.summary_lines())
+            self.profile_text.draw()
+        profiler.lap("draw")
+        profiler.end_frame(stars=self.world.stars.count, bombs=self.world.bombs.count, particles=self.effects.count)
+        self.frames_drawn += 1
+        if self.frames_drawn == self.quit_after:
+            self.close()
+
+    def capture_frame(self):
+        # One read-back of the framebuffer; the frame is a view of those
+        # bytes, flipped because GL rows run bottom-up
+        width, height = self.ctx.screen.size
+        pixels = np.frombuffer(self.ctx.screen.read(components=3), dtype=np.uint8)
+        self.capture.submit(pixels.reshape(height, width, 3)[::-1])
+
+    def load_state(self, state, length):
+        savestate.load(self.world, state, self.animation)
+        self.recording.truncate(length)
+        self.effects.clear()
 
     def on_update(self, dt: float):
-        if self.game_over:
+        self.profiler.begin_frame()
+        # Particles keep flying after the game is over
+        self.effects.update(dt)
+        if self.world.game_over and not self.rewinding:
+            self.player.texture = self.turn_frame
             return
 
-        # Input → velocity
-        self.player.change_x = 0.0
-        if self.left and not self.right:
-            self.player.change_x = -PLAYER_MOVE_SPEED
-        elif self.right and not self.left:
-            self.player.change_x = PLAYER_MOVE_SPEED
-
-        if self.up and self.physics.can_jump():
-            self.player.change_y = PLAYER_JUMP_SPEED
-
-        # Physics
-        self.physics.update()
-
-        # Animate player
-        moving = abs(self.player.change_x) > 0.1
-        if moving:
-            self.anim_timer += dt
-            if self.anim_timer >= self.anim_rate:
-                self.anim_timer = 0.0
-                self.walk_idx = (self.walk_idx + 1) % 4
-            self.player.texture = (
-                self.walk_right_frames[self.walk_idx]
-                if self.player.change_x > 0
-                else self.walk_left_frames[self.walk_idx]
-            )
-        else:
-            self.player.texture = self.turn_frame
-            self.walk_idx = 0
-            self.anim_timer = 0.0
-
-        # Stars: simple gravity + bounce on platforms + floor
-        for star in self.stars:
-            star.change_y -= STAR_GRAVITY
-            star.center_y += star.change_y
-
-            if star.bottom <= 0 and star.change_y < 0:
-                star.bottom = 0
-                star.change_y = -star.change_y * star.bounce
-
-            hit_list = arcade.check_for_collision_with_list(star, self.platforms)
-            for platform in hit_list:
-                if star.change_y < 0 and star.center_y >= platform.top:
-                    star.bottom = platform.top
-                    star.change_y = -star.change_y * star.bounce
-
-        # Collect stars
-        for s in arcade.check_for_collision_with_list(self.player, self.stars):
-            s.remove_from_sprite_lists()
-            self.score += 10
-
-        # Respawn + bomb when all collected
-        if len(self.stars) == 0:
-            self.spawn_star_batch()
-            self.spawn_bomb()
-
-        # Bomb physics + bounces
-        for bomb in self.bombs:
-            bomb.change_y -= BOMB_GRAVITY
-            bomb.center_x += bomb.change_x
-            bomb.center_y += bomb.change_y
-
-            if bomb.right >= SCREEN_WIDTH and bomb.change_x > 0:
-                bomb.right = SCREEN_WIDTH
-                bomb.change_x *= -1
-            if bomb.left <= 0 and bomb.change_x < 0:
-                bomb.left = 0
-                bomb.change_x *= -1
-
-            if bomb.bottom <= 0 and bomb.change_y < 0:
-                bomb.bottom = 0
-                bomb.change_y = -bomb.change_y * BOMB_BOUNCE
-            if bomb.top >= SCREEN_HEIGHT and bomb.change_y > 0:
-                bomb.top = SCREEN_HEIGHT
-                bomb.change_y = -bomb.change_y * BOMB_BOUNCE
-
-            plats = arcade.check_for_collision_with_list(bomb, self.platforms)
-            for plat in plats:
-                if bomb.change_y < 0 and bomb.center_y >= plat.top:
-                    bomb.bottom = plat.top
-                    bomb.change_y = -bomb.change_y * BOMB_BOUNCE
-                elif bomb.change_y > 0 and bomb.bottom <= plat.bottom:
-                    # Rising, hit underside of platform
-                    bomb.top = plat.bottom
-                    bomb.change_y = -bomb.change_y * BOMB_BOUNCE
-
-        # Bomb hit → game over
-        if arcade.check_for_collision_with_list(self.player, self.bombs):
-            self.game_over = True
-            self.player.texture = self.turn_frame
-            self.player.change_x = 0
-            self.player.change_y = 0
-
-        if self.player.left < 0:
-            self.player.left = 0
-        if self.player.right > SCREEN_WIDTH:
-            self.player.right = SCREEN_WIDTH
-        if self.player.bottom < 0:
-            self.player.bottom = 0
-            self.player.change_y = 0
-        if self.player.top > SCREEN_HEIGHT:
-            self.player.top = SCREEN_HEIGHT
-            self.player.change_y = 0
+        # Fixed steps for the time that passed, then draw in between the last two
+        for _ in range(self.stepper.advance(dt)):
+            if self.rewinding:
+                if self.rewind:
+                    self.load_state(*self.rewind.pop())
+                continue
+            inputs = world.Inputs(self.left, self.right, self.up)
+            self.rewind.push(savestate.save(self.world, self.animation), len(self.recording))
+            self.recording.record(inputs)
+            self.world.step(inputs, self.stepper.dt)
+            self.effects.emit(self.world.events)
+            if self.world.game_over:
+                break
+        alpha = 1.0 if self.world.game_over else self.stepper.alpha
+        self.stars.sync(self.world.stars, alpha)
+        self.bombs.sync(self.world.bombs, alpha)
+        place(self.player, self.world.player, alpha)
+        self.follow_player(alpha)
+
+        # Animate player; the clip names are the facing values
+        animation = self.animation
+        animation.play(DUDE.ids[self.world.player.facing])
+        animation.update(dt)
+        self.player.texture = self.dude_frames[animation.frame[0]]
+        self.profiler.lap("sprites")
 
     def on_key_press(self, key, modifiers):
         if key in (arcade.key.LEFT, arcade.key.A):
@@ -290,8 +367,17 @@ class Game(arcade.Window):
             self.right = True
         elif key in (arcade.key.UP, arcade.key.W, arcade.key.SPACE):
             self.up = True
-        elif key == arcade.key.ENTER and self.game_over:
+        elif key == arcade.key.ENTER and self.world.game_over:
             self.setup()
+        elif key == arcade.key.F5:
+            self.quick_save = (savestate.save(self.world, self.animation), len(self.recording))
+        elif key == arcade.key.F9 and self.quick_save is not None:
+            self.load_state(*self.quick_save)
+            self.rewind.clear()
+        elif key == arcade.key.BACKSPACE:
+            self.rewinding = True
+        elif key == arcade.key.F3:
+            self.profiler.toggle()
 
     def on_key_release(self, key, modifiers):
         if key in (arcade.key.LEFT, arcade.key.A):
@@ -300,12 +386,48 @@ class Game(arcade.Window):
             self.right = False
         elif key in (arcade.key.UP, arcade.key.W, arcade.key.SPACE):
             self.up = False
-
-
-def main():
-    game = Game()
+        elif key == arcade.key.BACKSPACE:
+            self.rewinding = False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arcade platformer")
+    parser.add_argument("--level", default="default", help="level name or path to a level JSON file")
+    parser.add_argument("--profile", action="store_true",
+                        help="show the frame-time overlay at start (toggle with F3)")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="write per-phase frame timings to PATH (.csv, or Chrome trace JSON)")
+    parser.add_argument("--fps", type=int, default=FPS,
+                        help="update/draw rate; game speed does not depend on it")
+    parser.add_argument("--seed", type=int, help="random seed (default: a fresh one per run)")
+    parser.add_argument("--record", metavar="PATH",
+                        help="write the input log of the last round to PATH on exit")
+    parser.add_argument("--capture", metavar="PATH",
+                        help="save the drawn frames to PATH: a video file (via ffmpeg), .raw, or a PNG directory")
+    parser.add_argument("--frames", type=int, help="quit after drawing this many frames (smoke tests, startup timing)")
+    args = parser.parse_args(argv)
+
+    game = Game(load_level(args.level), args.seed, args.fps)
+    game.recording.level = args.level  # as given, so paths to level files replay too
+    game.quit_after = args.frames
+    if args.capture:
+        try:
+            game.capture = FrameCapture.open(args.capture, game.ctx.screen.size, args.fps)
+        except (OSError, RuntimeError) as exc:
+            parser.error(f"cannot capture to {args.capture}: {exc}")
+    game.profiler.enabled = args.profile or bool(args.trace)
+    if args.trace:
+        game.profiler.start_trace(args.trace)
     game.setup()
     arcade.run()
+    game.profiler.stop_trace()
+    if game.capture is not None:
+        game.capture.close()
+        if game.capture.dropped:
+            print(f"capture: {game.capture.dropped} of {game.capture.dropped + game.capture.submitted} frames "
+                  f"dropped, the encoder could not keep up", file=sys.stderr)
+    if args.record:
+        game.recording.save(args.record)
 
 
 if __name__ == "__main__":
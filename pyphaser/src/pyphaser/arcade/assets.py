@@ -0,0 +1,61 @@
+from pathlib import Path
+import arcade
+
+from pyphaser import atlas as atlas_cache
+from pyphaser.assets import AssetCache, RESOURCES
+
+cache = AssetCache()
+
+
+def slice_sheet_safe(sheet_path: Path, fw: int, fh: int, count: int):
+    try:
+        sheet = arcade.load_spritesheet(str(sheet_path))
+        frames = sheet.get_texture_grid(size=(fw, fh), columns=count, count=count)
+        if frames and len(frames) >= count:
+            return frames
+    except Exception:
+        pass
+
+    # 2) load_textures with rectangles
+    try:
+        rects = [(i * fw, 0, fw, fh) for i in range(count)]
+        frames = arcade.load_textures(str(sheet_path), rects)
+        if frames and len(frames) >= count:
+            return frames
+    except Exception:
+        pass
+
+    # 3) Last resort
+    base = arcade.load_texture(str(sheet_path))
+    return [base for _ in range(count)]
+
+
+def atlas():
+    return cache.get(("atlas",), atlas_cache.load)
+
+
+def _region(name):
+    # Textures are cut from the packed atlas image, so startup decodes one
+    # cached image instead of every PNG; arcade then places them all in its
+    # own GPU texture atlas, which every SpriteList draws from
+    packed = atlas()
+    x, y, w, h = packed.rect(name)
+    return arcade.Texture(packed.image.crop((x, y, x + w, y + h)), hash=f"pyphaser-atlas:{name}")
+
+
+def texture(name):
+    def load():
+        if name in atlas().regions:
+            return _region(name)
+        return arcade.load_texture(str(RESOURCES / name))
+
+    return cache.get(("texture", name), load)
+
+
+def frames(name, frame_width, frame_height, count):
+    def load():
+        if atlas_cache.SHEETS.get(name) == (frame_width, frame_height, count):
+            return [_region(frame) for frame in atlas().frames(name)]
+        return slice_sheet_safe(RESOURCES / name, frame_width, frame_height, count)
+
+    return cache.get(("frames", name, frame_width, frame_height, count), load)
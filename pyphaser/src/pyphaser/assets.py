@@ -0,0 +1,62 @@
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+# Images shipped with the package, independent of the working directory
+RESOURCES = Path(__file__).parent / "pg" / "resources"
+
+# Phaser dude spritesheet: 0..3 walk left, 4 idle, 5..8 walk right
+DUDE_FRAME_SIZE = (32, 48)
+DUDE_FRAME_COUNT = 9
+# Its clips as name -> (frame indices, frames per second); the names are the
+# world's Player.facing values
+DUDE_CLIPS = {
+    "idle": ((4,), 0),
+    "left": ((0, 1, 2, 3), 10),
+    "right": ((5, 6, 7, 8), 10),
+}
+
+
+def cache_dir(kind):
+    # Per-user directory for files of one kind ("levels", "atlas") built
+    # from the package's data, kept between runs
+    root = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(root) / "pyphaser" / kind
+
+
+class AssetCache:
+    # Bounded least-recently-used cache shared by the asset loaders of both
+    # back-ends. Keys are tuples such as ("image", "star.png") or
+    # ("scaled", "platform.png", 800, 32); values are whatever the back-end
+    # produced (pygame surfaces, arcade textures, lists of frames).
+    def __init__(self, max_items=256):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, factory):
+        try:
+            value = self._items[key]
+        except KeyError:
+            self.misses += 1
+            value = factory()
+            self._items[key] = value
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+            return value
+        self.hits += 1
+        self._items.move_to_end(key)
+        return value
+
+    def evict(self, key):
+        self._items.pop(key, None)
+
+    def clear(self):
+        self._items.clear()
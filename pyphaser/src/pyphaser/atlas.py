@@ -0,0 +1,164 @@
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from PIL import Image
+
+from pyphaser.assets import DUDE_FRAME_COUNT, DUDE_FRAME_SIZE, RESOURCES, cache_dir
+
+# -------------------- Settings --------------------
+# Spritesheets are cut into frames named "<file>:<index>"; every other image
+# in RESOURCES becomes one region named after its file
+SHEETS = {"dude.png": (*DUDE_FRAME_SIZE, DUDE_FRAME_COUNT)}
+MAX_WIDTH = 1024
+# Empty border around each region; its edge pixels are repeated into it so
+# linear filtering never samples a neighbour
+PADDING = 1
+FORMAT_VERSION = 1
+
+
+class Atlas:
+    # One RGBA image holding every sprite, plus a table of region name ->
+    # (x, y, w, h) in pixels. `opaque` lists regions without transparency,
+    # which software blitters can copy without blending.
+    def __init__(self, image, regions, opaque=()):
+        self.image = image
+        self.regions = regions
+        self.opaque = set(opaque)
+
+    @property
+    def size(self):
+        return self.image.size
+
+    def rect(self, name):
+        return self.regions[name]
+
+    def uv(self, name):
+        # Normalized (u0, v0, u1, v1), v pointing down like the image rows
+        x, y, w, h = self.regions[name]
+        width, height = self.image.size
+        return x / width, y / height, (x + w) / width, (y + h) / height
+
+    def frames(self, name):
+        count = SHEETS[name][2]
+        return [f"{name}:{i}" for i in range(count)]
+
+
+# -------------------- Packing --------------------
+def source_images(resources=RESOURCES):
+    images = {}
+    for path in sorted(Path(resources).glob("*.png")):
+        image = Image.open(path).convert("RGBA")
+        if path.name in SHEETS:
+            fw, fh, count = SHEETS[path.name]
+            for i in range(count):
+                images[f"{path.name}:{i}"] = image.crop((i * fw, 0, (i + 1) * fw, fh))
+        else:
+            images[path.name] = image
+    return images
+
+
+def pack_rects(sizes, max_width=MAX_WIDTH, padding=PADDING):
+    # Shelf packing, tallest first: fill a row left to right, start a new row
+    # under it when the next image does not fit. Returns name -> (x, y) and
+    # the atlas size.
+    order = sorted(sizes, key=lambda name: (-sizes[name][1], -sizes[name][0], name))
+    width = max(max_width, max(w for w, _ in sizes.values()) + 2 * padding)
+    positions = {}
+    x = y = shelf = 0
+    for name in order:
+        w, h = sizes[name]
+        w += 2 * padding
+        h += 2 * padding
+        if x + w > width:
+            x = 0
+            y += shelf
+            shelf = 0
+        positions[name] = (x + padding, y + padding)
+        x += w
+        shelf = max(shelf, h)
+    used_width = max(positions[name][0] + sizes[name][0] + padding for name in positions)
+    return positions, (used_width, y + shelf)
+
+
+def _extrude(atlas, image, x, y, padding):
+    w, h = image.size
+    for i in range(1, padding + 1):
+        atlas.paste(image.crop((0, 0, w, 1)), (x, y - i))
+        atlas.paste(image.crop((0, h - 1, w, h)), (x, y + h - 1 + i))
+    for i in range(1, padding + 1):
+        atlas.paste(atlas.crop((x, y - padding, x + 1, y + h + padding)), (x - i, y - padding))
+        atlas.paste(atlas.crop((x + w - 1, y - padding, x + w, y + h + padding)), (x + w - 1 + i, y - padding))
+
+
+def pack(images, max_width=MAX_WIDTH, padding=PADDING):
+    positions, size = pack_rects({name: image.size for name, image in images.items()}, max_width, padding)
+    atlas = Image.new("RGBA", size, (0, 0, 0, 0))
+    regions = {}
+    opaque = []
+    for name, (x, y) in positions.items():
+        image = images[name]
+        atlas.paste(image, (x, y))
+        if padding:
+            _extrude(atlas, image, x, y, padding)
+        regions[name] = (x, y, *image.size)
+        if image.getextrema()[3][0] == 255:
+            opaque.append(name)
+    return Atlas(atlas, regions, opaque)
+
+
+# -------------------- Disk cache --------------------
+def load(resources=RESOURCES, use_cache=True):
+    # The packed atlas is cached as raw RGBA pixels plus a JSON region table,
+    # keyed on the source images and the packing settings; it is only
+    # repacked when one of those changes. Raw pixels load in about a
+    # millisecond where decoding a PNG of the atlas would cost more than
+    # packing it again.
+    digest = hashlib.sha1(json.dumps([FORMAT_VERSION, MAX_WIDTH, PADDING, sorted(SHEETS.items())]).encode())
+    for path in sorted(Path(resources).glob("*.png")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    stem = cache_dir("atlas") / f"atlas-{digest.hexdigest()[:16]}"
+    pixels, table = stem.with_suffix(".rgba"), stem.with_suffix(".json")
+    if use_cache:
+        try:
+            with open(table) as f:
+                header = json.load(f)
+            image = Image.frombytes("RGBA", tuple(header["size"]), pixels.read_bytes())
+            return Atlas(image, {name: tuple(rect) for name, rect in header["regions"].items()},
+                         header["opaque"])
+        except (OSError, ValueError, KeyError):
+            pass
+    atlas = pack(source_images(resources))
+    if use_cache:
+        try:
+            stem.parent.mkdir(parents=True, exist_ok=True)
+            tmp = stem.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(atlas.image.tobytes())
+            os.replace(tmp, pixels)
+            with open(tmp, "w") as f:
+                json.dump({"size": atlas.size, "regions": atlas.regions, "opaque": sorted(atlas.opaque)}, f)
+            os.replace(tmp, table)
+        except OSError:
+            pass
+    return atlas
+
+
+def main(argv=None):
+    # Build step: pack (or refresh the cached) atlas, optionally saving a PNG
+    # of it for inspection
+    parser = argparse.ArgumentParser(description="Pack the game sprites into one texture atlas")
+    parser.add_argument("--png", metavar="PATH", help="also save the atlas image to PATH")
+    args = parser.parse_args(argv)
+
+    atlas = load()
+    if args.png:
+        atlas.image.save(args.png)
+    width, height = atlas.size
+    print(f"{width}x{height} atlas, {len(atlas.regions)} regions, cached in {cache_dir('atlas')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+
+from pyphaser import world
+
+# -------------------- Settings --------------------
+MAX_FRAMES = 60 * 60 * 5  # five minutes of game time at 60 steps per second
+REPORT_EVERY = 10
+# How far above its feet the chase bot assumes it can land a jump
+JUMP_REACH = 200
+
+
+# -------------------- Policies --------------------
+# A policy maps (world, rng) to the Inputs for the next step
+
+def random_policy(game, rng):
+    return world.Inputs(rng.random() < 0.4, rng.random() < 0.4, rng.random() < 0.1)
+
+
+def chase_policy(game, rng):
+    # Greedy bot: walk to the nearest star it can jump up to, otherwise climb
+    # onto the nearest ledge within jump height and look again from there
+    player = game.player
+    center = player.x + player.w / 2
+    feet = player.bottom
+    stars = game.stars
+    if not stars.count:
+        return world.Inputs()
+    star_x = stars.x + stars.w / 2
+    star_bottom = stars.y + stars.h
+    reachable = feet - star_bottom <= JUMP_REACH
+    if reachable.any():
+        distance = abs(star_x - center)
+        distance[~reachable] = float("inf")
+        nearest = int(distance.argmin())
+        target_x, target_y = star_x[nearest], star_bottom[nearest]
+    else:
+        ledges = [p for p in game.platforms if 8 < feet - p.top <= JUMP_REACH]
+        if not ledges:
+            return world.Inputs(right=rng.random() < 0.5, up=True)
+        ledge = min(ledges, key=lambda p: max(p.left - center, center - p.right, 0))
+        target_x = min(max(center, ledge.left + player.w), ledge.right - player.w)
+        target_y = ledge.top
+
+    dx = target_x - center
+    if target_y >= feet - 8:
+        return world.Inputs(left=dx < -4, right=dx > 4)
+
+    # Target is above us: step well clear of any ledge overhead, then jump
+    margin = 3 * player.w
+    for platform in game.platforms:
+        overhead = feet - JUMP_REACH - player.h < platform.bottom <= player.y
+        if overhead and platform.left - margin < player.right and player.left < platform.right + margin:
+            go_left = center - platform.left < platform.right - center
+            if platform.left - margin < 0:
+                go_left = False
+            elif platform.right + margin > world.WIDTH:
+                go_left = True
+            return world.Inputs(left=go_left, right=not go_left)
+    return world.Inputs(left=dx < -4, right=dx > 4, up=True)
+
+
+POLICIES = {
+    "random": random_policy,
+    "chase": chase_policy,
+}
+
+
+# -------------------- Episodes --------------------
+def run_episode(seed, policy="chase", max_frames=MAX_FRAMES):
+    game = world.World(seed=seed)
+    rng = random.Random(seed)
+    act = POLICIES[policy]
+    while not game.game_over and game.frame < max_frames:
+        game.step(act(game, rng), world.DT)
+    return {
+        "seed": seed,
+        "score": game.score,
+        "frames": game.frame,
+        "bombs_spawned": game.bombs_spawned,
+        "game_over": game.game_over,
+    }
+
+
+def _run_episode(args):
+    return run_episode(*args)
+
+
+class BatchStats:
+    def __init__(self):
+        self.episodes = 0
+        self.game_overs = 0
+        self.score_total = 0
+        self.score_max = 0
+        self.frames_total = 0
+        self.bombs_total = 0
+
+    def add(self, result):
+        self.episodes += 1
+        self.game_overs += int(result["game_over"])
+        self.score_total += result["score"]
+        self.score_max = max(self.score_max, result["score"])
+        self.frames_total += result["frames"]
+        self.bombs_total += result["bombs_spawned"]
+
+    def as_dict(self):
+        n = max(self.episodes, 1)
+        return {
+            "episodes": self.episodes,
+            "game_overs": self.game_overs,
+            "score_mean": self.score_total / n,
+            "score_max": self.score_max,
+            "frames_mean": self.frames_total / n,
+            "frames_total": self.frames_total,
+            "bombs_spawned_mean": self.bombs_total / n,
+        }
+
+
+def run_batch(episodes, seed=0, policy="chase", max_frames=MAX_FRAMES, workers=None):
+    # Yields (result, stats) per finished episode, in completion order. Every
+    # episode gets its own seed (seed, seed + 1, ...) so any single run can be
+    # replayed with run_episode(seed + i).
+    jobs = [(seed + i, policy, max_frames) for i in range(episodes)]
+    stats = BatchStats()
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, episodes // (workers * 8))
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(_run_episode, jobs, chunksize):
+            stats.add(result)
+            yield result, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless episodes in a process pool")
+    parser.add_argument("-n", "--episodes", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="chase")
+    parser.add_argument("--max-frames", type=int, default=MAX_FRAMES)
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--jsonl", action="store_true", help="print every episode result as a JSON line")
+    args = parser.parse_args(argv)
+
+    stats = BatchStats()
+    for result, stats in run_batch(args.episodes, args.seed, args.policy, args.max_frames, args.workers):
+        if args.jsonl:
+            print(json.dumps(result))
+        elif stats.episodes % REPORT_EVERY == 0:
+            summary = stats.as_dict()
+            print(f"{summary['episodes']}/{args.episodes} episodes, "
+                  f"mean score {summary['score_mean']:.1f}, mean frames {summary['frames_mean']:.0f}",
+                  file=sys.stderr)
+    print(json.dumps(stats.as_dict()))
+
+
+if __name__ == "__main__":
+    main()
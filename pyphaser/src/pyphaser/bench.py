@@ -0,0 +1,326 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from pyphaser import world
+from pyphaser.particles import Effects
+
+# -------------------- Settings --------------------
+STEPS = 600
+WARMUP_STEPS = 30
+BACKENDS = ("headless", "pg", "arcade")
+
+# Extra entities on top of the normal star row; platforms=None keeps the
+# standard level, otherwise the ground plus random ledges. particles is the
+# number of live effect particles kept up every step.
+SCENARIOS = {
+    "default": {"stars": 0, "bombs": 0, "platforms": None, "particles": 0},
+    "crowd": {"stars": 500, "bombs": 500, "platforms": 20, "particles": 0},
+    "stress": {"stars": 2000, "bombs": 10000, "platforms": 200, "particles": 0},
+    "effects": {"stars": 0, "bombs": 0, "platforms": None, "particles": 50000},
+}
+
+# Startup budgets in ms on top of a bare interpreter start: importing the
+# front-end modules (tools and the student helpers do that in short-lived
+# processes), and launching each entry point until its first frame is drawn
+STARTUP_RUNS = 5
+STARTUP_BUDGETS = {
+    "import pyphaser.pg.app": (["-c", "import pyphaser.pg.app"], 400),
+    "import pyphaser.pg.handigefuncties": (["-c", "import pyphaser.pg.handigefuncties"], 400),
+    "import pyphaser.arcade.app": (["-c", "import pyphaser.arcade.app"], 800),
+    "pyphaser-pg first frame": (["-m", "pyphaser.pg.app", "--frames", "1", "--seed", "0"], 500),
+    "pyphaser-arcade first frame": (["-m", "pyphaser.arcade.app", "--frames", "1", "--seed", "0"], 1200),
+}
+
+
+# -------------------- Scenarios --------------------
+def make_platforms(count, rng):
+    ground = (0, world.HEIGHT - 32, world.WIDTH, 32)
+    ledges = [(int(x), int(y), 120, 16) for x, y in
+              zip(rng.uniform(-60, world.WIDTH - 60, count - 1), rng.uniform(80, world.HEIGHT - 120, count - 1))]
+    return [ground] + ledges
+
+
+def make_world(scenario, seed):
+    config = SCENARIOS[scenario]
+    rng = np.random.default_rng(seed)
+    platforms = world.PLATFORMS if config["platforms"] is None else make_platforms(config["platforms"], rng)
+    return world.World(seed=seed, platforms=platforms)
+
+
+def populate(game, scenario, seed):
+    config = SCENARIOS[scenario]
+    rng = np.random.default_rng(seed)
+    stars = config["stars"]
+    bombs = config["bombs"]
+    game.stars.spawn_many(rng.uniform(0, world.WIDTH - game.stars.w, stars), rng.uniform(0, 300, stars),
+                          bounce=rng.uniform(world.STAR_BOUNCE_MIN, world.STAR_BOUNCE_MAX, stars))
+    speed = rng.uniform(world.BOMB_MIN_SPEED_X, world.BOMB_MAX_SPEED_X, bombs) * rng.choice([-1, 1], bombs)
+    game.bombs.spawn_many(rng.uniform(0, world.WIDTH - game.bombs.w, bombs), rng.uniform(0, 300, bombs),
+                          speed, world.BOMB_START_SPEED_Y)
+
+
+def scripted_inputs(frame):
+    # Run right and left across the level, jumping every second
+    return world.Inputs(left=(frame // 120) % 2 == 1, right=(frame // 120) % 2 == 0, up=frame % 60 == 0)
+
+
+def keep_particles(effects, scenario):
+    # Top the bomb-hit emitter up to the scenario's particle count with one
+    # burst somewhere in the upper half of the screen
+    missing = SCENARIOS[scenario]["particles"] - effects.count
+    if missing > 0:
+        x = effects.random.uniform(0, world.WIDTH)
+        y = effects.random.uniform(0, world.HEIGHT / 2)
+        effects.emitters["hit"].burst(x, y, missing)
+
+
+def keep_running(game):
+    # A scenario measures a fixed number of full steps, so a bomb hit must
+    # not end the round or take the player out
+    game.game_over = False
+    game.player.alive = True
+
+
+# -------------------- Back-ends --------------------
+def bench_headless(scenario, steps, seed):
+    game = make_world(scenario, seed)
+    populate(game, scenario, seed)
+    effects = Effects(seed=seed)
+
+    def update(frame):
+        game.step(scripted_inputs(frame), world.DT)
+        keep_running(game)
+        effects.emit(game.events)
+        effects.update(world.DT)
+        keep_particles(effects, scenario)
+
+    return game, effects, update, lambda: None
+
+
+def bench_pg(scenario, steps, seed, dirty=False, gpu=False):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pygame
+    from pyphaser.pg import app, assets
+
+    game = make_world(scenario, seed)
+    populate(game, scenario, seed)
+    screen = app.open_display()
+    background = assets.image("sky.png")
+    font = pygame.font.SysFont(None, 36)
+    hud = app.Hud(font, app.WIDTH, app.HEIGHT)
+    if gpu:
+        renderer = app.GpuRenderer.open(app.TITLE, background, hud)
+    else:
+        renderer = (app.DirtyRenderer if dirty else app.FullRenderer)(screen, background, hud)
+    stars = app.SpritePool(app.Star, renderer)
+    bombs = app.SpritePool(app.Bomb, renderer)
+    for p in game.platforms:
+        renderer.add_static(app.Platform(p.x, p.y, p.w, p.h))
+    player = app.Player(game.player)
+    renderer.add(player)
+    effects = Effects(seed=seed)
+    for emitter in effects.emitters.values():
+        renderer.add_effect(app.ParticleLayer(emitter, (app.WIDTH, app.HEIGHT)))
+
+    def update(frame):
+        game.step(scripted_inputs(frame), world.DT)
+        keep_running(game)
+        effects.emit(game.events)
+        effects.update(world.DT)
+        keep_particles(effects, scenario)
+        stars.sync(game.stars)
+        bombs.sync(game.bombs)
+        player.update()
+        hud.update(game.score, game.game_over)
+
+    def draw():
+        renderer.draw()
+        # Poll events the way the game loop does, not just pump them
+        pygame.event.get()
+
+    return game, effects, update, draw
+
+
+def bench_arcade(scenario, steps, seed):
+    os.environ.setdefault("ARCADE_HEADLESS", "1")
+    from pyphaser.arcade import app
+
+    window = app.Game(make_world(scenario, seed).level)
+    window.world.reset(seed)
+    window.setup()
+    game = window.world
+    populate(game, scenario, seed)
+
+    def update(frame):
+        inputs = scripted_inputs(frame)
+        window.left, window.right, window.up = inputs.left, inputs.right, inputs.up
+        window.on_update(world.DT)
+        keep_running(game)
+        keep_particles(window.effects, scenario)
+
+    def draw():
+        window.on_draw()
+        window.ctx.finish()
+
+    return game, window.effects, update, draw
+
+
+def run_case(backend, scenario, steps=STEPS, seed=0):
+    if backend == "headless":
+        game, effects, update, draw = bench_headless(scenario, steps, seed)
+    elif backend == "pg":
+        game, effects, update, draw = bench_pg(scenario, steps, seed)
+    elif backend == "pg-dirty":
+        game, effects, update, draw = bench_pg(scenario, steps, seed, dirty=True)
+    elif backend == "pg-gpu":
+        game, effects, update, draw = bench_pg(scenario, steps, seed, gpu=True)
+    elif backend == "arcade":
+        game, effects, update, draw = bench_arcade(scenario, steps, seed)
+    else:
+        raise ValueError(f"unknown backend {backend!r}")
+
+    for frame in range(WARMUP_STEPS):
+        update(frame)
+        draw()
+
+    clock = time.perf_counter_ns
+    update_ns = draw_ns = 0
+    start = clock()
+    for frame in range(WARMUP_STEPS, WARMUP_STEPS + steps):
+        t0 = clock()
+        update(frame)
+        t1 = clock()
+        draw()
+        t2 = clock()
+        update_ns += t1 - t0
+        draw_ns += t2 - t1
+    total_ns = clock() - start
+
+    return {
+        "backend": backend,
+        "scenario": scenario,
+        "seed": seed,
+        "steps": steps,
+        "stars": game.stars.count,
+        "bombs": game.bombs.count,
+        "particles": effects.count,
+        "platforms": len(game.platforms),
+        "steps_per_second": steps / (total_ns / 1e9),
+        "update_ms": update_ns / steps / 1e6,
+        "draw_ms": draw_ns / steps / 1e6,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_isolated(backend, scenario, steps, seed):
+    # Every case runs in a fresh interpreter: the video drivers are picked at
+    # import time and peak memory must not leak from one case into the next
+    cmd = [sys.executable, "-m", "pyphaser.bench", "--worker",
+           "--backend", backend, "--scenario", scenario, "--steps", str(steps), "--seed", str(seed)]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"backend": backend, "scenario": scenario, "seed": seed, "error": proc.stderr.strip()[-2000:]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# -------------------- Startup --------------------
+def time_process(args, runs=STARTUP_RUNS):
+    # Best wall time in ms of a fresh interpreter running args; the best run
+    # is the one least disturbed by the rest of the machine
+    env = dict(os.environ)
+    env.setdefault("SDL_VIDEODRIVER", "dummy")
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+    env.setdefault("ARCADE_HEADLESS", "1")
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], env=env, capture_output=True, check=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_startup(runs=STARTUP_RUNS):
+    baseline = time_process(["-c", "pass"], runs)
+    results = []
+    for name, (args, budget) in STARTUP_BUDGETS.items():
+        try:
+            ms = time_process(args, runs) - baseline
+        except subprocess.CalledProcessError as exc:
+            results.append({"case": name, "budget_ms": budget, "error": exc.stderr.decode().strip()[-2000:]})
+            continue
+        results.append({"case": name, "ms": ms, "budget_ms": budget, "within_budget": ms <= budget})
+    return {"interpreter_ms": baseline, "results": results}
+
+
+def write_report(report, output=None):
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        **report,
+    }
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation and both back-ends")
+    parser.add_argument("--backend", action="append", choices=BACKENDS + ("pg-dirty", "pg-gpu"),
+                        help="back-end to run, repeatable (default: all)")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run, repeatable (default: all)")
+    parser.add_argument("--steps", type=int, default=STEPS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--startup", action="store_true",
+                        help="measure import and first-frame times against the startup budgets instead; "
+                             "exits non-zero when one is over budget")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_case(args.backend[0], args.scenario[0], args.steps, args.seed)))
+        return
+
+    if args.startup:
+        report = measure_startup()
+        for result in report["results"]:
+            if "error" in result:
+                print(f"{result['case']:<36} failed", file=sys.stderr)
+            else:
+                verdict = "ok" if result["within_budget"] else "OVER BUDGET"
+                print(f"{result['case']:<36} {result['ms']:7.1f} ms  budget {result['budget_ms']} ms  {verdict}",
+                      file=sys.stderr)
+        write_report(report, args.output)
+        return 0 if all(result.get("within_budget") for result in report["results"]) else 1
+
+    results = []
+    for scenario in args.scenario or sorted(SCENARIOS):
+        for backend in args.backend or BACKENDS:
+            result = run_isolated(backend, scenario, args.steps, args.seed)
+            results.append(result)
+            if "error" in result:
+                print(f"{scenario:<8} {backend:<9} failed", file=sys.stderr)
+            else:
+                print(f"{scenario:<8} {backend:<9} {result['steps_per_second']:9.1f} steps/s  "
+                      f"update {result['update_ms']:.3f} ms  draw {result['draw_ms']:.3f} ms", file=sys.stderr)
+
+    write_report({"results": results}, args.output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
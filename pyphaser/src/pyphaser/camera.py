@@ -0,0 +1,89 @@
+from pyphaser.chunks import CHUNK_WIDTH
+
+# -------------------- Settings --------------------
+# Chunks beyond the edges of the view whose platforms already get sprites,
+# so they exist before they scroll in
+SPRITE_MARGIN_CHUNKS = 1
+# The sky scrolls this much slower than the level when the camera moves
+BACKGROUND_PARALLAX = 2
+
+
+def background_tiles(width, offset, screen_width):
+    # Screen x positions of a background `width` pixels wide, repeated
+    # sideways behind a camera at offset
+    start = -(offset // BACKGROUND_PARALLAX) % width
+    if start:
+        start -= width
+    return range(start, screen_width, width)
+
+
+class Camera:
+    # The part of the world on screen: its top-left (x, y) in world space,
+    # centered on a target and clamped to the level. A level no larger than
+    # the view never scrolls.
+    def __init__(self, width, height, world_width, world_height):
+        self.width = width
+        self.height = height
+        self.world_width = world_width
+        self.world_height = world_height
+        self.x = 0.0
+        self.y = 0.0
+
+    @property
+    def scrolls(self):
+        return self.world_width > self.width or self.world_height > self.height
+
+    @property
+    def offset(self):
+        # Whole pixels, so scrolled sprites keep their integer positions
+        return int(self.x), int(self.y)
+
+    def follow(self, x, y):
+        self.x = min(max(x - self.width / 2, 0.0), max(self.world_width - self.width, 0))
+        self.y = min(max(y - self.height / 2, 0.0), max(self.world_height - self.height, 0))
+
+    def chunks(self, margin=0):
+        # First and last chunk index the view touches, widened by margin
+        first = int(self.x // CHUNK_WIDTH) - margin
+        last = int((self.x + self.width - 1) // CHUNK_WIDTH) + margin
+        return max(first, 0), last
+
+
+class PlatformStream:
+    # Front-end sprites for the platforms near the camera. make(x, y, w, h)
+    # creates one when a platform comes within SPRITE_MARGIN_CHUNKS of the
+    # view, drop(sprite) disposes of it once it is further away, so the
+    # sprite count depends on the view, not on the level. Platforms wider
+    # than a chunk get one sprite per chunk, keeping images small. Work is
+    # only done when the view enters another chunk.
+    def __init__(self, world, make, drop):
+        self.world = world
+        self.make = make
+        self.drop = drop
+        self.sprites = {}
+        self.span = None
+
+    def pieces(self, first, last):
+        world = self.world
+        left = first * CHUNK_WIDTH
+        for index in world.platforms_in(left, (last + 1) * CHUNK_WIDTH - left):
+            body = world.platforms[index]
+            if body.w <= CHUNK_WIDTH:
+                yield (index, -1), (body.x, body.y, body.w, body.h)
+                continue
+            for chunk in range(max(first, int(body.x // CHUNK_WIDTH)),
+                               min(last, int((body.right - 1) // CHUNK_WIDTH)) + 1):
+                x0 = max(body.x, chunk * CHUNK_WIDTH)
+                x1 = min(body.right, (chunk + 1) * CHUNK_WIDTH)
+                yield (index, chunk), (x0, body.y, x1 - x0, body.h)
+
+    def update(self, camera):
+        span = camera.chunks(SPRITE_MARGIN_CHUNKS)
+        if span == self.span:
+            return
+        self.span = span
+        wanted = dict(self.pieces(*span))
+        for key in sorted(wanted.keys() - self.sprites.keys()):
+            self.sprites[key] = self.make(*wanted[key])
+        for key in self.sprites.keys() - wanted.keys():
+            self.drop(self.sprites.pop(key))
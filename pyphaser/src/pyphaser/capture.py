@@ -0,0 +1,152 @@
+import json
+import queue
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# -------------------- Settings --------------------
+# Frames buffered between the game loop and the encoder thread. When the
+# encoder falls behind, new frames are dropped rather than stalling the game.
+RING_SLOTS = 8
+PNG_COMPRESS_LEVEL = 1  # fast over small; level 9 can't keep up with 60 fps
+FFMPEG_SUFFIXES = {".mp4", ".mkv", ".webm", ".mov", ".gif"}
+RAW_SUFFIXES = {".raw", ".rgb"}
+
+
+# -------------------- Writers --------------------
+# A writer takes (height, width, 3) uint8 RGB frames on the encoder thread
+
+class RawWriter:
+    # Frames back to back as packed RGB, plus a JSON sidecar (PATH.json) with
+    # the size, rate and frame count needed to read them back
+    def __init__(self, path, size, fps):
+        self.path = Path(path)
+        self.size = size
+        self.fps = fps
+        self.frames = 0
+        self.file = open(self.path, "wb")
+
+    def write(self, frame):
+        self.file.write(frame)
+        self.frames += 1
+
+    def close(self):
+        self.file.close()
+        width, height = self.size
+        with open(self.path.with_name(self.path.name + ".json"), "w") as f:
+            json.dump({"width": width, "height": height, "fps": self.fps, "frames": self.frames,
+                       "pixel_format": "rgb24"}, f)
+
+
+class PngWriter:
+    # One numbered PNG per frame in a directory
+    def __init__(self, path, size, fps):
+        from PIL import Image
+        self.image = Image
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.frames = 0
+
+    def write(self, frame):
+        self.image.fromarray(frame).save(self.path / f"frame_{self.frames:06d}.png",
+                                         compress_level=PNG_COMPRESS_LEVEL)
+        self.frames += 1
+
+    def close(self):
+        pass
+
+
+class FfmpegWriter:
+    # Raw frames piped into an ffmpeg process, which picks the codec from
+    # the output file name
+    def __init__(self, path, size, fps):
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise RuntimeError("ffmpeg not found on PATH")
+        width, height = size
+        self.process = subprocess.Popen(
+            [ffmpeg, "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24",
+             "-s", f"{width}x{height}", "-r", str(fps), "-i", "-", "-pix_fmt", "yuv420p", str(path)],
+            stdin=subprocess.PIPE)
+        self.frames = 0
+
+    def write(self, frame):
+        self.process.stdin.write(frame)
+        self.frames += 1
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+def open_writer(path, size, fps):
+    # Picked by the output name: a video file goes through ffmpeg, .raw/.rgb
+    # is packed RGB, anything else is a directory of PNGs
+    suffix = Path(path).suffix.lower()
+    if suffix in FFMPEG_SUFFIXES:
+        return FfmpegWriter(path, size, fps)
+    if suffix in RAW_SUFFIXES:
+        return RawWriter(path, size, fps)
+    return PngWriter(path, size, fps)
+
+
+# -------------------- Capture --------------------
+class FrameCapture:
+    # Hands frames from the game loop to a writer running on a background
+    # thread. submit() takes a view of the frame buffer (any strides, e.g. a
+    # transposed surfarray or a flipped GL read-back) and does the one copy
+    # into a free slot of a preallocated ring; if no slot is free the frame
+    # is dropped and counted. The loop never waits on the encoder.
+    def __init__(self, writer, size, slots=RING_SLOTS):
+        width, height = size
+        self.writer = writer
+        self.ring = np.empty((slots, height, width, 3), dtype=np.uint8)
+        self.free = queue.SimpleQueue()
+        self.filled = queue.SimpleQueue()
+        for slot in range(slots):
+            self.free.put(slot)
+        self.submitted = 0
+        self.dropped = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._encode, name="frame-encoder", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def open(cls, path, size, fps, slots=RING_SLOTS):
+        return cls(open_writer(path, size, fps), size, slots)
+
+    def submit(self, frame):
+        try:
+            slot = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        np.copyto(self.ring[slot], frame[..., :3])
+        self.filled.put(slot)
+        self.submitted += 1
+        return True
+
+    def _encode(self):
+        while True:
+            slot = self.filled.get()
+            if slot is None:
+                break
+            if self.error is None:
+                try:
+                    self.writer.write(self.ring[slot])
+                except Exception as exc:
+                    # Keep draining so the game loop never blocks; close()
+                    # reports the failure
+                    self.error = exc
+            self.free.put(slot)
+
+    def close(self):
+        # Waits for the frames already queued, then finishes the file
+        self.filled.put(None)
+        self.thread.join()
+        self.writer.close()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,65 @@
+import zlib
+
+import numpy as np
+
+# -------------------- Settings --------------------
+# Levels are cut into vertical strips CHUNK_WIDTH pixels wide. Only chunks
+# within ACTIVE_CHUNKS of the player's chunk are simulated; the stars and
+# bombs of the others are paged out until the player comes back.
+CHUNK_WIDTH = 800
+ACTIVE_CHUNKS = 1
+COMPRESS_LEVEL = 1  # paging happens mid-game, so fast over small
+
+
+def chunk_count(width, chunk_width=CHUNK_WIDTH):
+    return max(1, -(-int(width) // chunk_width))
+
+
+def chunk_of(x, count, chunk_width=CHUNK_WIDTH):
+    # Chunk index of world x positions, bodies off the level edges counting
+    # to the first or last chunk
+    return np.clip(np.floor_divide(x, chunk_width), 0, count - 1).astype(np.int64)
+
+
+class ChunkPager:
+    # The rows of one EntityStore that sit in inactive chunks, kept as
+    # chunk -> zlib-compressed raw rows. Memory for a chunk nobody visits
+    # is its compressed rows; nothing in it is simulated.
+    def __init__(self, chunks, fields):
+        self.chunks = chunks
+        self.fields = fields
+        self.pages = {}
+        self.count = 0
+
+    def _unpack(self, chunk):
+        rows = np.frombuffer(zlib.decompress(self.pages.pop(chunk)), dtype=np.float64).reshape(self.fields, -1)
+        self.count -= rows.shape[1]
+        return rows
+
+    def _pack(self, chunk, rows):
+        if chunk in self.pages:
+            rows = np.concatenate([self._unpack(chunk), rows], axis=1)
+        self.pages[chunk] = zlib.compress(np.ascontiguousarray(rows).tobytes(), COMPRESS_LEVEL)
+        self.count += rows.shape[1]
+
+    def page_out(self, store, first, last):
+        # Move the live rows outside chunks [first, last] into their pages
+        if not store.count:
+            return
+        chunk = chunk_of(store.x, self.chunks)
+        away = (chunk < first) | (chunk > last)
+        if not away.any():
+            return
+        chunk = chunk[away]
+        rows = store.take(away)
+        for index in np.unique(chunk).tolist():
+            self._pack(index, rows[:, chunk == index])
+
+    def page_in(self, store, first, last):
+        for index in range(first, last + 1):
+            if index in self.pages:
+                store.put(self._unpack(index))
+
+    def clear(self):
+        self.pages.clear()
+        self.count = 0
@@ -0,0 +1,196 @@
+import numpy as np
+
+from pyphaser.spatial import UniformGrid, overlap_mask, sweep
+
+# -------------------- Settings --------------------
+# Layer bits. A group of entities sits on one layer and has a mask of the
+# layers it collides with; two groups only collide when each one's mask has
+# the other's layer.
+PLAYER = 1
+COLLECTIBLE = 2
+HAZARD = 4
+STATIC = 8
+# Up to this many query boxes are tested against every box directly; more
+# and the boxes are bucketed in a UniformGrid first
+DENSE_QUERIES = 16
+
+
+class Bodies:
+    # Column view of a list of Body objects (the players), for the passes
+    # that take EntityStore-like sources
+    def __init__(self, bodies=()):
+        self.bodies = list(bodies)
+        self.x = np.array([b.x for b in self.bodies], dtype=np.float64)
+        self.y = np.array([b.y for b in self.bodies], dtype=np.float64)
+        self.w = np.array([b.w for b in self.bodies], dtype=np.float64)
+        self.h = np.array([b.h for b in self.bodies], dtype=np.float64)
+
+    @property
+    def count(self):
+        return len(self.bodies)
+
+
+class Group:
+    def __init__(self, name, layer, mask, source):
+        self.name = name
+        self.layer = layer
+        self.mask = mask
+        # An EntityStore-like object (count, x, y, w, h, and prev_x/prev_y
+        # for swept tests), or a function returning one for each pass
+        self.source = source
+
+    def resolve(self):
+        return self.source() if callable(self.source) else self.source
+
+    def collides(self, other):
+        return bool(self.layer & other.mask and other.layer & self.mask)
+
+
+class Collisions:
+    # Declarative collision filtering. Entity groups are added with a layer
+    # and a mask, and a handler is registered for every pair of groups that
+    # should react to each other. Each pass then finds the contacts of all
+    # registered pairs at once, so another entity type adds rows to a pass,
+    # not another pass over everything:
+    #   sweep_static(): entities moving from prev to current position against
+    #     the static boxes; handler(rows, static, toi, side), see spatial.sweep
+    #   overlap(): overlapping boxes of two dynamic groups; handler(a, b) with
+    #     the rows of the pairs, sorted by a then b
+    # Handlers run in registration order.
+    def __init__(self, static_name, static_boxes, static_grid):
+        self.static_name = static_name
+        self.static_boxes = static_boxes
+        self.static_grid = static_grid
+        self.groups = {}
+        self.static_handlers = []
+        self.handlers = []
+        self.grid = UniformGrid()
+        # Size columns of the last few combinations of fixed-size sources;
+        # they only change when an entity count does
+        self.sizes = {}
+
+    def add(self, name, layer, mask, source):
+        self.groups[name] = Group(name, layer, mask, source)
+
+    def on(self, a, b, handler):
+        group = self.groups[a]
+        # Static boxes take whatever runs into them
+        if b == self.static_name:
+            if not group.mask & STATIC:
+                raise ValueError(f"{a} does not collide with {b}, check the masks")
+            self.static_handlers.append((group, handler))
+            return
+        other = self.groups[b]
+        if not group.collides(other):
+            raise ValueError(f"{a} and {b} do not collide, check the masks")
+        self.handlers.append((group, other, handler))
+
+    def sweep_static(self):
+        handlers = [(group.resolve(), handler) for group, handler in self.static_handlers]
+        sources = unique([source for source, _ in handlers if source.count])
+        if not sources:
+            return
+        x, y, w, h = self.columns(sources)
+        x0 = np.concatenate([s.prev_x for s in sources])
+        y0 = np.concatenate([s.prev_y for s in sources])
+        dx = x - x0
+        dy = y - y0
+        entity, box = self.static_grid.pairs(np.minimum(x0, x), np.minimum(y0, y), w + np.abs(dx), h + np.abs(dy))
+        bx, by, bw, bh = self.static_boxes
+        toi, side = sweep(x0[entity], y0[entity], pick(w, entity), pick(h, entity), dx[entity], dy[entity],
+                          bx[box], by[box], bw[box], bh[box])
+        # Pairs come sorted by entity, so each source's are one run
+        starts = starts_of(sources)
+        for source, handler in handlers:
+            if not source.count:
+                continue
+            if len(sources) == 1:
+                handler(entity, box, toi, side)
+                continue
+            start = starts[id(source)]
+            lo, hi = np.searchsorted(entity, (start, start + source.count)).tolist()
+            handler(entity[lo:hi] - start, box[lo:hi], toi[lo:hi], side[lo:hi])
+
+    def overlap(self):
+        # Query boxes come from the first group of each pair, the others are
+        # tested against them; the two sides may share groups
+        pairs = [(a.resolve(), b.resolve(), handler) for a, b, handler in self.handlers]
+        pairs = [(a, b, handler) for a, b, handler in pairs if a.count and b.count]
+        if not pairs:
+            return
+        queries = unique([a for a, _, _ in pairs])
+        boxes = unique([b for _, b, _ in pairs])
+        qx, qy, qw, qh = self.columns(queries)
+        tx, ty, tw, th = self.columns(boxes)
+        if len(qx) <= DENSE_QUERIES:
+            qw = qw[:, None] if np.ndim(qw) else qw
+            qh = qh[:, None] if np.ndim(qh) else qh
+            query, box = np.nonzero(overlap_mask(qx[:, None], qy[:, None], qw, qh, tx, ty, tw, th))
+        else:
+            self.grid.update(tx, ty, tw, th)
+            query, box = self.grid.pairs(qx, qy, qw, qh)
+        query_starts = starts_of(queries)
+        box_starts = starts_of(boxes)
+        if not len(query):
+            return
+        for a, b, handler in pairs:
+            rows = query
+            other = box
+            if len(queries) > 1:
+                # Pairs come sorted by query, so a's are one run
+                qa = query_starts[id(a)]
+                lo, hi = np.searchsorted(query, (qa, qa + a.count)).tolist()
+                rows = query[lo:hi] - qa
+                other = box[lo:hi]
+            if len(boxes) > 1:
+                tb = box_starts[id(b)]
+                keep = (other >= tb) & (other < tb + b.count)
+                rows = rows[keep]
+                other = other[keep] - tb
+            if a is b:
+                keep = rows != other
+                rows = rows[keep]
+                other = other[keep]
+            if len(rows):
+                handler(rows, other)
+
+    def columns(self, sources):
+        # x, y, w, h of the sources one after another. A single source is
+        # used as it is, so a store's sizes stay scalars.
+        if len(sources) == 1:
+            source = sources[0]
+            return source.x, source.y, source.w, source.h
+        key = tuple((s.count, s.w, s.h) if np.isscalar(s.w) and np.isscalar(s.h) else None for s in sources)
+        sizes = None if None in key else self.sizes.get(key)
+        if sizes is None:
+            sizes = (np.concatenate([np.full(s.count, s.w, dtype=np.float64) for s in sources]),
+                     np.concatenate([np.full(s.count, s.h, dtype=np.float64) for s in sources]))
+            if None not in key:
+                if len(self.sizes) > len(self.handlers) + len(self.static_handlers):
+                    self.sizes.clear()
+                self.sizes[key] = sizes
+        return (np.concatenate([s.x for s in sources]), np.concatenate([s.y for s in sources])) + sizes
+
+
+def unique(sources):
+    # In order, by identity
+    seen = []
+    for source in sources:
+        if not any(source is s for s in seen):
+            seen.append(source)
+    return seen
+
+
+def starts_of(sources):
+    # id(source) -> its first row in the concatenated columns
+    starts = {}
+    total = 0
+    for source in sources:
+        starts[id(source)] = total
+        total += source.count
+    return starts
+
+
+def pick(size, rows):
+    # Per-row sizes of a column that may be a scalar
+    return size[rows] if np.ndim(size) else size
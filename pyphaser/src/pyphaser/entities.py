@@ -0,0 +1,136 @@
+import numpy as np
+
+
+class EntityStore:
+    # Structure-of-arrays storage for many same-sized bodies (stars, bombs).
+    # Live entities occupy rows [0:count]; use the slices returned by the
+    # properties below and let numpy do the per-entity work. prev_x/prev_y
+    # hold the position before the last step, for render interpolation; they
+    # are rows of the same array so remove() keeps them lined up.
+    FIELDS = ("x", "y", "vx", "vy", "bounce", "prev_x", "prev_y")
+
+    def __init__(self, w, h, capacity=64):
+        self.w = w
+        self.h = h
+        self.count = 0
+        self._data = np.zeros((len(self.FIELDS), capacity), dtype=np.float64)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return self._data.shape[1]
+
+    @property
+    def x(self):
+        return self._data[0, :self.count]
+
+    @property
+    def y(self):
+        return self._data[1, :self.count]
+
+    @property
+    def vx(self):
+        return self._data[2, :self.count]
+
+    @property
+    def vy(self):
+        return self._data[3, :self.count]
+
+    @property
+    def bounce(self):
+        return self._data[4, :self.count]
+
+    @property
+    def prev_x(self):
+        return self._data[5, :self.count]
+
+    @property
+    def prev_y(self):
+        return self._data[6, :self.count]
+
+    def _reserve(self, count):
+        if count <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < count:
+            capacity *= 2
+        data = np.zeros((len(self.FIELDS), capacity), dtype=np.float64)
+        data[:, :self.count] = self._data[:, :self.count]
+        self._data = data
+
+    def spawn(self, x, y, vx=0.0, vy=0.0, bounce=0.0):
+        self._reserve(self.count + 1)
+        self._data[:, self.count] = (x, y, vx, vy, bounce, x, y)
+        self.count += 1
+        return self.count - 1
+
+    def spawn_many(self, x, y, vx=0.0, vy=0.0, bounce=0.0):
+        x = np.asarray(x, dtype=np.float64)
+        n = len(x)
+        start = self.count
+        self._reserve(start + n)
+        rows = self._data[:, start:start + n]
+        rows[0] = x
+        rows[1] = y
+        rows[2] = vx
+        rows[3] = vy
+        rows[4] = bounce
+        rows[5] = rows[0]
+        rows[6] = rows[1]
+        self.count += n
+        return np.arange(start, start + n)
+
+    def remove(self, mask):
+        # Drop every entity where mask is True, keeping the order of the rest
+        keep = ~np.asarray(mask, dtype=bool)
+        kept = int(keep.sum())
+        if kept == self.count:
+            return
+        self._data[:, :kept] = self._data[:, :self.count][:, keep]
+        self.count = kept
+
+    def take(self, mask):
+        # remove() that returns the dropped rows, all fields, as a copy
+        mask = np.asarray(mask, dtype=bool)
+        rows = self._data[:, :self.count][:, mask]
+        self.remove(mask)
+        return rows
+
+    def put(self, rows):
+        # Append rows returned by take(); their previous position is reset
+        # to the current one, whenever they were taken
+        count = rows.shape[1]
+        start = self.count
+        self._reserve(start + count)
+        self._data[:, start:start + count] = rows
+        self._data[5:7, start:start + count] = rows[0:2]
+        self.count += count
+
+    def clear(self):
+        self.count = 0
+
+    def save_positions(self):
+        self._data[5:7, :self.count] = self._data[0:2, :self.count]
+
+    def lerp(self, alpha):
+        # Positions blended from the previous to the current step
+        prev = self._data[5:7, :self.count]
+        return prev + (self._data[0:2, :self.count] - prev) * alpha
+
+    def snapshot(self):
+        # Copy of the live rows, for restore()
+        return self._data[:, :self.count].copy()
+
+    def restore(self, rows):
+        count = rows.shape[1]
+        self._reserve(count)
+        self._data[:, :count] = rows
+        self.count = count
+
+    def overlaps(self, x, y, w, h):
+        # Mask of entities whose box overlaps the box (x, y, w, h)
+        ex = self.x
+        ey = self.y
+        return (ex < x + w) & (x < ex + self.w) & (ey < y + h) & (y < ey + self.h)
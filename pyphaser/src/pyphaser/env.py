@@ -0,0 +1,352 @@
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from pyphaser import world
+from pyphaser.level import DEFAULT_LEVEL, load as load_level
+from pyphaser.replay import INPUTS
+
+# -------------------- Settings --------------------
+# Actions are the key bitmasks of the input logs: 1 left, 2 right, 4 up
+ACTION_COUNT = len(INPUTS)
+MAX_STEPS = 60 * 60 * 5  # episodes are truncated after five minutes of game time
+# The state vector is float32 in world units (pixels, px/s):
+#   player x, y, vx, vy, on_ground
+#   one (x, y, present) slot per star of the level's star row
+#   (x, y, vx, vy, present) for the MAX_BOMBS bombs nearest to the player
+# Empty slots are all zeros.
+PLAYER_FEATURES = 5
+STAR_FEATURES = 3
+BOMB_FEATURES = 5
+MAX_BOMBS = 8
+# Optional frame buffer: the world downscaled by FRAME_SCALE, one uint8
+# label per cell, painted in this order
+FRAME_SCALE = 8
+EMPTY, PLATFORM, STAR, BOMB, PLAYER = range(5)
+
+
+class Env:
+    # One game as a reinforcement-learning environment, with the same
+    # reset()/step() shape as a Gym environment. Observations are dicts with
+    # "state" (see the layout above) and, with frame=True, "frame". The
+    # reward is the number of stars collected by the step; an episode ends
+    # (terminated) when a bomb hits the player and is truncated at max_steps.
+    # Every action is held for `repeat` world steps.
+    def __init__(self, level=DEFAULT_LEVEL, seed=None, frame=False, max_steps=MAX_STEPS, repeat=1):
+        self.world = world.World(level=load_level(level))
+        self.frame = frame
+        self.max_steps = max_steps
+        self.repeat = repeat
+        self.seeds = random.Random(seed)
+        self.star_slots = len(self.world.level.stars)
+        self.state_size = PLAYER_FEATURES + STAR_FEATURES * self.star_slots + BOMB_FEATURES * MAX_BOMBS
+        self.frame_shape = (-(-self.world.height // FRAME_SCALE), -(-self.world.width // FRAME_SCALE))
+        self.platform_frame = np.zeros(self.frame_shape, dtype=np.uint8)
+        for platform in self.world.platforms:
+            self.paint(self.platform_frame, platform.x, platform.y, platform.w, platform.h, PLATFORM)
+
+    def reset(self, seed=None):
+        # Every episode gets a fresh world seed drawn from the env's own
+        # stream; passing a seed restarts that stream
+        if seed is not None:
+            self.seeds.seed(seed)
+        self.world.reset(self.seeds.randrange(2 ** 32))
+        return self.observe(), {"seed": self.world.seed}
+
+    def step(self, action):
+        reward, terminated, truncated = self.advance(action)
+        return self.observe(), reward, terminated, truncated, {"score": self.world.score}
+
+    def advance(self, action):
+        # The world steps of one action, as (reward, terminated, truncated)
+        game = self.world
+        score = game.score
+        inputs = INPUTS[action]
+        for _ in range(self.repeat):
+            game.step(inputs)
+            if game.game_over:
+                break
+        reward = (game.score - score) / world.STAR_SCORE
+        terminated = game.game_over
+        return reward, terminated, not terminated and game.frame >= self.max_steps
+
+    # -------------------- Observations --------------------
+    def observe(self, state=None, frame=None):
+        # Writes into the given arrays when there are any (rows of a vector
+        # env's batch), so stepping allocates nothing
+        if state is None:
+            state = np.empty(self.state_size, dtype=np.float32)
+        self.observe_state(state)
+        obs = {"state": state}
+        if self.frame:
+            if frame is None:
+                frame = np.empty(self.frame_shape, dtype=np.uint8)
+            self.observe_frame(frame)
+            obs["frame"] = frame
+        return obs
+
+    def observe_state(self, out):
+        game = self.world
+        player = game.player
+        out.fill(0.0)
+        out[:PLAYER_FEATURES] = player.x, player.y, player.vx, player.vy, player.on_ground
+        start = PLAYER_FEATURES
+        stars = game.stars
+        slots = out[start:start + STAR_FEATURES * self.star_slots].reshape(-1, STAR_FEATURES)
+        count = min(stars.count, self.star_slots)
+        slots[:count, 0] = stars.x[:count]
+        slots[:count, 1] = stars.y[:count]
+        slots[:count, 2] = 1.0
+        start += STAR_FEATURES * self.star_slots
+        bombs = game.bombs
+        slots = out[start:].reshape(-1, BOMB_FEATURES)
+        rows = slice(None)
+        if bombs.count > MAX_BOMBS:
+            distance = np.hypot(bombs.x - player.x, bombs.y - player.y)
+            rows = np.sort(np.argpartition(distance, MAX_BOMBS)[:MAX_BOMBS])
+        count = min(bombs.count, MAX_BOMBS)
+        slots[:count, 0] = bombs.x[rows]
+        slots[:count, 1] = bombs.y[rows]
+        slots[:count, 2] = bombs.vx[rows]
+        slots[:count, 3] = bombs.vy[rows]
+        slots[:count, 4] = 1.0
+        return out
+
+    def observe_frame(self, out):
+        game = self.world
+        out[:] = self.platform_frame
+        for store, label in ((game.stars, STAR), (game.bombs, BOMB)):
+            for x, y in zip(store.x.tolist(), store.y.tolist()):
+                self.paint(out, x, y, store.w, store.h, label)
+        player = game.player
+        self.paint(out, player.x, player.y, player.w, player.h, PLAYER)
+        return out
+
+    @staticmethod
+    def paint(frame, x, y, w, h, label):
+        # Every cell the box touches, clipped to the frame
+        rows, cols = frame.shape
+        x0 = min(max(int(x // FRAME_SCALE), 0), cols)
+        y0 = min(max(int(y // FRAME_SCALE), 0), rows)
+        x1 = min(max(int(-(-(x + w) // FRAME_SCALE)), 0), cols)
+        y1 = min(max(int(-(-(y + h) // FRAME_SCALE)), 0), rows)
+        frame[y0:y1, x0:x1] = label
+
+
+# -------------------- Vectorized --------------------
+class _Batch:
+    # The step results of all envs, one row per env. Kept in shared memory
+    # when worker processes fill them; workers attach by segment names.
+    FIELDS = ("state", "frame", "reward", "terminated", "truncated", "score")
+
+    def __init__(self, count, state_size, frame_shape, shared=False, names=None):
+        specs = {
+            "state": ((count, state_size), np.float32),
+            "frame": ((count, *frame_shape), np.uint8),
+            "reward": ((count,), np.float32),
+            "terminated": ((count,), np.bool_),
+            "truncated": ((count,), np.bool_),
+            "score": ((count,), np.int64),
+        }
+        self.memory = []
+        for i, name in enumerate(self.FIELDS):
+            shape, dtype = specs[name]
+            if names is not None:
+                memory = shared_memory.SharedMemory(name=names[i])
+            elif shared:
+                size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+                memory = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                setattr(self, name, np.zeros(shape, dtype=dtype))
+                continue
+            self.memory.append(memory)
+            setattr(self, name, np.ndarray(shape, dtype=dtype, buffer=memory.buf))
+
+    def names(self):
+        return [memory.name for memory in self.memory]
+
+    def rows(self, start, stop):
+        for name in self.FIELDS:
+            setattr(self, name, getattr(self, name)[start:stop])
+        return self
+
+    def close(self, unlink=False):
+        # The arrays must go before the buffers they point into
+        for name in self.FIELDS:
+            setattr(self, name, None)
+        for memory in self.memory:
+            memory.close()
+            if unlink:
+                memory.unlink()
+        self.memory = []
+
+
+class _Envs:
+    # A run of envs stepped in one call, writing into rows of a _Batch.
+    # Finished episodes are reset right away: the returned observation is
+    # the first of the next episode, while reward, terminated, truncated and
+    # score describe the step that ended the old one.
+    def __init__(self, count, first_seed, options, batch):
+        self.envs = [Env(seed=first_seed + i, **options) for i in range(count)]
+        self.batch = batch
+
+    def reset(self):
+        batch = self.batch
+        for i, env in enumerate(self.envs):
+            env.reset()
+            env.observe(batch.state[i], batch.frame[i])
+        batch.reward.fill(0.0)
+        batch.terminated.fill(False)
+        batch.truncated.fill(False)
+        batch.score.fill(0)
+
+    def step(self, actions):
+        batch = self.batch
+        for i, (env, action) in enumerate(zip(self.envs, actions.tolist())):
+            reward, terminated, truncated = env.advance(action)
+            batch.reward[i] = reward
+            batch.terminated[i] = terminated
+            batch.truncated[i] = truncated
+            batch.score[i] = env.world.score
+            if terminated or truncated:
+                env.reset()
+            env.observe(batch.state[i], batch.frame[i])
+
+
+def _worker(conn, names, count, start, stop, first_seed, options, state_size, frame_shape):
+    # Runs envs [start:stop] of a vector env of `count`
+    batch = _Batch(count, state_size, frame_shape, names=names).rows(start, stop)
+    envs = _Envs(stop - start, first_seed + start, options, batch)
+    try:
+        while True:
+            command, actions = conn.recv()
+            if command == "step":
+                envs.step(actions)
+            elif command == "reset":
+                envs.reset()
+            else:
+                break
+            conn.send(None)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        batch.close()
+
+
+class VectorEnv:
+    # `count` envs stepped in lockstep by one call: step(actions) takes one
+    # action per env and returns batched arrays, row i for env i (seeded
+    # seed + i). Envs reset themselves when their episode ends.
+    #
+    # With workers > 1 the envs are split across that many processes that
+    # write their rows straight into shared memory; only the action array
+    # crosses the pipe. A world step is Python- and numpy-call bound, so
+    # throughput scales with the processes rather than with the batch size.
+    def __init__(self, count, level=DEFAULT_LEVEL, seed=0, frame=False, max_steps=MAX_STEPS, repeat=1, workers=1):
+        self.count = count
+        self.frame = frame
+        options = {"level": level, "frame": frame, "max_steps": max_steps, "repeat": repeat}
+        probe = Env(**options)
+        self.state_size = probe.state_size
+        self.frame_shape = probe.frame_shape if frame else (0, 0)
+        workers = max(1, min(workers, count))
+        self.batch = _Batch(count, self.state_size, self.frame_shape, shared=workers > 1)
+        self.envs = None
+        self.workers = []
+        if workers == 1:
+            self.envs = _Envs(count, seed, options, self.batch)
+            return
+        bounds = np.linspace(0, count, workers + 1).astype(int).tolist()
+        for start, stop in zip(bounds, bounds[1:]):
+            conn, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_worker, daemon=True,
+                args=(child, self.batch.names(), count, start, stop, seed, options, self.state_size, self.frame_shape))
+            process.start()
+            child.close()
+            self.workers.append((conn, process, start, stop))
+
+    def _call(self, command, actions=None):
+        if self.envs is not None:
+            if command == "step":
+                self.envs.step(actions)
+            else:
+                self.envs.reset()
+            return
+        for conn, _, start, stop in self.workers:
+            conn.send((command, None if actions is None else actions[start:stop]))
+        for conn, *_ in self.workers:
+            conn.recv()
+
+    def observations(self):
+        obs = {"state": self.batch.state}
+        if self.frame:
+            obs["frame"] = self.batch.frame
+        return obs
+
+    def reset(self):
+        self._call("reset")
+        return self.observations(), {}
+
+    def step(self, actions):
+        # The returned arrays are reused by the next call; copy what you keep
+        actions = np.asarray(actions, dtype=np.int64)
+        if actions.shape != (self.count,):
+            raise ValueError(f"expected {self.count} actions, got shape {actions.shape}")
+        self._call("step", actions)
+        batch = self.batch
+        return self.observations(), batch.reward, batch.terminated, batch.truncated, {"score": batch.score}
+
+    def close(self):
+        for conn, process, *_ in self.workers:
+            try:
+                conn.send(("close", None))
+            except OSError:
+                pass
+            process.join(timeout=5)
+            conn.close()
+        self.workers = []
+        self.batch.close(unlink=self.envs is None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    # Throughput check: step a vector env with random actions
+    parser = argparse.ArgumentParser(description="Measure the training environment's step rate")
+    parser.add_argument("-n", "--envs", type=int, default=64)
+    parser.add_argument("-j", "--workers", type=int, default=1)
+    parser.add_argument("--steps", type=int, default=200, help="vector steps to time")
+    parser.add_argument("--frame", action="store_true", help="also produce frame buffers")
+    parser.add_argument("--level", default=DEFAULT_LEVEL)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    actions = rng.integers(0, ACTION_COUNT, size=(args.steps, args.envs))
+    with VectorEnv(args.envs, args.level, args.seed, args.frame, workers=args.workers) as env:
+        env.reset()
+        episodes = 0
+        start = time.perf_counter()
+        for row in actions:
+            _, _, terminated, truncated, _ = env.step(row)
+            episodes += int(terminated.sum() + truncated.sum())
+        elapsed = time.perf_counter() - start
+    steps = args.steps * args.envs
+    print(f"{steps / elapsed:.0f} env steps/s ({args.envs} envs, {args.workers} workers)", file=sys.stderr)
+    print(json.dumps({"envs": args.envs, "workers": args.workers, "steps": steps,
+                      "episodes": episodes, "steps_per_second": steps / elapsed}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import mmap
+import os
+from pathlib import Path
+
+import numpy as np
+
+from pyphaser.assets import cache_dir
+from pyphaser.spatial import UniformGrid
+
+# -------------------- Settings --------------------
+LEVELS = Path(__file__).parent / "levels"
+DEFAULT_LEVEL = "default"
+CELL_SIZE = 128
+
+# Compiled level cache: MAGIC, a little-endian uint32 header length, a JSON
+# header, then raw arrays, each starting on an ALIGN boundary so they can be
+# mapped straight from the file
+MAGIC = b"PYPHLVL1"
+FORMAT_VERSION = 1
+ALIGN = 64
+
+
+class Level:
+    def __init__(self, name, width, height, player_start, stars, platforms, grid):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.player_start = tuple(player_start)
+        # Star row x positions, respawned together
+        self.stars = list(stars)
+        # (K, 4) array of merged static collision rects (x, y, w, h)
+        self.platforms = platforms
+        self.grid = grid
+
+    @classmethod
+    def from_dict(cls, data, name=None, cell_size=CELL_SIZE):
+        platforms = merge_rects(np.array(data["platforms"], dtype=np.float64).reshape(-1, 4))
+        grid = UniformGrid(cell_size)
+        grid.build(*platforms.T)
+        return cls(name or data.get("name", "level"), data["width"], data["height"],
+                   data["player_start"], star_row(data["stars"]), platforms, grid)
+
+
+def star_row(stars):
+    # Either an explicit list of x positions or {"start_x", "step_x", "count"}
+    if isinstance(stars, dict):
+        return [stars["start_x"] + i * stars["step_x"] for i in range(stars["count"])]
+    return list(stars)
+
+
+# -------------------- Geometry --------------------
+def _merge_pass(rects, line, start, size):
+    # Join rects that share a row (same `line` coordinate and thickness) and
+    # touch or overlap along the other axis
+    if len(rects) < 2:
+        return rects
+    thickness = 3 if size == 2 else 2
+    order = np.lexsort((rects[:, start], rects[:, thickness], rects[:, line]))
+    merged = []
+    for rect in rects[order].tolist():
+        last = merged[-1] if merged else None
+        if (last is not None and last[line] == rect[line] and last[thickness] == rect[thickness]
+                and rect[start] <= last[start] + last[size]):
+            last[size] = max(last[start] + last[size], rect[start] + rect[size]) - last[start]
+        else:
+            merged.append(rect)
+    return np.array(merged, dtype=np.float64).reshape(-1, 4)
+
+
+def merge_rects(rects):
+    # Horizontal runs first (tile rows), then stack equal runs vertically
+    rects = _merge_pass(rects, 1, 0, 2)
+    return _merge_pass(rects, 0, 1, 3)
+
+
+# -------------------- Compiled cache --------------------
+def write_compiled(path, level, source_hash):
+    arrays = {"platforms": np.ascontiguousarray(level.platforms)}
+    arrays.update({f"grid_{name}": np.ascontiguousarray(value) for name, value in level.grid.arrays().items()})
+    header = {
+        "version": FORMAT_VERSION,
+        "source": source_hash,
+        "name": level.name,
+        "width": level.width,
+        "height": level.height,
+        "player_start": list(level.player_start),
+        "stars": level.stars,
+        "cell_size": level.grid.cell_size,
+        "arrays": {},
+    }
+    # Array offsets count from the first aligned byte after the header
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = [array.dtype.str, list(array.shape), offset]
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    encoded = json.dumps(header).encode()
+    data_start = -(-(len(MAGIC) + 4 + len(encoded)) // ALIGN) * ALIGN
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(encoded).to_bytes(4, "little"))
+        f.write(encoded)
+        for name, array in arrays.items():
+            f.seek(data_start + header["arrays"][name][2])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+
+def read_compiled(path, source_hash=None):
+    # Returns None when the file is missing, foreign, stale or damaged, so
+    # the caller compiles the level again
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if buffer[:len(MAGIC)] != MAGIC:
+        return None
+    # A file cut short or garbled past the magic fails somewhere in here:
+    # bad JSON, missing keys, or arrays running off the end of the buffer
+    try:
+        length = int.from_bytes(buffer[len(MAGIC):len(MAGIC) + 4], "little")
+        header = json.loads(buffer[len(MAGIC) + 4:len(MAGIC) + 4 + length])
+        if header["version"] != FORMAT_VERSION or (source_hash is not None and header["source"] != source_hash):
+            return None
+        data_start = -(-(len(MAGIC) + 4 + length) // ALIGN) * ALIGN
+        arrays = {}
+        for name, (dtype, shape, offset) in header["arrays"].items():
+            count = int(np.prod(shape))
+            arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                         offset=data_start + offset).reshape(shape)
+        grid_arrays = {name[len("grid_"):]: value for name, value in arrays.items() if name.startswith("grid_")}
+        grid = UniformGrid.from_arrays(header["cell_size"], grid_arrays)
+        return Level(header["name"], header["width"], header["height"], header["player_start"],
+                     header["stars"], arrays["platforms"], grid)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def level_path(name_or_path):
+    path = Path(name_or_path)
+    if path.suffix or path.exists():
+        return path
+    return LEVELS / f"{name_or_path}.json"
+
+
+def load(name_or_path=DEFAULT_LEVEL, cell_size=CELL_SIZE, use_cache=True):
+    # Load a JSON level through its compiled cache, compiling on first use or
+    # whenever the source file (or the cell size) changed
+    path = level_path(name_or_path)
+    source = path.read_bytes()
+    digest = hashlib.sha1(source + f"|{cell_size}|{FORMAT_VERSION}".encode()).hexdigest()
+    cached = cache_dir("levels") / f"{path.stem}-{digest[:16]}.bin"
+    if use_cache:
+        level = read_compiled(cached, digest)
+        if level is not None:
+            return level
+    level = Level.from_dict(json.loads(source), name=path.stem, cell_size=cell_size)
+    if use_cache:
+        try:
+            write_compiled(cached, level, digest)
+        except OSError:
+            pass
+    return level
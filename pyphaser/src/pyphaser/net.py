@@ -0,0 +1,616 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import socket
+import struct
+import sys
+import time
+import zlib
+from collections import deque
+
+import numpy as np
+
+from pyphaser import world
+from pyphaser.batch import chase_policy
+from pyphaser.level import DEFAULT_LEVEL, load as load_level
+from pyphaser.replay import INPUTS, pack_inputs
+from pyphaser.savestate import FACINGS
+from pyphaser.timestep import FixedStep
+
+# -------------------- Settings --------------------
+# The server is authoritative: each match runs a World at the fixed world.DT
+# tick and sends every client a snapshot each SNAPSHOT_EVERY ticks. Clients
+# send their inputs, move their own player straight away (prediction) and
+# correct it when the server's result for those inputs comes back.
+PORT = 7777
+HOST = "127.0.0.1"  # only this machine; 0.0.0.0 to take players from the network
+MATCH_PLAYERS = 4
+# Every match is a full World stepped 60 times a second, so one process only
+# runs so many; JOINs past that are turned away
+MAX_MATCHES = 16
+MAX_MATCH_PLAYERS = 16
+SNAPSHOT_EVERY = 2  # 30 snapshots per second
+SNAPSHOT_HISTORY = 32  # snapshots a match keeps as delta baselines, about a second
+INPUT_REDUNDANCY = 8  # inputs repeated in every input packet, so losing one costs nothing
+INPUT_BUFFER = 8  # inputs a client may run ahead of its match before old ones are dropped
+ROUND_RESTART = 180  # ticks from game over to the next round
+CLIENT_TIMEOUT = 5.0  # seconds of silence before a client's slot is freed
+JOIN_RETRY = 0.5
+MAX_DATAGRAM = 65507
+# Snapshots are quantized to int32 and sent as the difference to the last
+# snapshot the client acknowledged: whatever did not move is zero, and the
+# zeros compress away
+POSITION_SCALE = 8  # 1/8 px
+VELOCITY_SCALE = 4  # 1/4 px/s
+COMPRESS_LEVEL = 1
+
+# -------------------- Protocol --------------------
+# Datagrams start with their type byte
+JOIN, WELCOME, INPUT, SNAPSHOT, LEAVE, FULL = range(1, 7)
+NO_TICK = 0xFFFFFFFF
+# JOIN: type, then the UTF-8 match name (empty: any match with room)
+JOIN_HEADER = struct.Struct("<B")
+# WELCOME: type, match id, slot, players, then the UTF-8 level name
+# FULL: type only, the answer to a JOIN when no match can take the client
+WELCOME_HEADER = struct.Struct("<BIBB")
+# INPUT: type, newest snapshot tick received, sequence number of the newest
+# input, then the key bitmasks of the last inputs, oldest first
+INPUT_HEADER = struct.Struct("<BII")
+# SNAPSHOT: type, tick, base tick (NO_TICK: not a delta), sequence number of
+# the client's last input applied, then the compressed sections
+SNAPSHOT_HEADER = struct.Struct("<BIII")
+# Snapshot sections, one int32 row per field:
+#   match:   round, frame, score, game_over
+#   players: x, y, vx, vy, flags (1 on ground, 2 alive, facing << 2), score
+#   stars:   x, y
+#   bombs:   x, y
+SECTION_FIELDS = (4, 6, 2, 2)
+# Compressed body: a bitmask of the sections sent as differences and the
+# column count of every section, then the sections
+SECTION_HEADER = struct.Struct("<B4H")
+
+
+def quantize(game, round_number):
+    players = [(p.x * POSITION_SCALE, p.y * POSITION_SCALE, p.vx * VELOCITY_SCALE, p.vy * VELOCITY_SCALE,
+                p.on_ground | p.alive << 1 | FACINGS.index(p.facing) << 2, p.score) for p in game.players]
+    return [
+        np.array([[round_number], [game.frame], [game.score], [game.game_over]], dtype=np.int32),
+        np.rint(np.array(players, dtype=np.float64).T).astype(np.int32),
+        np.rint(np.stack([game.stars.x, game.stars.y]) * POSITION_SCALE).astype(np.int32),
+        np.rint(np.stack([game.bombs.x, game.bombs.y]) * POSITION_SCALE).astype(np.int32),
+    ]
+
+
+def encode(sections, base=None):
+    # A section the same shape as in base goes as the difference to it
+    deltas = 0
+    data = []
+    for i, section in enumerate(sections):
+        if base is not None and base[i].shape == section.shape:
+            deltas |= 1 << i
+            section = section - base[i]
+        data.append(section.tobytes())
+    header = SECTION_HEADER.pack(deltas, *(section.shape[1] for section in sections))
+    return zlib.compress(header + b"".join(data), COMPRESS_LEVEL)
+
+
+def decode(body, base=None):
+    data = zlib.decompress(body)
+    deltas, *counts = SECTION_HEADER.unpack_from(data)
+    offset = SECTION_HEADER.size
+    sections = []
+    for i, (fields, count) in enumerate(zip(SECTION_FIELDS, counts)):
+        section = np.frombuffer(data, np.int32, fields * count, offset).reshape(fields, count)
+        offset += section.nbytes
+        if deltas >> i & 1:
+            if base is None:
+                raise ValueError("delta snapshot without a base")
+            section = base[i] + section
+        sections.append(section)
+    return sections
+
+
+# -------------------- Server --------------------
+class Peer:
+    # A client as the server sees it. Inputs are applied one per tick in
+    # sequence order; while none is waiting the player holds still rather
+    # than guessing, so the client's prediction of every input stays exact.
+    def __init__(self, address, match, slot, now):
+        self.address = address
+        self.match = match
+        self.slot = slot
+        self.seen = now
+        self.inputs = deque()
+        self.received = 0  # sequence number of the newest input queued
+        self.applied = 0  # ... and of the last one applied
+        self.ack = NO_TICK
+
+    def receive(self, ack, seq, masks, now):
+        # Key bitmasks index INPUTS; a packet with any other byte is not
+        # from a client of ours and is dropped whole
+        if any(mask >= len(INPUTS) for mask in masks):
+            return
+        self.seen = now
+        if ack != NO_TICK and (self.ack == NO_TICK or ack > self.ack):
+            self.ack = ack
+        first = seq - len(masks) + 1
+        # Of a gap longer than the buffer only the last INPUT_BUFFER inputs
+        # would be kept, so skip straight to those
+        if first - 1 - self.received > INPUT_BUFFER:
+            self.inputs.clear()
+            self.received = self.applied = first - 1 - INPUT_BUFFER
+        # Inputs lost beyond the redundancy count as no keys, which keeps
+        # the sequence numbers lined up with the client's
+        while self.received + 1 < first:
+            self.inputs.append(0)
+            self.received += 1
+        for number, mask in enumerate(masks, first):
+            if number > self.received:
+                self.inputs.append(mask)
+                self.received = number
+        while len(self.inputs) > INPUT_BUFFER:
+            self.inputs.popleft()
+            self.applied += 1
+
+    def next_inputs(self):
+        if not self.inputs:
+            return None
+        self.applied += 1
+        return INPUTS[self.inputs.popleft()]
+
+
+class Match:
+    # One round after another of the game for up to `capacity` clients.
+    # Slots nobody has joined hold a dead player.
+    def __init__(self, match_id, name, level, capacity=MATCH_PLAYERS):
+        self.id = match_id
+        self.name = name
+        self.level = level
+        self.world = world.World(level=load_level(level), players=capacity)
+        self.peers = [None] * capacity
+        self.round = 0
+        self.tick = 0
+        self.restart = None
+        self.history = {}
+        self.start_round()
+
+    def __len__(self):
+        return sum(peer is not None for peer in self.peers)
+
+    @property
+    def full(self):
+        return None not in self.peers
+
+    def start_round(self):
+        self.round += 1
+        self.restart = None
+        self.world.reset(random.randrange(2 ** 32))
+        for player, peer in zip(self.world.players, self.peers):
+            player.alive = peer is not None
+
+    def join(self, address, now):
+        slot = self.peers.index(None)
+        peer = self.peers[slot] = Peer(address, self, slot, now)
+        player = self.world.players[slot]
+        if not self.world.game_over:
+            player.x, player.y = map(float, self.world.level.player_start)
+            player.vx = player.vy = 0.0
+            player.alive = True
+        return peer
+
+    def leave(self, peer):
+        self.peers[peer.slot] = None
+        self.world.players[peer.slot].alive = False
+
+    def step(self):
+        self.tick += 1
+        game = self.world
+        inputs = [peer.next_inputs() if peer is not None else None for peer in self.peers]
+        if game.game_over:
+            if self.restart is None:
+                self.restart = self.tick + ROUND_RESTART
+            elif self.tick >= self.restart:
+                self.start_round()
+        game.step(inputs)
+
+    def snapshot(self):
+        sections = quantize(self.world, self.round)
+        self.history[self.tick] = sections
+        self.history.pop(self.tick - SNAPSHOT_HISTORY * SNAPSHOT_EVERY, None)
+        return sections
+
+
+class Server(asyncio.DatagramProtocol):
+    # Every match of the process is stepped from one fixed-tick loop, see
+    # run(); datagrams are handled as they arrive in between
+    def __init__(self, level=DEFAULT_LEVEL, capacity=MATCH_PLAYERS, max_matches=MAX_MATCHES):
+        if not 1 <= capacity <= MAX_MATCH_PLAYERS:
+            raise ValueError(f"players per match must be between 1 and {MAX_MATCH_PLAYERS}")
+        self.level = str(level)
+        self.capacity = capacity
+        self.max_matches = max_matches
+        self.matches = {}
+        self.peers = {}
+        self.transport = None
+        self.next_match = 1
+        self.snapshots_sent = 0
+        self.delta_snapshots = 0
+        self.bytes_sent = 0
+
+    @classmethod
+    async def open(cls, host=HOST, port=PORT, **kwargs):
+        loop = asyncio.get_running_loop()
+        _, server = await loop.create_datagram_endpoint(lambda: cls(**kwargs), local_addr=(host, port))
+        return server
+
+    @property
+    def address(self):
+        return self.transport.get_extra_info("sockname")
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def error_received(self, exc):
+        # ICMP errors from clients that went away; their timeout frees the slot
+        pass
+
+    def datagram_received(self, data, address):
+        now = time.monotonic()
+        try:
+            kind = data[0]
+            peer = self.peers.get(address)
+            if kind == JOIN:
+                if peer is None:
+                    peer = self.join(address, data[JOIN_HEADER.size:].decode(), now)
+                if peer is None:
+                    self.transport.sendto(bytes([FULL]), address)
+                else:
+                    self.welcome(peer)
+            elif peer is None:
+                return
+            elif kind == INPUT:
+                _, ack, seq = INPUT_HEADER.unpack_from(data)
+                peer.receive(ack, seq, data[INPUT_HEADER.size:], now)
+            elif kind == LEAVE:
+                self.drop(peer)
+        except (IndexError, struct.error, UnicodeDecodeError):
+            pass  # not one of ours
+
+    def join(self, address, name, now):
+        # None when every match of that name is full and there is no room
+        # for another one
+        match = next((m for m in self.matches.values() if m.name == name and not m.full), None)
+        if match is None:
+            if len(self.matches) >= self.max_matches:
+                return None
+            match = Match(self.next_match, name, self.level, self.capacity)
+            self.matches[match.id] = match
+            self.next_match += 1
+        peer = self.peers[address] = match.join(address, now)
+        return peer
+
+    def welcome(self, peer):
+        match = peer.match
+        self.transport.sendto(WELCOME_HEADER.pack(WELCOME, match.id, peer.slot, len(match.peers))
+                              + match.level.encode(), peer.address)
+
+    def drop(self, peer):
+        del self.peers[peer.address]
+        match = peer.match
+        match.leave(peer)
+        if not len(match):
+            del self.matches[match.id]
+
+    def step(self):
+        for match in list(self.matches.values()):
+            match.step()
+            if match.tick % SNAPSHOT_EVERY == 0:
+                self.send_snapshots(match)
+
+    def send_snapshots(self, match):
+        sections = match.snapshot()
+        # Clients that acknowledged the same snapshot share one encoding
+        bodies = {}
+        for peer in match.peers:
+            if peer is None:
+                continue
+            base = peer.ack if peer.ack in match.history else NO_TICK
+            body = bodies.get(base)
+            if body is None:
+                body = bodies[base] = encode(sections, match.history.get(base))
+            packet = SNAPSHOT_HEADER.pack(SNAPSHOT, match.tick, base, peer.applied) + body
+            self.transport.sendto(packet, peer.address)
+            self.snapshots_sent += 1
+            self.delta_snapshots += base != NO_TICK
+            self.bytes_sent += len(packet)
+
+    def expire(self, now):
+        for peer in [peer for peer in self.peers.values() if now - peer.seen > CLIENT_TIMEOUT]:
+            self.drop(peer)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        stepper = FixedStep()
+        last = loop.time()
+        while True:
+            await asyncio.sleep(max(stepper.dt - stepper.accumulator, 0.0))
+            now = loop.time()
+            for _ in range(stepper.advance(now - last)):
+                self.step()
+            last = now
+            self.expire(time.monotonic())
+
+    def close(self):
+        self.transport.close()
+
+
+# -------------------- Client --------------------
+class Client:
+    # Plays one slot of a match over a non-blocking socket, so it works from
+    # a plain game loop as well as from asyncio. Call update() once per
+    # world step with the local inputs. After the server's WELCOME, `world`
+    # mirrors the match: the local player is predicted and reconciled, the
+    # rest is set from the snapshots.
+    def __init__(self, address, match=""):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+        self.socket.connect(address)
+        self.match = match
+        self.world = None
+        self.full = False  # the server had no room
+        self.player = None
+        self.slot = None
+        self.match_id = None
+        self.seq = 0
+        self.pending = deque()  # (seq, inputs) not applied by the server yet
+        self.baselines = {}
+        self.ack = NO_TICK
+        self.round = 0
+        self.joined_at = -math.inf
+        self.snapshot_time = 0.0
+        self.snapshots = 0
+        self.bytes_received = 0
+        self.correction = 0.0  # distance the last reconcile moved the player
+        self.max_correction = 0.0
+
+    @classmethod
+    def connect(cls, address, match="", timeout=5.0):
+        # Blocks until the server has answered the join
+        client = cls(address, match)
+        deadline = time.monotonic() + timeout
+        while client.world is None:
+            if client.full:
+                client.close()
+                raise ConnectionError(f"{address[0]}:{address[1]} has no room for another player")
+            if time.monotonic() > deadline:
+                client.close()
+                raise TimeoutError(f"no answer from {address[0]}:{address[1]}")
+            client.poll()
+            client.join()
+            time.sleep(0.01)
+        return client
+
+    def send(self, packet):
+        try:
+            self.socket.send(packet)
+        except (BlockingIOError, ConnectionRefusedError):
+            pass  # UDP: a lost packet either way
+
+    def join(self):
+        now = time.monotonic()
+        if self.world is None and now - self.joined_at >= JOIN_RETRY:
+            self.joined_at = now
+            self.send(JOIN_HEADER.pack(JOIN) + self.match.encode())
+
+    def close(self):
+        if self.world is not None:
+            self.send(bytes([LEAVE]))
+        self.socket.close()
+
+    def update(self, inputs):
+        self.poll()
+        if self.world is None:
+            self.join()
+            return
+        self.seq += 1
+        self.pending.append((self.seq, inputs))
+        masks = bytes(pack_inputs(i) for _, i in list(self.pending)[-INPUT_REDUNDANCY:])
+        self.send(INPUT_HEADER.pack(INPUT, self.ack, self.seq) + masks)
+        player = self.player
+        player.prev_x = player.x
+        player.prev_y = player.y
+        if player.alive and not self.world.game_over:
+            self.world.update_player(player, inputs, world.DT)
+
+    def poll(self):
+        while True:
+            try:
+                data = self.socket.recv(MAX_DATAGRAM)
+            except BlockingIOError:
+                return
+            except ConnectionRefusedError:
+                continue  # nothing listening (yet); join() keeps asking
+            try:
+                if data[0] == WELCOME:
+                    self.welcome(data)
+                elif data[0] == FULL and self.world is None:
+                    self.full = True
+                elif data[0] == SNAPSHOT and self.world is not None:
+                    self.receive(data)
+            except (IndexError, ValueError, struct.error, zlib.error):
+                pass  # not one of ours, or a delta on a base we never got
+
+    def welcome(self, data):
+        if self.world is not None:
+            return
+        _, self.match_id, self.slot, players = WELCOME_HEADER.unpack_from(data)
+        level = data[WELCOME_HEADER.size:].decode()
+        self.world = world.World(level=load_level(level), players=players)
+        # The local player is the one front-ends and bots look at
+        self.player = self.world.player = self.world.players[self.slot]
+
+    def receive(self, data):
+        _, tick, base, applied = SNAPSHOT_HEADER.unpack_from(data)
+        if self.ack != NO_TICK and tick <= self.ack:
+            return  # late or duplicate
+        if base != NO_TICK and base not in self.baselines:
+            return
+        sections = decode(data[SNAPSHOT_HEADER.size:], self.baselines.get(base))
+        self.baselines[tick] = sections
+        for old in [t for t in self.baselines if t < tick - SNAPSHOT_HISTORY * SNAPSHOT_EVERY]:
+            del self.baselines[old]
+        self.ack = tick
+        self.snapshots += 1
+        self.bytes_received += len(data)
+        self.snapshot_time = time.monotonic()
+        self.apply(sections, applied)
+
+    def apply(self, sections, applied):
+        game = self.world
+        self.round, game.frame, game.score, game_over = sections[0][:, 0].tolist()
+        game.game_over = bool(game_over)
+        for slot, (player, state) in enumerate(zip(game.players, sections[1].T.tolist())):
+            if slot == self.slot:
+                self.reconcile(state, applied)
+            else:
+                player.prev_x = player.x
+                player.prev_y = player.y
+                set_player(player, state)
+        set_store(game.stars, sections[2])
+        set_store(game.bombs, sections[3])
+
+    def reconcile(self, state, applied):
+        # Start again from the server's state after the last input it
+        # applied and replay the inputs it has not seen yet
+        player = self.player
+        x, y = player.x, player.y
+        set_player(player, state)
+        while self.pending and self.pending[0][0] <= applied:
+            self.pending.popleft()
+        if player.alive and not self.world.game_over:
+            for _, inputs in self.pending:
+                self.world.update_player(player, inputs, world.DT)
+        self.correction = math.hypot(player.x - x, player.y - y)
+        self.max_correction = max(self.max_correction, self.correction)
+        # Corrections are drawn as part of the move, not as a jump
+        player.prev_x += player.x - x
+        player.prev_y += player.y - y
+
+    def alpha(self, now=None):
+        # How far the snapshot interval has run since the last snapshot, for
+        # drawing everything but the local player between the last two
+        now = time.monotonic() if now is None else now
+        return min((now - self.snapshot_time) / (SNAPSHOT_EVERY * world.DT), 1.0)
+
+
+def set_player(player, state):
+    x, y, vx, vy, flags, score = state
+    player.x = x / POSITION_SCALE
+    player.y = y / POSITION_SCALE
+    player.vx = vx / VELOCITY_SCALE
+    player.vy = vy / VELOCITY_SCALE
+    player.on_ground = bool(flags & 1)
+    player.alive = bool(flags & 2)
+    player.facing = FACINGS[flags >> 2]
+    player.score = score
+
+
+def set_store(store, section):
+    # Entities keep their position as the previous one when the count did
+    # not change, so they can be drawn moving between two snapshots
+    count = section.shape[1]
+    rows = np.zeros((len(store.FIELDS), count))
+    rows[0:2] = section / POSITION_SCALE
+    rows[5:7] = store.snapshot()[0:2] if store.count == count else rows[0:2]
+    store.restore(rows)
+
+
+# -------------------- Localhost run --------------------
+async def run_bot(address, match, seconds, seed):
+    # A chase bot on its own client, stepping at the world tick
+    client = Client(address, match)
+    rng = random.Random(seed)
+    loop = asyncio.get_running_loop()
+    stepper = FixedStep()
+    last = start = loop.time()
+    while last - start < seconds:
+        await asyncio.sleep(max(stepper.dt - stepper.accumulator, 0.0))
+        now = loop.time()
+        for _ in range(stepper.advance(now - last)):
+            game = client.world
+            client.update(chase_policy(game, rng) if game is not None and client.player.alive else world.Inputs())
+        last = now
+    client.close()
+    return client
+
+
+async def run_local(host, port, level, capacity, bots, matches, seconds, max_matches=MAX_MATCHES):
+    # Server and bots in one event loop over the loopback interface
+    server = await Server.open(host, port, level=level, capacity=capacity, max_matches=max_matches)
+    ticker = asyncio.create_task(server.run())
+    try:
+        address = server.address[:2]
+        clients = await asyncio.gather(*(run_bot(address, f"match-{i % matches}", seconds, i)
+                                         for i in range(bots)))
+    finally:
+        ticker.cancel()
+        server.close()
+    return {
+        "level": str(level),
+        "matches": len({client.match_id for client in clients if client.world is not None}),
+        "clients": bots,
+        "joined": sum(client.world is not None for client in clients),
+        "snapshots_sent": server.snapshots_sent,
+        "delta_ratio": server.delta_snapshots / max(server.snapshots_sent, 1),
+        "bytes_per_snapshot": server.bytes_sent / max(server.snapshots_sent, 1),
+        "snapshots_received": sum(client.snapshots for client in clients),
+        "max_correction_px": max(client.max_correction for client in clients),
+        "scores": sorted((client.player.score for client in clients if client.player is not None), reverse=True),
+    }
+
+
+async def serve(host, port, level, capacity, max_matches=MAX_MATCHES):
+    server = await Server.open(host, port, level=level, capacity=capacity, max_matches=max_matches)
+    print(f"serving {level} on {server.address[0]}:{server.address[1]}", file=sys.stderr)
+    try:
+        await server.run()
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Authoritative multiplayer server")
+    parser.add_argument("--host", default=HOST, help="address to listen on, 0.0.0.0 for every interface")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--level", default=DEFAULT_LEVEL, help="level name or path to a level JSON file")
+    parser.add_argument("--players", type=int, default=MATCH_PLAYERS, help="players per match")
+    parser.add_argument("--max-matches", type=int, default=MAX_MATCHES,
+                        help="matches this server runs at once; JOINs past that are turned away")
+    parser.add_argument("--bots", type=int,
+                        help="run this many bot clients against the server over localhost, print a "
+                             "JSON report and exit")
+    parser.add_argument("--matches", type=int, default=1, help="spread the bots over this many matches")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long the bots play")
+    args = parser.parse_args(argv)
+    if not 1 <= args.players <= MAX_MATCH_PLAYERS:
+        parser.error(f"--players must be between 1 and {MAX_MATCH_PLAYERS}")
+    if args.max_matches < 1:
+        parser.error("--max-matches must be at least 1")
+
+    try:
+        if args.bots:
+            host = HOST if args.host == "0.0.0.0" else args.host
+            port = 0 if args.port == PORT else args.port
+            report = asyncio.run(run_local(host, port, args.level, args.players, args.bots, args.matches,
+                                           args.seconds, args.max_matches))
+            print(json.dumps(report, indent=2))
+        else:
+            asyncio.run(serve(args.host, args.port, args.level, args.players, args.max_matches))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
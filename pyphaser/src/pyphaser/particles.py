@@ -0,0 +1,144 @@
+import numpy as np
+
+# -------------------- Settings --------------------
+# Particles are cosmetic. They live in world space (y down, pixels, seconds)
+# like everything else, but run on their own random stream and the frame
+# time, so replays, save states and batch runs never see them.
+CAPACITY = 1024
+# One emitter per world event kind (see World.events): particles per burst,
+# speed and lifetime ranges, gravity in px/s^2 and the color they are drawn in
+BURSTS = {
+    "star": {"count": 24, "speed": (60.0, 220.0), "life": (0.35, 0.7), "gravity": 600.0, "color": (255, 220, 64)},
+    "hit": {"count": 160, "speed": (120.0, 480.0), "life": (0.6, 1.4), "gravity": 900.0, "color": (255, 96, 32)},
+}
+
+
+class Emitter:
+    # Structure-of-arrays particle storage, like EntityStore: live particles
+    # occupy columns [0:count] of one float32 array. update(dt) moves all of
+    # them at once and drops the ones that lived out their lifetime, so a
+    # front-end draws rows [0:count] in one batch and never sees a dead one.
+    FIELDS = ("x", "y", "vx", "vy", "age", "life")
+
+    def __init__(self, count, speed, life, gravity, color, capacity=CAPACITY, random=None):
+        self.burst_count = count
+        self.speed = speed
+        self.life_range = life
+        self.gravity = gravity
+        self.color = color
+        self.random = random if random is not None else np.random.default_rng()
+        self.count = 0
+        self._data = np.zeros((len(self.FIELDS), capacity), dtype=np.float32)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return self._data.shape[1]
+
+    @property
+    def x(self):
+        return self._data[0, :self.count]
+
+    @property
+    def y(self):
+        return self._data[1, :self.count]
+
+    @property
+    def vx(self):
+        return self._data[2, :self.count]
+
+    @property
+    def vy(self):
+        return self._data[3, :self.count]
+
+    @property
+    def age(self):
+        return self._data[4, :self.count]
+
+    @property
+    def life(self):
+        return self._data[5, :self.count]
+
+    def fade(self):
+        # 1 when a particle is born, falling to 0 at the end of its life
+        return 1.0 - self.age / self.life
+
+    def _reserve(self, count):
+        if count <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < count:
+            capacity *= 2
+        data = np.zeros((len(self.FIELDS), capacity), dtype=np.float32)
+        data[:, :self.count] = self._data[:, :self.count]
+        self._data = data
+
+    def burst(self, x, y, count=None):
+        # count particles (default: the emitter's burst size) flying out of
+        # (x, y) in all directions
+        count = self.burst_count if count is None else count
+        random = self.random
+        start = self.count
+        self._reserve(start + count)
+        angle = random.uniform(0.0, 2 * np.pi, count)
+        speed = random.uniform(*self.speed, count)
+        rows = self._data[:, start:start + count]
+        rows[0] = x
+        rows[1] = y
+        rows[2] = np.cos(angle) * speed
+        rows[3] = np.sin(angle) * speed
+        rows[4] = 0.0
+        rows[5] = random.uniform(*self.life_range, count)
+        self.count += count
+
+    def update(self, dt):
+        if not self.count:
+            return
+        live = self._data[:, :self.count]
+        live[3] += self.gravity * dt
+        live[0] += live[2] * dt
+        live[1] += live[3] * dt
+        live[4] += dt
+        dead = live[4] >= live[5]
+        holes = np.flatnonzero(dead)
+        if not len(holes):
+            return
+        # Order does not matter here, so instead of compacting every row the
+        # survivors past the new end move into the holes before it
+        kept = self.count - len(holes)
+        holes = holes[holes < kept]
+        movers = np.flatnonzero(~dead[kept:]) + kept
+        self._data[:, holes] = self._data[:, movers]
+        self.count = kept
+
+    def clear(self):
+        self.count = 0
+
+
+class Effects:
+    # The emitters of a front-end, one per kind of world event. After each
+    # world step emit(world.events) starts a burst per event; update(dt)
+    # runs once per drawn frame.
+    def __init__(self, bursts=BURSTS, seed=None):
+        self.random = np.random.default_rng(seed)
+        self.emitters = {kind: Emitter(random=self.random, **burst) for kind, burst in bursts.items()}
+
+    @property
+    def count(self):
+        return sum(emitter.count for emitter in self.emitters.values())
+
+    def emit(self, events):
+        for kind, x, y in events:
+            emitter = self.emitters.get(kind)
+            if emitter is not None:
+                emitter.burst(x, y)
+
+    def update(self, dt):
+        for emitter in self.emitters.values():
+            emitter.update(dt)
+
+    def clear(self):
+        for emitter in self.emitters.values():
+            emitter.clear()
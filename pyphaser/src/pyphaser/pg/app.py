@@ -1,58 +1,68 @@
-from pathlib import Path
+import argparse
 import pygame
 import random
 import sys
 
-# Initialize PyGame
-pygame.init()
+from pyphaser import savestate, world
+from pyphaser.animation import DUDE, Animator
+from pyphaser.capture import FrameCapture
+from pyphaser.profiling import FrameProfiler
+from pyphaser.assets import DUDE_FRAME_COUNT, DUDE_FRAME_SIZE
+from pyphaser.camera import Camera, PlatformStream
+from pyphaser.level import load as load_level
+from pyphaser.particles import Effects
+from pyphaser.pg import assets
+from pyphaser.pg.render import DirtyRenderer, FullRenderer, GpuRenderer, Hud, ParticleLayer
+from pyphaser.replay import Recording
+from pyphaser.timestep import FixedStep
 
 # Screen dimensions
-WIDTH = 800
-HEIGHT = 600
-FPS = 60
-
-# Colors
-BLACK = (0, 0, 0)
-
-ASSETS = Path("resources")
-
-# Setup screen
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("PyGame Platformer")
-
-clock = pygame.time.Clock()
-
-# Load images
-background = pygame.image.load(str(ASSETS / "sky.png"))
-ground_img = pygame.image.load(str(ASSETS / "platform.png"))
-star_img = pygame.image.load(str(ASSETS / "star.png"))
-bomb_img = pygame.image.load(str(ASSETS / "bomb.png"))
-# dude_img = pygame.image.load(str(ASSETS / "dude.png"))
-# dude_frames = [dude_img.subsurface((32*i, 0, 32, 48)) for i in range(9)]
+WIDTH = world.WIDTH
+HEIGHT = world.HEIGHT
+FPS = 60  # draw rate cap; the simulation always steps at world.DT
+TITLE = "PyGame Platformer"
+
+# Importing this module has no side effects: the window opens in main() (or
+# the first open_display() call) and images load when a sprite first needs
+# them, so tools and the student helpers can import it without a display
+screen = None
+
+# Module attributes from before images were loaded lazily
+_IMAGES = {"background": "sky.png", "ground_img": "platform.png", "star_img": "star.png", "bomb_img": "bomb.png"}
+
+
+def __getattr__(name):
+    if name in _IMAGES:
+        return assets.image(_IMAGES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def open_display():
+    # Only the subsystems the game uses; pygame.init() would also start
+    # audio, joysticks and the rest, which costs startup time for nothing
+    global screen
+    if screen is None:
+        pygame.display.init()
+        pygame.font.init()
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption(TITLE)
+        # Images loaded before there was a display are in the file's format;
+        # drop them so they are loaded again, converted for fast blits
+        assets.cache.clear()
+    return screen
 
 # Player class
-class Player(pygame.sprite.Sprite):
-    def __init__(self):
+class Player(pygame.sprite.DirtySprite):
+    def __init__(self, body=None):
         super().__init__()
-        dude_img = pygame.image.load(str(ASSETS / "dude.png"))
-        dude_frames = [dude_img.subsurface((32*i, 0, 32, 48)) for i in range(9)]
-        # Take frame 4 (standing)
-        self.frames_left = dude_frames[0:4]
-        self.frame_idle = dude_frames[4]
-        pygame.image.save(self.frame_idle, str(ASSETS / "dude_front.png"))
-        self.frames_right = dude_frames[5:9]
-        self.image = self.frame_idle
+        # Frames and clips are shared by every player; only the playback
+        # state is per sprite
+        self.frames = assets.frames("dude.png", *DUDE_FRAME_SIZE, DUDE_FRAME_COUNT)
+        self.animation = Animator(DUDE, 1)
+        self.image = self.frames[self.animation.frame[0]]
         self.rect = self.image.get_rect()
-        self.rect.center = (100, 450)
-        self.vel_y = 0
-        self.vel_x = 0
-        self.on_ground = False
-
-        # Animation control
-        self.anim_index = 0
-        self.anim_timer = 0
-        self.anim_speed = 0.15  # lower = slower
-        self.facing = "idle"
+        self.body = body if body is not None else world.Player(*world.PLAYER_START)
+        self.rect.topleft = (self.body.x, self.body.y)
 
     def beweeg_naar_links(self, stappen=0):
         # self.vel_x = -5
@@ -66,222 +76,297 @@ class Player(pygame.sprite.Sprite):
         # self.vel_y = -15
         pass
 
-    def update(self, keys):
-        self.vel_x = 0
-        if keys[pygame.K_LEFT]:
-            # self.vel_x = -5
-            self.beweeg_naar_links()
-            self.facing = 'left'
-        elif keys[pygame.K_RIGHT]:
-            # self.vel_x = 5
-            self.beweeg_naar_links()
-            self.facing = 'right'
-        else:
-            self.facing = 'idle'
-
-        if (keys[pygame.K_UP] or keys[pygame.K_SPACE]) and self.on_ground:
-            self.vel_y = -15
-            self.spring()
-
-        # Apply gravity
-        self.vel_y += 0.5
-        if self.vel_y > 10:
-            self.vel_y = 10
-
-        # Move
-        self.rect.x += self.vel_x
-        self.rect.y += self.vel_y
-
-        # Screen bounds
-        if self.rect.left < 0:
-            self.rect.left = 0
-        if self.rect.right > WIDTH:
-            self.rect.right = WIDTH
-
-        self.animate()
-
-    def animate(self):
-        if self.facing == "left":
-            self.anim_timer += self.anim_speed
-            if self.anim_timer >= 1:
-                self.anim_timer = 0
-                self.anim_index = (self.anim_index + 1) % len(self.frames_left)
-            self.image = self.frames_left[self.anim_index]
-
-        elif self.facing == "right":
-            self.anim_timer += self.anim_speed
-            if self.anim_timer >= 1:
-                self.anim_timer = 0
-                self.anim_index = (self.anim_index + 1) % len(self.frames_right)
-            self.image = self.frames_right[self.anim_index]
-
-        else:  # idle
-            self.image = self.frame_idle
-            self.anim_index = 0
-            self.anim_timer = 0
+    def update(self, alpha=1.0, dt=world.DT):
+        image = self.image
+        topleft = self.rect.topleft
+        self.rect.topleft = self.body.lerp(alpha)
+        self.animate(dt)
+        if self.image is not image or self.rect.topleft != topleft:
+            self.dirty = 1
+
+    def animate(self, dt=world.DT):
+        # The clip names are the facing values; the clip restarts on a change
+        animation = self.animation
+        animation.play(DUDE.ids[self.body.facing])
+        animation.update(dt)
+        self.image = self.frames[animation.frame[0]]
 
 # Platform class
 class Platform(pygame.sprite.Sprite):
     def __init__(self, x, y, w=0, h=0):
         super().__init__()
-        self.image = ground_img
+        self.image = assets.image("platform.png")
         if w and h:
-            self.image = pygame.transform.scale(ground_img, (w, h))
+            self.image = assets.scaled("platform.png", (w, h))
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.y = y
 
 # Star class
-class Star(pygame.sprite.Sprite):
+class Star(pygame.sprite.DirtySprite):
     def __init__(self, x, y):
         super().__init__()
-        self.image = star_img
+        self.image = assets.image("star.png")
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.y = y
-        self.bounce = random.uniform(0.4, 0.8)
-        self.vel_y = 0
-
-    def update(self, *args):
-        self.vel_y += 0.3
-        if self.vel_y > 6:
-            self.vel_y = 6
-        self.rect.y += self.vel_y
 
 # Bomb class
-class Bomb(pygame.sprite.Sprite):
+class Bomb(pygame.sprite.DirtySprite):
     def __init__(self, x, y):
         super().__init__()
-        self.image = bomb_img
+        self.image = assets.image("bomb.png")
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.y = y
-        self.vel_x = random.choice([-2, 2])
-        self.vel_y = 2
-
-    def update(self, *args):
-        self.rect.x += self.vel_x
-        self.rect.y += self.vel_y
-        
-        # Bounce off screen walls
-        if self.rect.left <= 0 or self.rect.right >= WIDTH:
-            self.vel_x *= -1
-        if self.rect.top <= 0:
-            self.rect.top = 0
-            self.vel_y *= -1
-
-def main():
-    # Groups
-    all_sprites = pygame.sprite.Group()
-    platforms = pygame.sprite.Group()
-    stars = pygame.sprite.Group()
-    bombs = pygame.sprite.Group()
 
-    # Create player
-    player = Player()
-    all_sprites.add(player)
-
-    # Create platforms
-    ground = Platform(0, 568, 800, 32)
-    platform_list = [
-        ground,
-        Platform(600, 400),
-        Platform(50, 250),
-        Platform(750, 220)
-    ]
-    for p in platform_list:
-        all_sprites.add(p)
-        platforms.add(p)
-
-    # Create stars
-    for i in range(12):
-        star = Star(12 + i*70, 0)
-        all_sprites.add(star)
-        stars.add(star)
-
-    # Score
-    score = 0
+
+class SpritePool:
+    # Sprites for one entity store. Sprite i shows live row i; sprites past
+    # the live count are hidden and kept for the next spawn instead of being
+    # killed and reallocated. The pool only ever grows to the peak count.
+    def __init__(self, sprite_class, renderer):
+        self.sprite_class = sprite_class
+        self.renderer = renderer
+        self.sprites = []
+        self.active = 0
+
+    def sync(self, store, alpha=1.0):
+        count = store.count
+        sprites = self.sprites
+        while len(sprites) < count:
+            sprite = self.sprite_class(0, 0)
+            sprite.visible = 0
+            sprites.append(sprite)
+            self.renderer.add(sprite)
+        for sprite in sprites[count:self.active]:
+            sprite.visible = 0
+        x, y = (store.x, store.y) if alpha >= 1.0 else store.lerp(alpha)
+        for sprite, x, y in zip(sprites, x.tolist(), y.tolist()):
+            x = int(x)
+            y = int(y)
+            if sprite.rect.x != x or sprite.rect.y != y:
+                sprite.rect.x = x
+                sprite.rect.y = y
+                sprite.dirty = 1
+            if not sprite.visible:
+                sprite.visible = 1
+        self.active = count
+
+
+def read_inputs(keys):
+    return world.Inputs(
+        left=keys[pygame.K_LEFT],
+        right=keys[pygame.K_RIGHT],
+        up=keys[pygame.K_UP] or keys[pygame.K_SPACE],
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PyGame platformer")
+    parser.add_argument("--level", default="default", help="level name or path to a level JSON file")
+    parser.add_argument("--dirty", action="store_true",
+                        help="only redraw and update the screen regions that changed")
+    parser.add_argument("--gpu", action="store_true",
+                        help="draw with SDL's GPU renderer (falls back to software if unavailable)")
+    parser.add_argument("--profile", action="store_true",
+                        help="show the frame-time overlay at start (toggle with F3)")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="write per-phase frame timings to PATH (.csv, or Chrome trace JSON)")
+    parser.add_argument("--fps", type=int, default=FPS,
+                        help="draw rate cap, 0 for uncapped; game speed does not depend on it")
+    parser.add_argument("--seed", type=int, help="random seed (default: a fresh one per run)")
+    parser.add_argument("--record", metavar="PATH", help="write the input log of the last round to PATH on exit")
+    parser.add_argument("--replay", metavar="PATH", help="play back an input log instead of the keyboard")
+    parser.add_argument("--capture", metavar="PATH",
+                        help="save the drawn frames to PATH: a video file (via ffmpeg), .raw, or a PNG directory")
+    parser.add_argument("--frames", type=int, help="quit after drawing this many frames (smoke tests, startup timing)")
+    parser.add_argument("--connect", metavar="HOST[:PORT]", help="join a match on a pyphaser-server")
+    parser.add_argument("--match", default="", help="match name to join with --connect (default: any)")
+    args = parser.parse_args(argv)
+    if args.connect and (args.record or args.replay):
+        parser.error("--record and --replay only work for local games")
+
+    client = None
+    if args.connect:
+        # Only online games pay for importing the network code
+        from pyphaser.net import PORT, Client
+        host, _, port = args.connect.partition(":")
+        try:
+            client = Client.connect((host, int(port or PORT)), args.match)
+        except (OSError, TimeoutError, ValueError) as exc:
+            parser.error(f"cannot join {args.connect}: {exc}")
+        replay = None
+        seed, level = None, None
+    elif args.replay:
+        replay = Recording.load(args.replay)
+        seed, level = replay.seed, replay.level
+    else:
+        # Every session gets a concrete seed so its input log can be replayed
+        replay = None
+        seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+        level = args.level
+    recording = Recording(seed, level)
+    # Online the client's world mirrors the server's match
+    game = client.world if client else world.World(seed=seed, level=load_level(level))
+    profiler = FrameProfiler(enabled=args.profile or bool(args.trace))
+    game.profiler = profiler
+    if args.trace:
+        profiler.start_trace(args.trace)
+
+    # Renderer + groups
+    screen = open_display()
+    background = assets.image("sky.png")
     font = pygame.font.SysFont(None, 36)
-    game_over = False
+    hud = Hud(font, WIDTH, HEIGHT, pygame.font.SysFont(None, 20))
+    camera = Camera(WIDTH, HEIGHT, game.width, game.height)
+    renderer = None
+    if args.gpu:
+        try:
+            renderer = GpuRenderer.open(TITLE, background, hud, scroll=camera.scrolls)
+        except (ImportError, RuntimeError, pygame.error) as exc:
+            print(f"GPU renderer unavailable ({exc}), using software rendering", file=sys.stderr)
+    if args.dirty and camera.scrolls:
+        print("--dirty needs a level that fits on the screen, redrawing every frame instead", file=sys.stderr)
+    if renderer is None:
+        renderer_class = DirtyRenderer if args.dirty and not camera.scrolls else FullRenderer
+        renderer = renderer_class(screen, background, hud)
+    capture = None
+    if args.capture:
+        try:
+            capture = renderer.capture = FrameCapture.open(args.capture, (WIDTH, HEIGHT), args.fps or FPS)
+        except (OSError, RuntimeError) as exc:
+            parser.error(f"cannot capture to {args.capture}: {exc}")
+    stars = SpritePool(Star, renderer)
+    bombs = SpritePool(Bomb, renderer)
 
-    # Main loop
+    # Create player
+    player = Player(game.player)
+    renderer.add(player)
+    others = [Player(body) for body in game.players if body is not game.player]
+    for sprite in others:
+        renderer.add(sprite)
+
+    # Platforms get sprites while they are near the view
+    def add_platform(x, y, w, h):
+        sprite = Platform(x, y, w, h)
+        renderer.add_static(sprite)
+        return sprite
+
+    platforms = PlatformStream(game, add_platform, renderer.remove_static)
+
+    # Particle bursts for world events, one batched layer per emitter. Online
+    # the world only mirrors snapshots and has no events.
+    effects = Effects()
+    for emitter in effects.emitters.values():
+        renderer.add_effect(ParticleLayer(emitter, (WIDTH, HEIGHT)))
+    camera.follow(*player.rect.center)
+    platforms.update(camera)
+
+    # Save states, loaded into the live world and sprites in place: the
+    # start of the round for restarts (ENTER after game over), one quick-save
+    # slot (F5/F9) and the last steps for rewinding (hold BACKSPACE).
+    # Offline only; online the server owns the state.
+    start = savestate.save(game, player.animation)
+    quick = None
+    rewind = savestate.Rewind()
+
+    def load_state(state, length):
+        savestate.load(game, state, player.animation)
+        recording.truncate(length)
+        effects.clear()
+
+    # Main loop: physics runs in fixed steps of world.DT however long a frame
+    # took, and sprites are drawn interpolated between the last two steps
+    stepper = FixedStep()
+    clock = pygame.time.Clock()
+    frames = 0
     running = True
     while running:
-        clock.tick(FPS)
+        elapsed = clock.tick(args.fps) / 1000
+        profiler.begin_frame()
         keys = pygame.key.get_pressed()
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
-
-        if not game_over:
-            # Update
-            all_sprites.update(keys)
-
-            # Collision with platforms (player)
-            player.on_ground = False
-            hits = pygame.sprite.spritecollide(player, platforms, False)
-            for platform in hits:
-                if player.vel_y > 0:  # falling
-                    player.rect.bottom = platform.rect.top
-                    player.vel_y = 0
-                    player.on_ground = True
-                elif player.vel_y < 0:  # jumping up into platform
-                    player.rect.top = platform.rect.bottom
-                    player.vel_y = 0
-
-            # Collision with platforms (stars)
-            for star in stars:
-                if pygame.sprite.spritecollide(star, platforms, False):
-                    star.vel_y = -star.vel_y * star.bounce
-
-            for bomb in bombs:
-                hits = pygame.sprite.spritecollide(bomb, platforms, False)
-                for platform in hits:
-                    if bomb.vel_y > 0:  # falling
-                        bomb.rect.bottom = platform.rect.top
-                        bomb.vel_y = -bomb.vel_y * 0.9
-                    elif bomb.vel_y < 0:  # hitting underside
-                        bomb.rect.top = platform.rect.bottom
-                        bomb.vel_y = -bomb.vel_y * 0.9
-
-            # Collect stars
-            star_hits = pygame.sprite.spritecollide(player, stars, True)
-            for star in star_hits:
-                score += 10
-
-            if len(stars) == 0:
-                # Respawn stars
-                for i in range(12):
-                    star = Star(12 + i*70, 0)
-                    all_sprites.add(star)
-                    stars.add(star)
-
-                # Add bomb
-                x = random.randint(400, 800) if player.rect.x < 400 else random.randint(0, 400)
-                bomb = Bomb(x, 16)
-                all_sprites.add(bomb)
-                bombs.add(bomb)
-
-            # Hit bomb
-            if pygame.sprite.spritecollide(player, bombs, False):
-                game_over = True
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle()
+            elif event.type == pygame.KEYDOWN and client is None:
+                if event.key == pygame.K_RETURN and game.game_over:
+                    load_state(start, 0)
+                    rewind.clear()
+                    stepper.reset()
+                elif event.key == pygame.K_F5:
+                    quick = (savestate.save(game, player.animation), len(recording))
+                elif event.key == pygame.K_F9 and quick is not None:
+                    load_state(*quick)
+                    rewind.clear()
+        profiler.lap("input")
+
+        # Update
+        rewinding = client is None and keys[pygame.K_BACKSPACE]
+        for _ in range(stepper.advance(elapsed)):
+            if rewinding:
+                if rewind:
+                    load_state(*rewind.pop())
+                continue
+            if replay is None:
+                inputs = read_inputs(keys)
+            elif len(recording) < len(replay):
+                inputs = replay.inputs(len(recording))
+            else:
+                inputs = world.Inputs()
+            if client is None and game.game_over:
+                # Nothing moves until a restart; the rewind buffer and the
+                # recording keep the steps before the end, as in the arcade app
+                continue
+            if client is None:
+                rewind.push(savestate.save(game, player.animation), len(recording))
+            recording.record(inputs)
+            if client:
+                client.update(inputs)
+            else:
+                game.step(inputs, stepper.dt)
+                effects.emit(game.events)
+        effects.update(elapsed)
+        alpha = stepper.alpha
+        # The local player moves every step; online, everything else moves
+        # with the snapshots
+        remote_alpha = client.alpha() if client else alpha
+        stars.sync(game.stars, remote_alpha)
+        bombs.sync(game.bombs, remote_alpha)
+        player.update(alpha, elapsed)
+        for sprite in others:
+            sprite.update(remote_alpha, elapsed)
+            if sprite.visible != sprite.body.alive:
+                sprite.visible = int(sprite.body.alive)
+                sprite.dirty = 1
+        camera.follow(*player.rect.center)
+        renderer.offset = camera.offset
+        platforms.update(camera)
+        hud.update(game.score, game.game_over)
+        hud.update_profile(profiler)
+        profiler.lap("sprites")
 
         # Draw
-        screen.blit(background, (0, 0))
-        all_sprites.draw(screen)
-
-        # Score text
-        score_text = font.render(f"Score: {score}", True, BLACK)
-        screen.blit(score_text, (16, 16))
-
-        # Game over text
-        if game_over:
-            over_text = font.render("GAME OVER", True, (255, 0, 0))
-            screen.blit(over_text, (WIDTH//2 - 80, HEIGHT//2))
-
-        pygame.display.flip()
-
+        renderer.draw()
+        profiler.lap("draw")
+        profiler.end_frame(stars=game.stars.count, bombs=game.bombs.count, particles=effects.count)
+        frames += 1
+        if frames == args.frames:
+            running = False
+
+    profiler.stop_trace()
+    if client:
+        client.close()
+    if capture is not None:
+        capture.close()
+        if capture.dropped:
+            print(f"capture: {capture.dropped} of {capture.dropped + capture.submitted} frames dropped, "
+                  f"the encoder could not keep up", file=sys.stderr)
+    if args.record:
+        recording.save(args.record)
     pygame.quit()
     sys.exit()
 
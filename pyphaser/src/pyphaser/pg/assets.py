@@ -0,0 +1,68 @@
+import pygame
+
+from pyphaser.assets import AssetCache, RESOURCES
+
+cache = AssetCache()
+
+
+def _convert(surface, opaque=False):
+    # Converting to the display format makes every later blit a straight copy.
+    # That needs a display mode, so headless use keeps the file's own format.
+    if pygame.display.get_surface() is None:
+        return surface
+    if opaque or not surface.get_flags() & pygame.SRCALPHA:
+        return surface.convert()
+    return surface.convert_alpha()
+
+
+def _load(name):
+    return _convert(pygame.image.load(str(RESOURCES / name)))
+
+
+def atlas():
+    # The packed sprite atlas as (Atlas, surface); sprites are subsurfaces
+    # of the one surface, so the GPU renderer uploads a single texture
+    def build():
+        # Imported here: it pulls in Pillow, which nothing else in the pygame
+        # front-end needs
+        from pyphaser import atlas as atlas_cache
+        packed = atlas_cache.load()
+        surface = pygame.image.frombytes(packed.image.tobytes(), packed.size, "RGBA")
+        return packed, _convert(surface)
+
+    return cache.get(("atlas",), build)
+
+
+def _region(name):
+    packed, surface = atlas()
+    if name not in packed.regions:
+        return None
+    region = surface.subsurface(packed.rect(name))
+    # Opaque images (sky, platform) get their own copy without alpha, which
+    # keeps software blits of the big background a plain copy
+    if name in packed.opaque:
+        return _convert(region, opaque=True)
+    return region
+
+
+def image(name):
+    return cache.get(("image", name), lambda: _region(name) or _load(name))
+
+
+def scaled(name, size):
+    source = image(name)
+    if tuple(size) == source.get_size():
+        return source
+    return cache.get(("scaled", name, *size), lambda: pygame.transform.scale(source, size))
+
+
+def frames(name, frame_width, frame_height, count):
+    def slice_sheet():
+        from pyphaser import atlas as atlas_cache
+        packed, _ = atlas()
+        if atlas_cache.SHEETS.get(name) == (frame_width, frame_height, count):
+            return [_region(frame) for frame in packed.frames(name)]
+        sheet = image(name)
+        return [sheet.subsurface((frame_width * i, 0, frame_width, frame_height)) for i in range(count)]
+
+    return cache.get(("frames", name, frame_width, frame_height, count), slice_sheet)
@@ -0,0 +1,457 @@
+import weakref
+
+import numpy as np
+import pygame
+
+from pyphaser.assets import AssetCache
+from pyphaser.camera import background_tiles
+
+BLACK = (0, 0, 0)
+RED = (255, 0, 0)
+WHITE = (255, 255, 255)
+OVERLAY_BACKGROUND = (0, 0, 0, 160)
+OVERLAY_REFRESH = 15  # frames between profiler overlay refreshes
+TEXT_CACHE_SIZE = 256  # rendered strings kept, e.g. overlay lines that repeat
+DIGITS = "0123456789-"
+# Particles are drawn as copies of a soft round dot this many pixels across,
+# fading out in this many steps over their lifetime
+PARTICLE_DOT = 3
+PARTICLE_FADES = 8
+CLEAR = (0, 0, 0, 0)
+
+text_cache = AssetCache(TEXT_CACHE_SIZE)
+
+
+def render_text(font, text, color):
+    # font.render, memoized on (font, text, color)
+    return text_cache.get(("text", font, text, color), lambda: font.render(text, True, color))
+
+
+class Glyphs:
+    # A small alphabet (digits by default) rendered once into one strip;
+    # strings made of those characters are composed from slices of it
+    # instead of going through the font rasterizer
+    def __init__(self, font, color, chars=DIGITS):
+        rendered = [font.render(char, True, color) for char in chars]
+        self.height = max(glyph.get_height() for glyph in rendered)
+        self.image = pygame.Surface((sum(glyph.get_width() for glyph in rendered), self.height), pygame.SRCALPHA)
+        self.rects = {}
+        x = 0
+        for char, glyph in zip(chars, rendered):
+            self.rects[char] = self.image.blit(glyph, (x, 0))
+            x += glyph.get_width()
+
+    def width(self, text):
+        return sum(self.rects[char].width for char in text)
+
+    def blit(self, surface, text, pos):
+        x, y = pos
+        for char in text:
+            rect = self.rects[char]
+            surface.blit(self.image, (x, y), rect)
+            x += rect.width
+
+
+class HudSprite(pygame.sprite.DirtySprite):
+    def set_visible(self, visible):
+        if bool(visible) != bool(self.visible):
+            self.visible = int(visible)
+            self.dirty = 1
+
+
+class TextSprite(HudSprite):
+    # Text that is only re-rendered (and marked dirty) when it changes
+    def __init__(self, font, color, pos, text=""):
+        super().__init__()
+        self.font = font
+        self.color = color
+        self.pos = pos
+        self.text = None
+        self.set_text(text)
+
+    def set_text(self, text):
+        if text == self.text:
+            return
+        self.text = text
+        self.image = render_text(self.font, text, self.color)
+        self.rect = self.image.get_rect(topleft=self.pos)
+        self.dirty = 1
+
+
+class CounterSprite(HudSprite):
+    # A fixed label followed by a number, e.g. "Score: 120". The label is
+    # rendered once and the number is composed from cached digit glyphs, only
+    # when the value changes.
+    def __init__(self, font, color, pos, label, value=0):
+        super().__init__()
+        self.label = render_text(font, label, color)
+        self.glyphs = Glyphs(font, color)
+        self.pos = pos
+        self.value = None
+        self.set_value(value)
+
+    def set_value(self, value):
+        if value == self.value:
+            return
+        self.value = value
+        digits = str(value)
+        label_width = self.label.get_width()
+        height = max(self.label.get_height(), self.glyphs.height)
+        self.image = pygame.Surface((label_width + self.glyphs.width(digits), height), pygame.SRCALPHA)
+        self.image.blit(self.label, (0, 0))
+        self.glyphs.blit(self.image, digits, (label_width, 0))
+        self.rect = self.image.get_rect(topleft=self.pos)
+        self.dirty = 1
+
+
+class OverlaySprite(HudSprite):
+    # Multi-line text panel anchored at its top-right corner
+    def __init__(self, font, topright):
+        super().__init__()
+        self.font = font
+        self.topright = topright
+        self.lines = None
+        self.set_lines([])
+
+    def set_lines(self, lines):
+        if lines == self.lines:
+            return
+        self.lines = lines
+        rendered = [render_text(self.font, line, WHITE) for line in lines]
+        width = max((line.get_width() for line in rendered), default=0) + 8
+        height = sum(line.get_height() for line in rendered) + 8
+        self.image = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.image.fill(OVERLAY_BACKGROUND)
+        y = 4
+        for line in rendered:
+            self.image.blit(line, (4, y))
+            y += line.get_height()
+        self.rect = self.image.get_rect(topright=self.topright)
+        self.dirty = 1
+
+
+class Hud:
+    def __init__(self, font, width, height, small_font=None):
+        self.score = CounterSprite(font, BLACK, (16, 16), "Score: ")
+        self.game_over = TextSprite(font, RED, (width // 2 - 80, height // 2), "GAME OVER")
+        self.game_over.visible = 0
+        self.profile = OverlaySprite(small_font or font, (width - 8, 8))
+        self.profile.visible = 0
+        self.sprites = [self.score, self.game_over, self.profile]
+
+    def update(self, score, game_over):
+        self.score.set_value(score)
+        self.game_over.set_visible(game_over)
+
+    def update_profile(self, profiler):
+        self.profile.set_visible(profiler.enabled)
+        if profiler.enabled and profiler.frame % OVERLAY_REFRESH == 0:
+            self.profile.set_lines(profiler.summary_lines())
+
+
+def particle_dot(size):
+    # A circle drawn at four times the size and smoothscaled down, so its
+    # edge pixels are partly transparent
+    big = pygame.Surface((4 * size, 4 * size), pygame.SRCALPHA)
+    pygame.draw.circle(big, WHITE, (2 * size, 2 * size), 2 * size)
+    return pygame.transform.smoothscale(big, (size, size))
+
+
+class ParticleLayer:
+    # One particle emitter drawn as a single screen-sized image, which the
+    # renderer blits once. Per-particle blits take longer than a 60 FPS frame
+    # at tens of thousands of particles, so every particle is a copy of the
+    # pre-rendered dot written straight into the layer's pixels instead: one
+    # numpy write per dot pixel for all particles at once. `rect` is the part
+    # of the layer with particles on it, None when there are none.
+    def __init__(self, emitter, size, dot=PARTICLE_DOT, fades=PARTICLE_FADES):
+        self.emitter = emitter
+        self.image = pygame.Surface(size, pygame.SRCALPHA)
+        self.rect = None
+        self.fades = fades
+        self.margin = dot // 2
+        self.pitch = self.image.get_pitch() // 4
+        # Each dot pixel as an offset into the flat pixel array and its
+        # color at every fade step. Faint edge pixels come first, so where
+        # particles overlap the brighter centers are written last and win.
+        alpha = pygame.surfarray.array_alpha(particle_dot(dot))
+        dx, dy = np.nonzero(alpha)
+        order = np.argsort(alpha[dx, dy], kind="stable")
+        dx, dy = dx[order], dy[order]
+        self.offsets = ((dy - self.margin) * self.pitch + dx - self.margin).tolist()
+        r, g, b = emitter.color
+        fade = 1.0 - np.arange(fades) / fades
+        self.colors = [np.array([self.image.map_rgb((r, g, b, int(a * f))) & 0xFFFFFFFF for f in fade],
+                                dtype=np.uint32) for a in alpha[dx, dy].tolist()]
+
+    def draw(self, offset=(0, 0)):
+        # Redraw the particles as seen from a camera at offset
+        image = self.image
+        if self.rect is not None:
+            image.fill(CLEAR, self.rect)
+            self.rect = None
+        emitter = self.emitter
+        if not emitter.count:
+            return
+        ox, oy = offset
+        x = (emitter.x - ox).astype(np.intp)
+        y = (emitter.y - oy).astype(np.intp)
+        # Dots that would reach past an edge are left out
+        width, height = image.get_size()
+        margin = self.margin
+        on_screen = (x >= margin) & (x < width - margin) & (y >= margin) & (y < height - margin)
+        x = x[on_screen]
+        y = y[on_screen]
+        if not len(x):
+            return
+        age = emitter.age[on_screen] / emitter.life[on_screen]
+        level = np.minimum((age * self.fades).astype(np.intp), self.fades - 1)
+        index = y * self.pitch + x
+        pixels = np.frombuffer(image.get_buffer(), np.uint32)
+        for step, colors in zip(self.offsets, self.colors):
+            pixels[index + step] = colors[level]
+        del pixels
+        left = int(x.min()) - margin
+        top = int(y.min()) - margin
+        self.rect = pygame.Rect(left, top, int(x.max()) + margin + 1 - left, int(y.max()) + margin + 1 - top)
+
+
+def capture_surface(capture, surface):
+    # pixels3d is a view of the surface's own pixels, (width, height, 3);
+    # transposed it is the (height, width, 3) frame. It locks the surface,
+    # so it is released before anything blits or flips again.
+    pixels = pygame.surfarray.pixels3d(surface)
+    capture.submit(pixels.transpose(1, 0, 2))
+    del pixels
+
+
+class FullRenderer:
+    # Redraws the whole background and every sprite, then flips, each frame.
+    # Sprites are placed in world space; `offset` is the camera's top-left.
+    def __init__(self, screen, background, hud):
+        self.screen = screen
+        self.background = background
+        self.hud = hud
+        self.capture = None  # a FrameCapture fed every drawn frame
+        self.offset = (0, 0)
+        self.static = pygame.sprite.Group()
+        self.sprites = pygame.sprite.Group()
+        self.effects = []
+        self.overlay = pygame.sprite.Group(*hud.sprites)
+
+    def add_static(self, sprite):
+        self.static.add(sprite)
+
+    def remove_static(self, sprite):
+        self.static.remove(sprite)
+
+    def add(self, sprite):
+        self.sprites.add(sprite)
+
+    def add_effect(self, layer):
+        self.effects.append(layer)
+
+    def draw(self):
+        screen = self.screen
+        ox, oy = self.offset
+        if ox or oy:
+            for x in background_tiles(self.background.get_width(), ox, screen.get_width()):
+                screen.blit(self.background, (x, 0))
+            screen.blits([(sprite.image, sprite.rect.move(-ox, -oy)) for sprite in self.static], False)
+            screen.blits([(sprite.image, sprite.rect.move(-ox, -oy)) for sprite in self.sprites if sprite.visible],
+                         False)
+        else:
+            screen.blit(self.background, (0, 0))
+            self.static.draw(screen)
+            # Pooled sprites stay in the group while parked, hidden via `visible`
+            screen.blits([(sprite.image, sprite.rect) for sprite in self.sprites if sprite.visible], False)
+        for layer in self.effects:
+            layer.draw(self.offset)
+        screen.blits([(layer.image, layer.rect, layer.rect) for layer in self.effects if layer.rect], False)
+        for sprite in self.overlay:
+            if sprite.visible:
+                self.screen.blit(sprite.image, sprite.rect)
+        if self.capture is not None:
+            capture_surface(self.capture, self.screen)
+        pygame.display.flip()
+
+
+class DirtyRenderer:
+    # Static sprites are baked into the backdrop once. Each frame only the
+    # backdrop under moved sprites is restored and only those rectangles are
+    # pushed to the display, instead of a full-screen blit and flip. The
+    # view cannot scroll: a moving camera would dirty the whole screen.
+    def __init__(self, screen, background, hud):
+        self.screen = screen
+        self.background = background
+        self.backdrop = background.copy()
+        self.static = []
+        self.hud = hud
+        self.capture = None
+        self.effects = []
+        self.sprites = pygame.sprite.LayeredDirty()
+        self.sprites.clear(screen, self.backdrop)
+        # Never fall back to full-screen mode on slow frames; that is the case
+        # this renderer exists for
+        self.sprites.set_timing_threshold(float("inf"))
+        self.sprites.add(*hud.sprites, layer=1)
+        self.screen.blit(self.backdrop, (0, 0))
+        pygame.display.flip()
+
+    def add_static(self, sprite):
+        self.static.append(sprite)
+        self.backdrop.blit(sprite.image, sprite.rect)
+        self.screen.blit(sprite.image, sprite.rect)
+        pygame.display.update(sprite.rect)
+
+    def remove_static(self, sprite):
+        # Bakes the backdrop again without it and repaints everything
+        self.static.remove(sprite)
+        self.backdrop.blit(self.background, (0, 0))
+        self.backdrop.blits([(other.image, other.rect) for other in self.static], False)
+        self.screen.blit(self.backdrop, (0, 0))
+        self.sprites.repaint_rect(self.screen.get_rect())
+
+    def add(self, sprite):
+        self.sprites.add(sprite, layer=0)
+
+    def add_effect(self, layer):
+        self.effects.append(layer)
+
+    def draw(self):
+        # Particles move every frame; where they were is repainted from the
+        # backdrop and sprites, then they are drawn on top of everything
+        for layer in self.effects:
+            if layer.rect is not None:
+                self.sprites.repaint_rect(layer.rect)
+        dirty = self.sprites.draw(self.screen)
+        for layer in self.effects:
+            layer.draw()
+            if layer.rect is not None:
+                dirty.append(self.screen.blit(layer.image, layer.rect, layer.rect))
+        if self.capture is not None:
+            capture_surface(self.capture, self.screen)
+        pygame.display.update(dirty)
+
+
+class GpuRenderer:
+    # Draws through SDL's 2D renderer (pygame._sdl2) instead of software
+    # blits. Every image is uploaded as a texture once and SDL batches the
+    # texture copies into a few draw calls per frame. The background and the
+    # static sprites are composed into one target texture up front, unless
+    # the view scrolls (see FullRenderer); then they are drawn every frame.
+    def __init__(self, window, background, hud, vsync=False, scroll=False):
+        from pygame._sdl2 import video
+        self.video = video
+        self.window = window
+        # The software display's window while it is hidden, see open()
+        self.display_window = None
+        self.renderer = video.Renderer(window, accelerated=-1, vsync=vsync, target_texture=True)
+        self.hud = hud
+        self.capture = None
+        self.background = background
+        self.scroll = scroll
+        self.offset = (0, 0)
+        self.static = []
+        self.sprites = []
+        # (layer, texture): every frame a layer is redrawn and uploaded to
+        # its streaming texture, then drawn with one copy
+        self.effects = []
+        # Keyed weakly on the surface, so re-rendered HUD text frees its
+        # old texture. Subsurfaces (the sprites cut from the atlas) draw a
+        # region of their parent's texture.
+        self.textures = weakref.WeakKeyDictionary()
+        self.sources = weakref.WeakKeyDictionary()
+        self.backdrop = video.Texture(self.renderer, background.get_size(), target=True)
+        self.renderer.target = self.backdrop
+        self.blit(background, None)
+        self.renderer.target = None
+
+    @classmethod
+    def open(cls, title, background, hud, vsync=False, scroll=False):
+        # SDL gives a window either a display surface or a renderer, so this
+        # opens a window of its own and hides the software one. Raises
+        # ImportError or RuntimeError when no renderer can be created; the
+        # caller falls back to a software renderer.
+        from pygame._sdl2 import video
+        window = video.Window(title, size=background.get_size())
+        try:
+            renderer = cls(window, background, hud, vsync, scroll)
+        except Exception:
+            window.destroy()
+            raise
+        if pygame.display.get_surface() is not None:
+            # SDL keeps a pointer to this wrapper in the window's data; it
+            # must live as long as the display does, or the next event poll
+            # reads freed memory
+            renderer.display_window = video.Window.from_display_module()
+            renderer.display_window.hide()
+        return renderer
+
+    def texture(self, image):
+        texture = self.textures.get(image)
+        if texture is None:
+            texture = self.textures[image] = self.video.Texture.from_surface(self.renderer, image)
+        return texture
+
+    def source(self, image):
+        source = self.sources.get(image)
+        if source is None:
+            parent = image.get_abs_parent()
+            if parent is image:
+                source = (self.texture(image), None)
+            else:
+                source = (self.texture(parent), (*image.get_abs_offset(), *image.get_size()))
+            self.sources[image] = source
+        return source
+
+    def blit(self, image, rect):
+        texture, area = self.source(image)
+        texture.draw(srcrect=area, dstrect=rect)
+
+    def add_static(self, sprite):
+        if self.scroll:
+            self.static.append(sprite)
+            return
+        self.renderer.target = self.backdrop
+        self.blit(sprite.image, sprite.rect)
+        self.renderer.target = None
+
+    def remove_static(self, sprite):
+        self.static.remove(sprite)
+
+    def add(self, sprite):
+        self.sprites.append(sprite)
+
+    def add_effect(self, layer):
+        texture = self.video.Texture(self.renderer, layer.image.get_size(), streaming=True)
+        texture.blend_mode = 1  # SDL_BLENDMODE_BLEND
+        self.effects.append((layer, texture))
+
+    def draw(self):
+        blit = self.blit
+        self.renderer.clear()
+        ox, oy = self.offset
+        if self.scroll:
+            for x in background_tiles(self.background.get_width(), ox, self.backdrop.width):
+                blit(self.background, (x, 0))
+            for sprite in self.static:
+                blit(sprite.image, sprite.rect.move(-ox, -oy))
+        else:
+            self.backdrop.draw()
+        for sprite in self.sprites:
+            if sprite.visible:
+                blit(sprite.image, sprite.rect.move(-ox, -oy) if ox or oy else sprite.rect)
+        for layer, texture in self.effects:
+            layer.draw(self.offset)
+            if layer.rect is not None:
+                texture.update(layer.image)
+                texture.draw(srcrect=layer.rect, dstrect=layer.rect)
+        for sprite in self.hud.sprites:
+            if sprite.visible:
+                blit(sprite.image, sprite.rect)
+        if self.capture is not None:
+            # The frame lives on the GPU; reading it back is one copy into a
+            # surface, and the back buffer is undefined after present()
+            capture_surface(self.capture, self.renderer.to_surface())
+        self.renderer.present()
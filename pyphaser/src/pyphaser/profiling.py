@@ -0,0 +1,142 @@
+import csv
+import json
+import time
+from collections import deque
+
+# -------------------- Settings --------------------
+HISTORY = 600  # frames kept for the percentiles, 10 s at 60 FPS
+PERCENTILES = (50, 95, 99)
+
+
+class FrameProfiler:
+    # Per-phase frame timer. A frame is bracketed by begin_frame() and
+    # end_frame(); in between every lap(name) charges the time since the
+    # previous lap to that phase. While disabled every call returns right
+    # away, so the hooks can stay in the game loop permanently.
+    def __init__(self, enabled=False, history=HISTORY, clock=time.perf_counter_ns):
+        self.enabled = enabled
+        self.clock = clock
+        self.frames = deque(maxlen=history)
+        self.phases = {}
+        self.counts = {}
+        self.frame = 0
+        self._start = 0
+        self._last = 0
+        self._current = []
+        self._trace = None
+        self._trace_path = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self._start = 0
+
+    # -------------------- Hooks --------------------
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._start = self._last = self.clock()
+        self._current = []
+
+    def lap(self, name):
+        if not self.enabled or not self._start:
+            return
+        now = self.clock()
+        self._current.append((name, self._last, now))
+        self._last = now
+
+    def end_frame(self, **counts):
+        if not self.enabled or not self._start:
+            return
+        end = self.clock()
+        self.frame += 1
+        self.frames.append(end - self._start)
+        totals = {}
+        for name, start, stop in self._current:
+            totals[name] = totals.get(name, 0) + stop - start
+        for name, total in totals.items():
+            history = self.phases.get(name)
+            if history is None:
+                history = self.phases[name] = deque(maxlen=self.frames.maxlen)
+            history.append(total)
+        self.counts = counts
+        if self._trace is not None:
+            self._trace.append((self.frame, self._start, end, self._current, counts))
+        self._start = 0
+
+    # -------------------- Stats --------------------
+    def percentiles(self, samples=None):
+        # Frame-time percentiles in milliseconds
+        samples = sorted(self.frames if samples is None else samples)
+        if not samples:
+            return {p: 0.0 for p in PERCENTILES}
+        last = len(samples) - 1
+        return {p: samples[round(last * p / 100)] / 1e6 for p in PERCENTILES}
+
+    def phase_means(self):
+        return {name: sum(history) / len(history) / 1e6 for name, history in self.phases.items() if history}
+
+    def summary_lines(self):
+        pct = self.percentiles()
+        lines = ["frame ms " + " ".join(f"p{p} {pct[p]:.2f}" for p in PERCENTILES)]
+        lines += [f"{name:<8} {ms:.3f} ms" for name, ms in self.phase_means().items()]
+        if self.counts:
+            lines.append("count " + " ".join(f"{name} {count}" for name, count in self.counts.items()))
+        return lines
+
+    # -------------------- Trace export --------------------
+    def start_trace(self, path):
+        # Record every profiled frame until stop_trace(); the file format
+        # follows the extension: .csv for a table, anything else for the
+        # Chrome trace event format (chrome://tracing, Perfetto)
+        self._trace = []
+        self._trace_path = str(path)
+
+    def stop_trace(self):
+        if self._trace is None:
+            return
+        frames, path = self._trace, self._trace_path
+        self._trace = self._trace_path = None
+        if path.endswith(".csv"):
+            write_csv(path, frames)
+        else:
+            write_chrome_trace(path, frames)
+
+
+def write_chrome_trace(path, frames):
+    events = []
+    for frame, start, end, laps, counts in frames:
+        events.append({"name": "frame", "ph": "X", "pid": 0, "tid": 0,
+                       "ts": start / 1000, "dur": (end - start) / 1000, "args": {"frame": frame}})
+        for name, lap_start, lap_end in laps:
+            events.append({"name": name, "ph": "X", "pid": 0, "tid": 0,
+                           "ts": lap_start / 1000, "dur": (lap_end - lap_start) / 1000})
+        if counts:
+            events.append({"name": "entities", "ph": "C", "pid": 0, "tid": 0,
+                           "ts": start / 1000, "args": counts})
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def write_csv(path, frames):
+    phases = []
+    counters = []
+    for _, _, _, laps, counts in frames:
+        for name, _, _ in laps:
+            if name not in phases:
+                phases.append(name)
+        for name in counts:
+            if name not in counters:
+                counters.append(name)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["frame", "frame_ms"] + [f"{name}_ms" for name in phases] + counters)
+        for frame, start, end, laps, counts in frames:
+            totals = dict.fromkeys(phases, 0)
+            for name, lap_start, lap_end in laps:
+                totals[name] += lap_end - lap_start
+            writer.writerow([frame, (end - start) / 1e6] + [totals[name] / 1e6 for name in phases]
+                            + [counts.get(name, "") for name in counters])
+
+
+# Shared, permanently disabled profiler for code that was not given one
+NULL_PROFILER = FrameProfiler(enabled=False)
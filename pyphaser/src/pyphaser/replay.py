@@ -0,0 +1,187 @@
+import argparse
+import json
+import multiprocessing
+import os
+import zlib
+from bisect import bisect_right
+
+from pyphaser import world
+from pyphaser.level import DEFAULT_LEVEL, load as load_level
+
+# -------------------- Settings --------------------
+# Input log: MAGIC, a little-endian uint32 header length, a JSON header
+# (seed, level, frame count), then one zlib-compressed byte per step holding
+# the key bitmask below
+MAGIC = b"PYPHREC1"
+FORMAT_VERSION = 1
+LEFT = 1
+RIGHT = 2
+UP = 4
+SNAPSHOT_EVERY = 600  # steps between seek snapshots, 10 s of game time
+
+# One shared Inputs per bitmask; the world only reads them
+INPUTS = [world.Inputs(bool(mask & LEFT), bool(mask & RIGHT), bool(mask & UP)) for mask in range(8)]
+
+
+def pack_inputs(inputs):
+    return (LEFT if inputs.left else 0) | (RIGHT if inputs.right else 0) | (UP if inputs.up else 0)
+
+
+def unpack_inputs(mask):
+    return INPUTS[mask & 7]
+
+
+class Recording:
+    # The inputs of one session, one bitmask per world step. Together with
+    # the seed and the level that is everything needed to re-simulate it.
+    def __init__(self, seed, level=DEFAULT_LEVEL, masks=b""):
+        self.seed = seed
+        self.level = str(level)
+        self.masks = bytearray(masks)
+
+    def __len__(self):
+        return len(self.masks)
+
+    def record(self, inputs):
+        self.masks.append(pack_inputs(inputs))
+
+    def clear(self):
+        del self.masks[:]
+
+    def truncate(self, length):
+        # Forget the steps after `length`, e.g. when the game is rewound
+        del self.masks[length:]
+
+    def inputs(self, frame):
+        return unpack_inputs(self.masks[frame])
+
+    def save(self, path):
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "seed": self.seed,
+            "level": self.level,
+            "frames": len(self.masks),
+        }).encode()
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(4, "little"))
+            f.write(header)
+            f.write(zlib.compress(bytes(self.masks), 9))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: not a pyphaser recording")
+        length = int.from_bytes(data[len(MAGIC):len(MAGIC) + 4], "little")
+        start = len(MAGIC) + 4
+        header = json.loads(data[start:start + length])
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported recording version {header['version']}")
+        masks = zlib.decompress(data[start + length:])
+        if len(masks) != header["frames"]:
+            raise ValueError(f"{path}: truncated recording")
+        return cls(header["seed"], header["level"], masks)
+
+
+class Replay:
+    # Re-simulates a recording headless. `position` counts the recorded
+    # steps applied so far; a snapshot of the world is kept every
+    # snapshot_every steps on the way, so seek() can jump back (or forward
+    # again) without replaying from the start.
+    def __init__(self, recording, level=None, snapshot_every=SNAPSHOT_EVERY):
+        self.recording = recording
+        self.world = world.World(seed=recording.seed, level=level or load_level(recording.level))
+        self.snapshot_every = snapshot_every
+        self.position = 0
+        self.snapshot_frames = [0]
+        self.snapshots = [self.world.snapshot()]
+
+    @property
+    def finished(self):
+        return self.position >= len(self.recording)
+
+    def run(self, until=None):
+        # Fast-forward to step `until` (default: the end of the recording)
+        end = len(self.recording) if until is None else min(until, len(self.recording))
+        game = self.world
+        masks = self.recording.masks
+        every = self.snapshot_every
+        while self.position < end:
+            if game.game_over:
+                # Nothing changes after game over
+                self.position = end
+                break
+            game.step(INPUTS[masks[self.position]], world.DT)
+            self.position += 1
+            if self.position % every == 0 and self.position > self.snapshot_frames[-1]:
+                self.snapshot_frames.append(self.position)
+                self.snapshots.append(game.snapshot())
+        return game
+
+    def seek(self, frame):
+        # Put the world in the state it had after `frame` recorded steps,
+        # starting from the closest snapshot when that saves work
+        frame = max(0, min(frame, len(self.recording)))
+        i = bisect_right(self.snapshot_frames, frame) - 1
+        if frame < self.position or self.snapshot_frames[i] > self.position:
+            self.world.restore(self.snapshots[i])
+            self.position = self.snapshot_frames[i]
+        return self.run(frame)
+
+
+# -------------------- Re-scoring --------------------
+def rescore(path):
+    recording = Recording.load(path)
+    game = Replay(recording).run()
+    return {
+        "path": str(path),
+        "seed": recording.seed,
+        "level": recording.level,
+        "score": game.score,
+        "frames": game.frame,
+        "bombs_spawned": game.bombs_spawned,
+        "game_over": game.game_over,
+    }
+
+
+def rescore_many(paths, workers=None):
+    # Yields one result per recording, in input order
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) < 2:
+        yield from map(rescore, paths)
+        return
+    with multiprocessing.Pool(min(workers, len(paths))) as pool:
+        yield from pool.imap(rescore, paths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-simulate recorded sessions headless")
+    parser.add_argument("recordings", nargs="+", help="input logs written with --record")
+    parser.add_argument("--frame", type=int, help="stop after this many steps and print the state there")
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.frame is not None:
+        for path in args.recordings:
+            replay = Replay(Recording.load(path))
+            game = replay.seek(args.frame)
+            player = game.player
+            print(json.dumps({
+                "path": path,
+                "frame": replay.position,
+                "score": game.score,
+                "player": [player.x, player.y, player.vx, player.vy],
+                "stars": game.stars.count,
+                "bombs": game.bombs.count,
+                "game_over": game.game_over,
+            }))
+        return
+
+    for result in rescore_many(args.recordings, args.workers):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import struct
+from collections import deque
+
+import numpy as np
+
+# -------------------- Settings --------------------
+# A save state is one bytes object: HEADER, the Mersenne Twister state of
+# the world's random stream, one PLAYER record per player, the star and
+# bomb rows (float64, all EntityStore fields), then the pages of both chunk
+# pagers. Optionally an animator's rows follow (ANIMATOR header, clip ids,
+# times, frames). Everything restores into the objects that already exist,
+# so sprites holding a body or a store keep working.
+MAGIC = b"PYST"
+VERSION = 1
+# magic, version, chunks, players, game over, frame, score, bombs spawned,
+# first and last active chunk, star rows, bomb rows, gauss_next set, gauss_next
+HEADER = struct.Struct("<4sHIB?IIIiiII?d")
+RANDOM_STATE = struct.Struct("<625I")
+# x, y, vx, vy, prev_x, prev_y, on_ground, alive, facing, score
+PLAYER = struct.Struct("<6d??BI")
+# page count, row count; then per page: chunk, byte length, the bytes
+PAGER = struct.Struct("<II")
+PAGE = struct.Struct("<iI")
+ANIMATOR = struct.Struct("<I")
+# Player.facing by number, here and in network snapshots
+FACINGS = ("idle", "left", "right")
+REWIND_STEPS = 600  # 10 s at 60 steps per second
+
+
+def save(game, animator=None):
+    version, state, gauss = game.random.getstate()
+    stars = game.stars
+    bombs = game.bombs
+    first, last = game.active_chunks
+    parts = [
+        HEADER.pack(MAGIC, VERSION, game.chunks, len(game.players), game.game_over, game.frame, game.score,
+                    game.bombs_spawned, first, last, stars.count, bombs.count, gauss is not None, gauss or 0.0),
+        RANDOM_STATE.pack(*state),
+    ]
+    for p in game.players:
+        parts.append(PLAYER.pack(p.x, p.y, p.vx, p.vy, p.prev_x, p.prev_y, p.on_ground, p.alive,
+                                 FACINGS.index(p.facing), p.score))
+    parts.append(stars._data[:, :stars.count].tobytes())
+    parts.append(bombs._data[:, :bombs.count].tobytes())
+    for pager in (game.paged_stars, game.paged_bombs):
+        parts.append(PAGER.pack(len(pager.pages), pager.count))
+        for chunk, page in pager.pages.items():
+            parts.append(PAGE.pack(chunk, len(page)))
+            parts.append(page)
+    if animator is not None:
+        parts.append(ANIMATOR.pack(len(animator)))
+        parts.append(animator.clip.astype(np.int64).tobytes())
+        parts.append(animator.time.tobytes())
+        parts.append(animator.frame.astype(np.int64).tobytes())
+    return b"".join(parts)
+
+
+def load(game, data, animator=None):
+    # Raises ValueError when the state is not from a world like this one or
+    # is cut short. It is read in full before anything is patched, so a bad
+    # state leaves the world as it was.
+    try:
+        state = parse(game, memoryview(data), animator)
+    except struct.error:
+        raise ValueError("save state is truncated") from None
+    (game_over, frame, score, bombs_spawned, first, last, random_state, players, rows, pagers,
+     animation) = state
+    game.random.setstate(random_state)
+    for p, (x, y, vx, vy, prev_x, prev_y, on_ground, alive, facing, player_score) in zip(game.players, players):
+        p.x, p.y, p.vx, p.vy, p.prev_x, p.prev_y, p.on_ground, p.alive = x, y, vx, vy, prev_x, prev_y, on_ground, alive
+        p.facing = FACINGS[facing]
+        p.score = player_score
+    for store, store_rows in zip((game.stars, game.bombs), rows):
+        store.restore(store_rows)
+    for pager, (count, pages) in zip((game.paged_stars, game.paged_bombs), pagers):
+        pager.count = count
+        pager.pages.clear()
+        pager.pages.update(pages)
+    game.game_over = game_over
+    game.frame = frame
+    game.score = score
+    game.bombs_spawned = bombs_spawned
+    game.active_chunks = (first, last)
+    if animation is not None:
+        count, columns = animation
+        if len(animator) != count:
+            animator.resize(count)
+        for column, values in zip((animator.clip, animator.time, animator.frame), columns):
+            column[:] = values
+
+
+def parse(game, data, animator):
+    # The fields of a save state, in the order load() applies them
+    (magic, version, chunks, player_count, game_over, frame, score, bombs_spawned, first, last, star_rows,
+     bomb_rows, has_gauss, gauss) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a pyphaser save state, or one from another version")
+    if chunks != game.chunks or player_count != len(game.players):
+        raise ValueError(f"save state is for a world with {chunks} chunks and {player_count} players")
+    offset = HEADER.size
+    random_state = (3, RANDOM_STATE.unpack_from(data, offset), gauss if has_gauss else None)
+    offset += RANDOM_STATE.size
+    players = []
+    for _ in range(player_count):
+        fields = PLAYER.unpack_from(data, offset)
+        if fields[8] >= len(FACINGS):
+            raise ValueError("save state has an unknown facing")
+        players.append(fields)
+        offset += PLAYER.size
+    rows = []
+    for store, count in ((game.stars, star_rows), (game.bombs, bomb_rows)):
+        fields = len(store.FIELDS)
+        rows.append(read_array(data, np.float64, fields * count, offset).reshape(fields, count))
+        offset += 8 * fields * count
+    pagers = []
+    for _ in range(2):
+        page_count, count = PAGER.unpack_from(data, offset)
+        offset += PAGER.size
+        pages = {}
+        for _ in range(page_count):
+            chunk, size = PAGE.unpack_from(data, offset)
+            offset += PAGE.size
+            if offset + size > len(data):
+                raise ValueError("save state is truncated")
+            pages[chunk] = bytes(data[offset:offset + size])
+            offset += size
+        pagers.append((count, pages))
+    animation = None
+    if animator is not None and offset < len(data):
+        count, = ANIMATOR.unpack_from(data, offset)
+        offset += ANIMATOR.size
+        columns = []
+        for dtype in (np.int64, np.float64, np.int64):
+            columns.append(read_array(data, dtype, count, offset))
+            offset += 8 * count
+        animation = (count, columns)
+    return (game_over, frame, score, bombs_spawned, first, last, random_state, players, rows, pagers,
+            animation)
+
+
+def read_array(data, dtype, count, offset):
+    if offset + np.dtype(dtype).itemsize * count > len(data):
+        raise ValueError("save state is truncated")
+    return np.frombuffer(data, dtype, count, offset)
+
+
+class Rewind:
+    # The last `steps` save states, newest last. A front-end pushes one
+    # before every step and pops while rewind is held; `mark` is whatever it
+    # needs along with the state (the recording length).
+    def __init__(self, steps=REWIND_STEPS):
+        self.states = deque(maxlen=steps)
+
+    def __len__(self):
+        return len(self.states)
+
+    def push(self, state, mark=None):
+        self.states.append((state, mark))
+
+    def pop(self):
+        return self.states.pop()
+
+    def clear(self):
+        self.states.clear()
@@ -0,0 +1,224 @@
+import numpy as np
+
+# Cell keys pack (cx, cy) into one int64 so a grid lookup is a searchsorted
+CELL_OFFSET = 1 << 20
+CELL_STRIDE = 1 << 21
+# Below this many query x box tests a dense overlap matrix beats bucketing
+BRUTE_FORCE_LIMIT = 4096
+
+
+def overlap_mask(ax, ay, aw, ah, bx, by, bw, bh):
+    return (ax < bx + bw) & (bx < ax + aw) & (ay < by + bh) & (by < ay + ah)
+
+
+def sweep(x, y, w, h, dx, dy, bx, by, bw, bh):
+    # Swept AABB: boxes (x, y, w, h) moving by (dx, dy) this step against
+    # static boxes, pairwise. Returns the fraction of the move at which each
+    # pair first touches (inf if it does not within the move, or already
+    # overlapped at the start) and whether that contact is on a side (x axis)
+    # rather than a top or bottom face.
+    #
+    # Cast as a ray: the corner (x, y) travels through the static box grown
+    # by (w, h), and the slab entry/exit times are taken per axis. On an axis
+    # without motion the times come out as -inf/inf (inside the slab, always
+    # overlapping) or both inf/-inf (never); exactly touching gives 0 * inf =
+    # nan, which fails every comparison, i.e. no contact, like overlap_mask.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv_x = 1 / dx
+        inv_y = 1 / dy
+        tx1 = (bx - w - x) * inv_x
+        tx2 = (bx + bw - x) * inv_x
+        ty1 = (by - h - y) * inv_y
+        ty2 = (by + bh - y) * inv_y
+    x_entry = np.minimum(tx1, tx2)
+    y_entry = np.minimum(ty1, ty2)
+    entry = np.maximum(x_entry, y_entry)
+    exit = np.minimum(np.maximum(tx1, tx2), np.maximum(ty1, ty2))
+    hit = (entry < exit) & (entry >= 0) & (entry < 1)
+    return np.where(hit, entry, np.inf), x_entry > y_entry
+
+
+def earliest(query, toi):
+    # Index of the earliest pair for every query that has one; ties go to
+    # the pair that comes first
+    order = np.lexsort((toi, query))
+    _, first = np.unique(query[order], return_index=True)
+    return order[first]
+
+
+class UniformGrid:
+    # Broad phase over axis-aligned boxes (x, y, w, h). Boxes are bucketed into
+    # square cells stored CSR-style: sorted cell keys, each with a slice into
+    # one flat array of box indices. Queries only look at the cells they touch,
+    # so their cost depends on local density, not on how many boxes exist.
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self.count = 0
+        self._spans = None
+        self.build(np.empty(0), np.empty(0), 0, 0)
+
+    def _span(self, x, y, w, h):
+        size = self.cell_size
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        cx0 = np.floor(x / size).astype(np.int64)
+        cy0 = np.floor(y / size).astype(np.int64)
+        cx1 = np.floor((x + w) / size).astype(np.int64)
+        cy1 = np.floor((y + h) / size).astype(np.int64)
+        return np.stack([cx0, cy0, cx1, cy1])
+
+    def _expand(self, spans):
+        # One (owner, cell key) row for every cell each span covers
+        cx0, cy0, cx1, cy1 = spans
+        ncx = cx1 - cx0 + 1
+        cells = ncx * (cy1 - cy0 + 1)
+        owner = np.repeat(np.arange(len(cx0)), cells)
+        local = np.arange(len(owner)) - np.repeat(np.cumsum(cells) - cells, cells)
+        cx = cx0[owner] + local % ncx[owner]
+        cy = cy0[owner] + local // ncx[owner]
+        return owner, (cy + CELL_OFFSET) * CELL_STRIDE + (cx + CELL_OFFSET)
+
+    def build(self, x, y, w, h):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.count = len(x)
+        self.x = x.copy()
+        self.y = y.copy()
+        self.w = np.broadcast_to(np.asarray(w, dtype=np.float64), x.shape).copy()
+        self.h = np.broadcast_to(np.asarray(h, dtype=np.float64), x.shape).copy()
+        self._rebucket(self._span(self.x, self.y, self.w, self.h))
+
+    def _rebucket(self, spans):
+        self._spans = spans
+        owner, keys = self._expand(spans)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        self.items = owner[order]
+        self.keys, self.starts = np.unique(keys, return_index=True)
+        self.ends = np.append(self.starts[1:], len(keys))
+        self._cells = None
+        self._sorted = None
+
+    # Names of the arrays that fully describe a built grid, see from_arrays()
+    ARRAYS = ("x", "y", "w", "h", "keys", "starts", "ends", "items")
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, cell_size, arrays):
+        # Adopt prebuilt bucket arrays as they are (they may be read-only
+        # memory maps), skipping the bucketing work of build()
+        grid = cls.__new__(cls)
+        grid.cell_size = cell_size
+        for name in cls.ARRAYS:
+            setattr(grid, name, arrays[name])
+        grid.count = len(grid.x)
+        grid._spans = grid._span(grid.x, grid.y, grid.w, grid.h)
+        grid._cells = None
+        grid._sorted = None
+        return grid
+
+    def update(self, x, y, w, h):
+        # Move the indexed boxes. Buckets are only rebuilt when at least one box
+        # crossed into a different set of cells; settled entities cost nothing.
+        if len(x) != self.count:
+            self.build(x, y, w, h)
+            return
+        self.x[:] = x
+        self.y[:] = y
+        self.w[:] = w
+        self.h[:] = h
+        self._sorted = None
+        spans = self._span(self.x, self.y, self.w, self.h)
+        if not np.array_equal(spans, self._spans):
+            self._rebucket(spans)
+
+    def pairs(self, x, y, w, h):
+        # Candidate pairs (query index, box index) that really overlap, sorted
+        # by query index then box index
+        empty = np.empty(0, dtype=np.int64)
+        x = np.asarray(x, dtype=np.float64)
+        if not len(x) or not self.count:
+            return empty, empty
+        y = np.asarray(y, dtype=np.float64)
+        if len(x) * self.count <= BRUTE_FORCE_LIMIT:
+            hit = overlap_mask(x[:, None], y[:, None], np.asarray(w)[..., None], np.asarray(h)[..., None],
+                               self.x, self.y, self.w, self.h)
+            return np.nonzero(hit)
+        w = np.broadcast_to(np.asarray(w, dtype=np.float64), x.shape)
+        h = np.broadcast_to(np.asarray(h, dtype=np.float64), x.shape)
+        query, keys = self._expand(self._span(x, y, w, h))
+        slot = np.searchsorted(self.keys, keys)
+        slot[slot == len(self.keys)] = 0
+        found = self.keys[slot] == keys
+        query = query[found]
+        slot = slot[found]
+        keys = keys[found]
+        # Only the run of each cell's boxes that can reach the query along
+        # the sorted axis is tested, not the whole cell
+        axis_y, items, sorted_keys, base, span, reach = self._sorted_cells()
+        low = (y if axis_y else x)[query]
+        high = low + (h if axis_y else w)[query]
+        start = np.searchsorted(sorted_keys, slot * span + np.clip(low - reach[slot] - base, -0.5, span - 0.5),
+                                "right")
+        end = np.searchsorted(sorted_keys, slot * span + np.clip(high - base, -0.5, span - 0.5), "left")
+        # Empty when neither the query nor the cell's boxes have any extent
+        counts = np.maximum(end - start, 0)
+        rows = np.repeat(np.arange(len(query)), counts)
+        local = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        query = query[rows]
+        keys = keys[rows]
+        box = items[start[rows] + local]
+        hit = overlap_mask(x[query], y[query], w[query], h[query],
+                           self.x[box], self.y[box], self.w[box], self.h[box])
+        query = query[hit]
+        keys = keys[hit]
+        box = box[hit]
+        # A box spanning several cells shows up once per shared cell; keep
+        # the pair in the cell holding the top left corner of the overlap
+        size = self.cell_size
+        cx = np.floor(np.maximum(x[query], self.x[box]) / size).astype(np.int64)
+        cy = np.floor(np.maximum(y[query], self.y[box]) / size).astype(np.int64)
+        own = (cy + CELL_OFFSET) * CELL_STRIDE + (cx + CELL_OFFSET) == keys
+        packed = np.sort(query[own] * self.count + box[own])
+        return packed // self.count, packed % self.count
+
+    def _sorted_cells(self):
+        # Every cell's boxes sorted by their low edge on the axis they are
+        # thinnest along (y for platforms), under one float key per box:
+        # cell slot * span + edge - base. Built on first use and kept until
+        # the boxes move, so a static grid builds it once.
+        if self._sorted is None:
+            axis_y = self.h.mean() <= self.w.mean()
+            edge = self.y if axis_y else self.x
+            extent = self.h if axis_y else self.w
+            slot = np.repeat(np.arange(len(self.keys)), self.ends - self.starts)
+            items = self.items[np.lexsort((edge[self.items], slot))]
+            base = edge.min()
+            span = edge.max() - base + 1
+            # The largest extent in each cell bounds how far below a query's
+            # low edge a box may start and still reach it
+            reach = np.maximum.reduceat(extent[self.items], self.starts)
+            self._sorted = (axis_y, items, slot * span + edge[items] - base, base, span, reach)
+        return self._sorted
+
+    def query(self, x, y, w, h):
+        # Sorted indices of the boxes overlapping a single box. Done in plain
+        # Python against a dict of cells: for one box that beats numpy overhead.
+        if self._cells is None:
+            items = self.items.tolist()
+            self._cells = {key: items[start:end] for key, start, end
+                           in zip(self.keys.tolist(), self.starts.tolist(), self.ends.tolist())}
+            self._boxes = list(zip(self.x.tolist(), self.y.tolist(), self.w.tolist(), self.h.tolist()))
+        size = self.cell_size
+        found = set()
+        for cy in range(int(y // size), int((y + h) // size) + 1):
+            for cx in range(int(x // size), int((x + w) // size) + 1):
+                found.update(self._cells.get((cy + CELL_OFFSET) * CELL_STRIDE + cx + CELL_OFFSET, ()))
+        hits = []
+        for i in sorted(found):
+            bx, by, bw, bh = self._boxes[i]
+            if x < bx + bw and bx < x + w and y < by + bh and by < y + h:
+                hits.append(i)
+        return hits
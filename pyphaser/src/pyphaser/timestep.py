@@ -0,0 +1,34 @@
+from pyphaser.world import DT
+
+# -------------------- Settings --------------------
+# Longest stretch of real time one frame may feed the simulation. After a
+# stall (window drag, breakpoint) the game slows down briefly instead of
+# running hundreds of catch-up steps and falling further behind.
+MAX_FRAME_TIME = 0.25
+# Timer jitter around an exact multiple of DT must not alternate 0 and 2
+# steps on a display running at the tick rate
+EPSILON = 1e-6
+
+
+class FixedStep:
+    # Accumulator scheduler. Each frame, advance(elapsed) adds the real time
+    # that passed and returns how many fixed steps of dt to simulate; the
+    # remainder carries over. alpha is how far real time has run into the
+    # next step, used to draw positions between the last two states.
+    def __init__(self, dt=DT, max_frame_time=MAX_FRAME_TIME):
+        self.dt = dt
+        self.max_frame_time = max_frame_time
+        self.accumulator = 0.0
+
+    def advance(self, elapsed):
+        self.accumulator += min(elapsed, self.max_frame_time)
+        steps = int((self.accumulator + EPSILON) // self.dt)
+        self.accumulator = max(self.accumulator - steps * self.dt, 0.0)
+        return steps
+
+    @property
+    def alpha(self):
+        return min(self.accumulator / self.dt, 1.0)
+
+    def reset(self):
+        self.accumulator = 0.0
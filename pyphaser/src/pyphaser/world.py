@@ -0,0 +1,433 @@
+import random
+
+import numpy as np
+
+from pyphaser import savestate
+from pyphaser.chunks import ACTIVE_CHUNKS, CHUNK_WIDTH, ChunkPager, chunk_count
+from pyphaser.collision import COLLECTIBLE, HAZARD, PLAYER, STATIC, Bodies, Collisions
+from pyphaser.entities import EntityStore
+from pyphaser.level import Level
+from pyphaser.profiling import NULL_PROFILER
+from pyphaser.spatial import earliest
+
+# -------------------- Settings --------------------
+# World space is screen space: origin top-left, y pointing down, units are
+# pixels and seconds. At DT = 1/60 the values match the old per-frame ones
+# (e.g. GRAVITY 1800 px/s^2 == 0.5 px/frame^2).
+WIDTH = 800
+HEIGHT = 600
+DT = 1 / 60
+GRAVITY = 1800.0
+PLAYER_SIZE = (32, 48)
+PLAYER_START = (84, 426)
+PLAYER_MOVE_SPEED = 300.0
+PLAYER_JUMP_SPEED = 900.0
+PLAYER_MAX_FALL = 600.0
+STAR_SIZE = (24, 22)
+STAR_COUNT = 12
+STAR_STEP_X = 70
+STAR_START_X = 12
+STAR_GRAVITY = 1080.0
+STAR_MAX_FALL = 360.0
+STAR_BOUNCE_MIN = 0.40
+STAR_BOUNCE_MAX = 0.80
+STAR_SCORE = 10
+BOMB_SIZE = (14, 14)
+BOMB_START_Y = 16
+BOMB_MIN_SPEED_X = 180.0
+BOMB_MAX_SPEED_X = 270.0
+BOMB_START_SPEED_Y = 120.0
+BOMB_GRAVITY = 3240.0
+BOMB_BOUNCE = 0.95
+
+# Ground + ledges as (x, y, w, h), same layout as the Phaser tutorial
+PLATFORMS = [
+    (0, 568, 800, 32),
+    (400, 384, 400, 32),
+    (-150, 234, 400, 32),
+    (550, 204, 400, 32),
+]
+
+
+class Inputs:
+    def __init__(self, left=False, right=False, up=False):
+        self.left = left
+        self.right = right
+        self.up = up
+
+
+class Body:
+    def __init__(self, x, y, w, h, vx=0.0, vy=0.0):
+        self.x = float(x)
+        self.y = float(y)
+        self.w = w
+        self.h = h
+        self.vx = vx
+        self.vy = vy
+
+    @property
+    def left(self):
+        return self.x
+
+    @property
+    def right(self):
+        return self.x + self.w
+
+    @property
+    def top(self):
+        return self.y
+
+    @property
+    def bottom(self):
+        return self.y + self.h
+
+    def overlaps(self, other):
+        return (self.x < other.x + other.w and other.x < self.x + self.w and
+                self.y < other.y + other.h and other.y < self.y + self.h)
+
+    def swept_overlaps(self, x0, y0, other):
+        # Whether the box swept from (x0, y0) to the current position
+        # overlaps other at any point of the move
+        return (min(x0, self.x) < other.x + other.w and other.x < max(x0, self.x) + self.w and
+                min(y0, self.y) < other.y + other.h and other.y < max(y0, self.y) + self.h)
+
+
+class Player(Body):
+    def __init__(self, x, y):
+        super().__init__(x, y, *PLAYER_SIZE)
+        self.on_ground = False
+        self.facing = "idle"
+        # Out of the round: hit by a bomb, or a multiplayer slot nobody has
+        # joined yet. Dead players are not simulated.
+        self.alive = True
+        self.score = 0
+        # Position before the last step, for render interpolation
+        self.prev_x = self.x
+        self.prev_y = self.y
+
+    def lerp(self, alpha):
+        return self.prev_x + (self.x - self.prev_x) * alpha, self.prev_y + (self.y - self.prev_y) * alpha
+
+
+class World:
+    def __init__(self, seed=None, platforms=PLATFORMS, level=None, players=1):
+        # Static geometry comes from a (usually cached) Level and is set up
+        # once; reset() only touches the dynamic state. With several players
+        # step() takes one Inputs per player; they share the stars and the
+        # score, and the round is over when the last one is hit.
+        if level is None:
+            level = Level.from_dict({
+                "width": WIDTH,
+                "height": HEIGHT,
+                "player_start": PLAYER_START,
+                "stars": {"start_x": STAR_START_X, "step_x": STAR_STEP_X, "count": STAR_COUNT},
+                "platforms": platforms,
+            })
+        self.seed = seed
+        self.level = level
+        self.player_count = players
+        self.width = level.width
+        self.height = level.height
+        self.platforms = [Body(*rect) for rect in level.platforms.tolist()]
+        # Platform columns (x, y, w, h) for the batched collision tests
+        self.platform_boxes = level.platforms.T
+        self.platform_grid = level.grid
+        self.profiler = NULL_PROFILER
+        self.stars = EntityStore(*STAR_SIZE)
+        self.bombs = EntityStore(*BOMB_SIZE)
+        # Who reacts to whom. The players' platform contacts are resolved
+        # axis by axis in update_player() instead, so they have no handler.
+        self.player_columns = Bodies()
+        self.collisions = Collisions("platform", self.platform_boxes, self.platform_grid)
+        self.collisions.add("player", PLAYER, COLLECTIBLE | HAZARD | STATIC, lambda: self.player_columns)
+        self.collisions.add("star", COLLECTIBLE, PLAYER | STATIC, self.stars)
+        self.collisions.add("bomb", HAZARD, PLAYER | STATIC, self.bombs)
+        self.collisions.on("star", "platform", self.land_stars)
+        self.collisions.on("bomb", "platform", self.bounce_bombs)
+        self.collisions.on("player", "star", self.collect_stars)
+        self.collisions.on("player", "bomb", self.hit_bombs)
+        # Levels wider than the active chunks around the player only
+        # simulate those; stars and bombs elsewhere wait in the pagers
+        self.chunks = chunk_count(self.width)
+        self.streaming = self.chunks > 2 * ACTIVE_CHUNKS + 1
+        self.paged_stars = ChunkPager(self.chunks, len(EntityStore.FIELDS))
+        self.paged_bombs = ChunkPager(self.chunks, len(EntityStore.FIELDS))
+        self.active_chunks = (0, self.chunks - 1)
+        # What happened in the last step, as (kind, x, y) at the spot in
+        # world space, for front-end effects: "star" collected, player "hit"
+        self.events = []
+        self.reset()
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed = seed
+        self.random = random.Random(self.seed)
+        self.players = [Player(*self.level.player_start) for _ in range(self.player_count)]
+        self.player = self.players[0]
+        # The stores (and their grown buffers) are kept across restarts
+        self.stars.clear()
+        self.bombs.clear()
+        self.paged_stars.clear()
+        self.paged_bombs.clear()
+        self.active_chunks = (0, self.chunks - 1)
+        self.score = 0
+        self.frame = 0
+        self.bombs_spawned = 0
+        self.game_over = False
+        self.events.clear()
+        self.spawn_star_batch()
+        self.stream()
+
+    def snapshot(self):
+        # The dynamic state as a compact bytes object; restore() rewinds to
+        # it, patching the existing players and stores in place
+        return savestate.save(self)
+
+    def restore(self, state):
+        savestate.load(self, state)
+
+    # -------------------- Spawning --------------------
+    def spawn_star_batch(self):
+        x = self.level.stars
+        bounce = [self.random.uniform(STAR_BOUNCE_MIN, STAR_BOUNCE_MAX) for _ in x]
+        self.stars.spawn_many(x, 0.0, bounce=bounce)
+        if self.streaming:
+            self.paged_stars.page_out(self.stars, *self.active_chunks)
+
+    def spawn_bomb(self):
+        # Opposite side of the player(s), within the simulated part of the level
+        left, right = self.active_span()
+        middle = left + (right - left) // 2
+        players = self.live_players()
+        if sum(p.x for p in players) / len(players) < middle:
+            x = self.random.randint(middle, right - BOMB_SIZE[0])
+        else:
+            x = self.random.randint(left, middle)
+        vx = self.random.uniform(BOMB_MIN_SPEED_X, BOMB_MAX_SPEED_X)
+        if self.random.random() < 0.5:
+            vx = -vx
+        self.bombs.spawn(x, BOMB_START_Y, vx, BOMB_START_SPEED_Y)
+        self.bombs_spawned += 1
+
+    def live_players(self):
+        # Players still in the round; all of them once it is over
+        return [p for p in self.players if p.alive] or self.players
+
+    # -------------------- Chunks --------------------
+    def active_span(self):
+        # World x range of the simulated chunks
+        first, last = self.active_chunks
+        return first * CHUNK_WIDTH, min((last + 1) * CHUNK_WIDTH, self.width)
+
+    def stream(self):
+        # Page chunks in and out around the players: everything within
+        # ACTIVE_CHUNKS of a player's chunk (or between players) is live, the
+        # rest is paged out
+        if not self.streaming:
+            return
+        xs = [p.x for p in self.live_players()]
+        first = max(int(min(xs) // CHUNK_WIDTH) - ACTIVE_CHUNKS, 0)
+        last = min(max(int(max(xs) // CHUNK_WIDTH), 0) + ACTIVE_CHUNKS, self.chunks - 1)
+        if (first, last) != self.active_chunks:
+            self.active_chunks = (first, last)
+            self.paged_stars.page_in(self.stars, first, last)
+            self.paged_bombs.page_in(self.bombs, first, last)
+            self.paged_stars.page_out(self.stars, first, last)
+        # Bombs bounce around and may fly out of the active chunks
+        self.paged_bombs.page_out(self.bombs, first, last)
+
+    # -------------------- Step --------------------
+    def step(self, inputs, dt=DT):
+        self.save_positions()
+        self.events.clear()
+        if self.game_over:
+            return
+        self.frame += 1
+        self.stream()
+        profiler = self.profiler
+        if isinstance(inputs, Inputs):
+            inputs = (inputs,)
+        # None for a player that sits the step out (a network client whose
+        # input has not arrived yet)
+        for player, keys in zip(self.players, inputs):
+            if player.alive and keys is not None:
+                self.update_player(player, keys, dt)
+        profiler.lap("player")
+        self.update_stars(dt)
+        profiler.lap("stars")
+        self.update_bombs(dt)
+        profiler.lap("bombs")
+
+        # Stars land and bombs bounce on platforms, then bombs off the walls
+        self.collisions.sweep_static()
+        self.bounce_off_walls()
+        profiler.lap("contacts")
+
+        # Stars collected and bomb hits of the players still in the round
+        self.player_columns = Bodies(p for p in self.players if p.alive)
+        self.collisions.overlap()
+        self.game_over = not any(p.alive for p in self.players)
+
+        # Respawn + bomb when all collected, including those paged out
+        if not self.stars.count and not self.paged_stars.count:
+            self.spawn_star_batch()
+            self.spawn_bomb()
+        profiler.lap("rules")
+
+    def save_positions(self):
+        # Start of a step: the current state becomes the one to interpolate from
+        for player in self.players:
+            player.prev_x = player.x
+            player.prev_y = player.y
+        self.stars.save_positions()
+        self.bombs.save_positions()
+
+    def update_player(self, player, inputs, dt):
+        # Only reads the static platforms, so a network client can run it on
+        # its own player to predict the server's result
+        # Input -> velocity
+        player.vx = 0.0
+        if inputs.left and not inputs.right:
+            player.vx = -PLAYER_MOVE_SPEED
+            player.facing = "left"
+        elif inputs.right and not inputs.left:
+            player.vx = PLAYER_MOVE_SPEED
+            player.facing = "right"
+        else:
+            player.facing = "idle"
+        if inputs.up and player.on_ground:
+            player.vy = -PLAYER_JUMP_SPEED
+
+        # Horizontal move, then stop at the nearest platform side in the way.
+        # Platforms are tested against the whole box swept by the move, so a
+        # fast body or a long step cannot pass through a ledge.
+        x0 = player.x
+        player.x += player.vx * dt
+        hits = [p for p in self.swept_platforms(player, x0, player.y) if player.swept_overlaps(x0, player.y, p)]
+        if hits:
+            if player.vx > 0:
+                player.x = min(p.left for p in hits) - player.w
+            elif player.vx < 0:
+                player.x = max(p.right for p in hits)
+        if player.x < 0:
+            player.x = 0.0
+        if player.right > self.width:
+            player.x = float(self.width - player.w)
+
+        # Gravity + vertical move, then land on / bump into platforms
+        player.vy = min(player.vy + GRAVITY * dt, PLAYER_MAX_FALL)
+        y0 = player.y
+        player.y += player.vy * dt
+        player.on_ground = False
+        hits = [p for p in self.swept_platforms(player, player.x, y0) if player.swept_overlaps(player.x, y0, p)]
+        if hits:
+            if player.vy > 0:  # falling: the highest top in the way
+                player.y = min(p.top for p in hits) - player.h
+                player.vy = 0.0
+                player.on_ground = True
+            elif player.vy < 0:  # jumping up: the lowest underside
+                player.y = max(p.bottom for p in hits)
+                player.vy = 0.0
+        if player.bottom > self.height:
+            player.y = float(self.height - player.h)
+            player.vy = 0.0
+            player.on_ground = True
+
+    def platforms_in(self, x, w):
+        # Indices of the platforms overlapping the world x range [x, x + w)
+        return self.platform_grid.query(x, -self.height, w, 3 * self.height)
+
+    def swept_platforms(self, body, x0, y0):
+        # Platforms overlapping the box swept from (x0, y0) to body's position
+        x = min(x0, body.x)
+        y = min(y0, body.y)
+        w = body.w + abs(body.x - x0)
+        h = body.h + abs(body.y - y0)
+        return [self.platforms[i] for i in self.platform_grid.query(x, y, w, h)]
+
+    def update_stars(self, dt):
+        stars = self.stars
+        if not stars.count:
+            return
+        np.minimum(stars.vy + STAR_GRAVITY * dt, STAR_MAX_FALL, out=stars.vy)
+        stars.y[:] += stars.vy * dt
+
+    def update_bombs(self, dt):
+        bombs = self.bombs
+        if not bombs.count:
+            return
+        bombs.vy[:] += BOMB_GRAVITY * dt
+        bombs.x[:] += bombs.vx * dt
+        bombs.y[:] += bombs.vy * dt
+
+    # -------------------- Collision handlers --------------------
+    def land_stars(self, star, platform, toi, side):
+        # Land on the first platform top each falling star reached, then bounce
+        stars = self.stars
+        py = self.platform_boxes[1]
+        down = np.isfinite(toi) & ~side & (stars.vy[star] > 0)
+        first = earliest(star[down], toi[down])
+        star = star[down][first]
+        if len(star):
+            stars.y[star] = py[platform[down][first]] - stars.h
+            stars.vy[star] *= -stars.bounce[star]
+
+    def bounce_bombs(self, bomb, platform, toi, side):
+        # Falling onto a platform top or rising into its underside, whichever
+        # face the bomb reached first; platform sides do not stop bombs
+        bombs = self.bombs
+        y, vy = bombs.y, bombs.vy
+        py = self.platform_boxes[1]
+        pb = py + self.platform_boxes[3]
+        hit = np.isfinite(toi) & ~side & (vy[bomb] != 0)
+        first = earliest(bomb[hit], toi[hit])
+        bomb = bomb[hit][first]
+        platform = platform[hit][first]
+        if len(bomb):
+            y[bomb] = np.where(vy[bomb] > 0, py[platform] - bombs.h, pb[platform])
+            vy[bomb] *= -BOMB_BOUNCE
+
+    def collect_stars(self, player, star):
+        # A star touched by several players goes to the first of them
+        star, first = np.unique(star, return_index=True)
+        bodies = self.player_columns.bodies
+        for row, count in enumerate(np.bincount(player[first]).tolist()):
+            if count:
+                points = STAR_SCORE * count
+                bodies[row].score += points
+                self.score += points
+        stars = self.stars
+        for x, y in zip((stars.x[star] + stars.w / 2).tolist(), (stars.y[star] + stars.h / 2).tolist()):
+            self.events.append(("star", x, y))
+        collected = np.zeros(stars.count, dtype=bool)
+        collected[star] = True
+        stars.remove(collected)
+
+    def hit_bombs(self, player, bomb):
+        # Out of the round; the game is over when nobody is left
+        bodies = self.player_columns.bodies
+        for row in np.unique(player).tolist():
+            body = bodies[row]
+            body.alive = False
+            body.vx = 0.0
+            body.vy = 0.0
+            body.facing = "idle"
+            self.events.append(("hit", body.x + body.w / 2, body.y + body.h / 2))
+
+    def bounce_off_walls(self):
+        bombs = self.bombs
+        if not bombs.count:
+            return
+        x, y, vx, vy = bombs.x, bombs.y, bombs.vx, bombs.vy
+        hit = (x <= 0) & (vx < 0)
+        x[hit] = 0.0
+        vx[hit] *= -1
+        hit = (x + bombs.w >= self.width) & (vx > 0)
+        x[hit] = self.width - bombs.w
+        vx[hit] *= -1
+        hit = (y <= 0) & (vy < 0)
+        y[hit] = 0.0
+        vy[hit] *= -BOMB_BOUNCE
+        hit = (y + bombs.h >= self.height) & (vy > 0)
+        y[hit] = self.height - bombs.h
+        vy[hit] *= -BOMB_BOUNCE
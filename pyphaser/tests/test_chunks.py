@@ -0,0 +1,82 @@
+import random
+
+import numpy as np
+
+from pyphaser import savestate, world
+from pyphaser.chunks import CHUNK_WIDTH, ChunkPager
+from pyphaser.entities import EntityStore
+from pyphaser.level import load
+
+
+def streamed_world():
+    # The long level with bombs spread over all of it, before any paging
+    game = world.World(seed=1, level=load("long"))
+    rng = np.random.default_rng(1)
+    count = 500
+    game.bombs.spawn_many(rng.uniform(0, game.width, count), rng.uniform(0, 300, count),
+                          rng.uniform(-200, 200, count), 120.0)
+    return game
+
+
+def everything(game):
+    # Every star and bomb row, live or paged, without the previous
+    # positions (paging in resets those); pages everything in to read it
+    rows = []
+    for store, pager in ((game.stars, game.paged_stars), (game.bombs, game.paged_bombs)):
+        pager.page_in(store, 0, game.chunks - 1)
+        rows.append(store._data[:5, :store.count].T.tolist())
+    return [sorted(map(tuple, r)) for r in rows]
+
+
+def test_pager_keeps_rows_it_pages_out():
+    store = EntityStore(10, 10)
+    store.spawn_many(np.arange(0, 10 * CHUNK_WIDTH, 100.0), 5.0, 1.0, 2.0)
+    before = sorted(map(tuple, store._data[:5, :store.count].T.tolist()))
+    pager = ChunkPager(10, len(EntityStore.FIELDS))
+    pager.page_out(store, 3, 4)
+    assert store.count == 16
+    assert pager.count == 64 and len(pager.pages) == 8
+    pager.page_in(store, 0, 9)
+    assert pager.count == 0 and not pager.pages
+    assert sorted(map(tuple, store._data[:5, :store.count].T.tolist())) == before
+
+
+def test_stream_conserves_stars_and_bombs():
+    game = streamed_world()
+    assert game.streaming
+    stars = game.stars.count + game.paged_stars.count
+    bombs = game.bombs.count + game.paged_bombs.count
+    expected = everything(streamed_world())
+    # Walk the player across the level and back, paging as it goes
+    for x in list(range(0, int(game.width), 700)) + list(range(int(game.width) - 1, 0, -1900)):
+        game.player.x = float(x)
+        game.stream()
+        first, last = game.active_chunks
+        assert first <= x // CHUNK_WIDTH <= last
+        assert game.stars.count + game.paged_stars.count == stars
+        assert game.bombs.count + game.paged_bombs.count == bombs
+        assert np.all((game.bombs.x // CHUNK_WIDTH >= first) & (game.bombs.x // CHUNK_WIDTH <= last))
+    assert everything(game) == expected
+
+
+def test_save_state_mid_stream_round_trips():
+    game = world.World(seed=1, level=load("long"))
+    # Bombs far off, paged out from the start
+    game.bombs.spawn_many(np.linspace(40 * CHUNK_WIDTH, 60 * CHUNK_WIDTH, 50), 100.0, 200.0, 120.0)
+    rng = random.Random(3)
+    game.player.x = 6.5 * CHUNK_WIDTH
+    for _ in range(120):
+        game.step(world.Inputs(right=True, up=rng.random() < 0.05))
+    assert game.active_chunks[0] > 0 and game.paged_stars.pages and game.paged_bombs.pages
+    state = savestate.save(game)
+    script = [world.Inputs(left=rng.random() < 0.3, right=rng.random() < 0.6, up=rng.random() < 0.1)
+              for _ in range(600)]
+    for inputs in script:
+        game.step(inputs)
+    assert not game.game_over
+    end = game.snapshot()
+    savestate.load(game, state)
+    assert savestate.save(game) == state
+    for inputs in script:
+        game.step(inputs)
+    assert game.snapshot() == end
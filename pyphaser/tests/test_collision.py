@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from pyphaser.collision import COLLECTIBLE, DENSE_QUERIES, HAZARD, PLAYER, STATIC, Bodies, Collisions
+from pyphaser.entities import EntityStore
+from pyphaser.spatial import UniformGrid
+from pyphaser.world import Body
+
+# Two platforms side by side; stars and bombs fall onto them, one row each
+PLATFORMS = np.array([[0, 400, 200, 16], [300, 400, 200, 16]], dtype=np.float64)
+
+
+def falling(store, x, y, dy=8.0):
+    # A row that moved down by dy this step
+    row = store.spawn(x, y)
+    store.prev_y[row] = y - dy
+    return row
+
+
+def scene(players):
+    # Star 0 lands on platform 1, bomb 1 on platform 0; player 0 stands on
+    # star 1 and player 1 on bomb 0. Extra players stand far off.
+    stars = EntityStore(24, 22)
+    bombs = EntityStore(14, 14)
+    falling(stars, 350, 400 - 22 + 3)
+    falling(stars, 600, 100)
+    falling(bombs, 700, 100)
+    falling(bombs, 50, 400 - 14 + 3)
+    bodies = [Body(590, 90, 32, 48), Body(690, 90, 32, 48)]
+    bodies += [Body(2000 + 50 * i, 0, 32, 48) for i in range(players - 2)]
+    grid = UniformGrid()
+    grid.build(*PLATFORMS.T)
+    collisions = Collisions("platform", PLATFORMS.T, grid)
+    collisions.add("player", PLAYER, COLLECTIBLE | HAZARD | STATIC, Bodies(bodies))
+    collisions.add("star", COLLECTIBLE, PLAYER | STATIC, stars)
+    collisions.add("bomb", HAZARD, PLAYER | STATIC, bombs)
+    calls = {}
+
+    def handler(kind):
+        def record(*args):
+            calls.setdefault(kind, []).append([np.asarray(arg).tolist() for arg in args])
+        return record
+
+    collisions.on("star", "platform", handler("star-platform"))
+    collisions.on("bomb", "platform", handler("bomb-platform"))
+    collisions.on("player", "star", handler("player-star"))
+    collisions.on("player", "bomb", handler("player-bomb"))
+    return collisions, calls
+
+
+def test_static_contacts_go_to_their_handlers_once_per_pass():
+    collisions, calls = scene(2)
+    for passes in (1, 2):
+        collisions.sweep_static()
+        assert sorted(calls) == ["bomb-platform", "star-platform"]
+        # Rows, platform, time of impact, side
+        star, platform, toi, side = calls["star-platform"][-1]
+        assert (star, platform, side) == ([0], [1], [False])
+        assert 0 <= toi[0] < 1
+        bomb, platform, _, side = calls["bomb-platform"][-1]
+        assert (bomb, platform, side) == ([1], [0], [False])
+        assert all(len(handled) == passes for handled in calls.values())
+
+
+@pytest.mark.parametrize("players", [2, DENSE_QUERIES + 4])
+def test_overlaps_go_to_their_handlers_once_per_pass(players):
+    collisions, calls = scene(players)
+    for passes in (1, 2):
+        collisions.overlap()
+        assert sorted(calls) == ["player-bomb", "player-star"]
+        assert calls["player-star"][-1] == [[0], [1]]
+        assert calls["player-bomb"][-1] == [[1], [0]]
+        assert all(len(handled) == passes for handled in calls.values())
+
+
+def test_handlers_without_contacts_are_not_called():
+    collisions, calls = scene(2)
+    collisions.groups["star"].source.clear()
+    collisions.groups["bomb"].source.clear()
+    collisions.sweep_static()
+    collisions.overlap()
+    assert calls == {}
+
+
+def test_pairs_that_cannot_collide_are_refused():
+    collisions, _ = scene(2)
+    with pytest.raises(ValueError):
+        collisions.on("star", "bomb", lambda a, b: None)
+    collisions.add("decoration", COLLECTIBLE, 0, EntityStore(8, 8))
+    with pytest.raises(ValueError):
+        collisions.on("decoration", "platform", lambda *args: None)
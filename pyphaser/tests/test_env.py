@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from pyphaser import env
+
+
+def rollout(workers, steps=240):
+    # Every array the vector env returns, copied per step
+    rng = np.random.default_rng(7)
+    with env.VectorEnv(5, seed=3, frame=True, max_steps=100, repeat=2, workers=workers) as venv:
+        obs, _ = venv.reset()
+        out = [(obs["state"].copy(), obs["frame"].copy())]
+        for _ in range(steps):
+            obs, reward, terminated, truncated, info = venv.step(rng.integers(0, env.ACTION_COUNT, venv.count))
+            out.append((obs["state"].copy(), obs["frame"].copy(), reward.copy(), terminated.copy(),
+                        truncated.copy(), info["score"].copy()))
+    return out
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_workers_give_the_same_results(workers):
+    single = rollout(1)
+    # Truncation at max_steps resets episodes along the way
+    assert any(step[4].any() for step in single[1:])
+    for expected, actual in zip(single, rollout(workers), strict=True):
+        for a, b in zip(expected, actual, strict=True):
+            assert np.array_equal(a, b)
+
+
+def test_episode_resets_when_terminated():
+    with env.VectorEnv(2, seed=11) as venv:
+        venv.reset()
+        venv.step(np.zeros(2, dtype=np.int64))
+        game = venv.envs.envs[0].world
+        game.bombs.spawn(game.player.x, game.player.y)
+        obs, reward, terminated, truncated, info = venv.step(np.zeros(2, dtype=np.int64))
+        assert terminated.tolist() == [True, False]
+        assert not truncated.any()
+        # The observation is already the next episode's first
+        fresh = env.Env(seed=11)
+        fresh.reset()
+        second, _ = fresh.reset()
+        assert np.array_equal(obs["state"][0], second["state"])
+        assert not game.game_over and game.frame == 0
+        obs, _, terminated, _, _ = venv.step(np.zeros(2, dtype=np.int64))
+        assert not terminated.any()
+        assert game.frame == 1
+
+
+def test_episode_is_truncated_at_max_steps():
+    with env.VectorEnv(1, seed=5, max_steps=10) as venv:
+        venv.reset()
+        flags = [venv.step(np.zeros(1, dtype=np.int64))[3][0] for _ in range(25)]
+    assert [i for i, flag in enumerate(flags) if flag] == [9, 19]
+
+
+def test_wrong_action_count_is_refused():
+    with env.VectorEnv(3) as venv:
+        venv.reset()
+        with pytest.raises(ValueError):
+            venv.step(np.zeros(2, dtype=np.int64))
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from pyphaser import assets, level
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    return assets.cache_dir("levels")
+
+
+def same_level(a, b):
+    assert (a.name, a.width, a.height, a.player_start, a.stars) == (b.name, b.width, b.height, b.player_start, b.stars)
+    assert np.array_equal(a.platforms, b.platforms)
+    assert a.grid.cell_size == b.grid.cell_size
+    for name, value in a.grid.arrays().items():
+        assert np.array_equal(value, b.grid.arrays()[name]), name
+
+
+def cached_file(cache):
+    files = list(cache.glob("long-*.bin"))
+    assert len(files) == 1
+    return files[0]
+
+
+def test_compiled_level_reads_back(cache):
+    compiled = level.load("long")
+    cached_file(cache)
+    cached = level.load("long")
+    # The second load maps the arrays straight from the cache file
+    assert not cached.platforms.flags.writeable
+    same_level(cached, compiled)
+    same_level(cached, level.load("long", use_cache=False))
+
+
+def test_stale_cache_is_ignored(cache):
+    level.load("long")
+    assert level.read_compiled(cached_file(cache), "another source") is None
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: data[:len(level.MAGIC) + 2],
+    lambda data: data[:len(level.MAGIC) + 40],
+    lambda data: data[:len(data) // 2],
+    lambda data: data[:len(level.MAGIC)] + b"\xff" * 64 + data[len(level.MAGIC) + 64:],
+    lambda data: data.replace(b'"platforms"', b'"platformz"'),
+], ids=["cut in the length", "cut in the header", "cut in the arrays", "garbled header", "missing array"])
+def test_damaged_cache_is_compiled_again(cache, damage):
+    expected = level.load("long", use_cache=False)
+    level.load("long")
+    path = cached_file(cache)
+    path.write_bytes(damage(path.read_bytes()))
+    assert level.read_compiled(path) is None
+    same_level(level.load("long"), expected)
+    # ... and the cache is written again
+    assert level.read_compiled(path) is not None
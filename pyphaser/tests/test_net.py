@@ -0,0 +1,192 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from pyphaser import net, world
+
+# Server and clients share one event loop over the loopback interface, like
+# `pyphaser-server --bots`
+TIMEOUT = 5.0
+
+
+async def start_server(**kwargs):
+    server = await net.Server.open(port=0, **kwargs)
+    return server, asyncio.create_task(server.run())
+
+
+async def stop_server(server, ticker):
+    ticker.cancel()
+    server.close()
+
+
+async def join(server, match=""):
+    # A client that has joined, or was told the server is full
+    client = net.Client(server.address[:2], match)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + TIMEOUT
+    while client.world is None and not client.full:
+        assert loop.time() < deadline, "no answer from the server"
+        client.update(world.Inputs())
+        await asyncio.sleep(0.01)
+    return client
+
+
+async def play(clients, steps, inputs=world.Inputs):
+    # Every client sends one input per world tick, paced like run_bot()
+    for _ in range(steps):
+        for client in clients:
+            client.update(inputs())
+        await asyncio.sleep(world.DT)
+
+
+def run_match(scenario, clients=2, **kwargs):
+    # scenario(server, clients) runs with the clients joined to one match
+    async def run():
+        server, ticker = await start_server(**kwargs)
+        joined = []
+        try:
+            for _ in range(clients):
+                joined.append(await join(server))
+            return await scenario(server, joined)
+        finally:
+            for client in joined:
+                client.close()
+            await stop_server(server, ticker)
+
+    return asyncio.run(run())
+
+
+def test_server_binds_localhost_by_default():
+    async def scenario():
+        server, ticker = await start_server()
+        address = server.address
+        await stop_server(server, ticker)
+        return address
+
+    assert asyncio.run(scenario())[0] == "127.0.0.1"
+
+
+def test_join_past_the_match_cap_is_refused():
+    async def scenario():
+        server, ticker = await start_server(capacity=2, max_matches=1)
+        clients = []
+        try:
+            for match in ("a", "a", "a", "b"):
+                clients.append(await join(server, match))
+            return len(server.matches), clients
+        finally:
+            for client in clients:
+                client.close()
+            await stop_server(server, ticker)
+
+    matches, (first, second, third, other) = asyncio.run(scenario())
+    assert matches == 1
+    assert first.world is not None and second.world is not None
+    assert first.match_id == second.match_id
+    # "a" is full and no other match may start, whatever its name
+    assert third.full and third.world is None
+    assert other.full and other.world is None
+
+
+def test_players_per_match_are_capped():
+    with pytest.raises(ValueError):
+        net.Server(capacity=net.MAX_MATCH_PLAYERS + 1)
+
+
+def test_clients_join_one_match():
+    async def scenario(server, clients):
+        return server, clients
+
+    server, clients = run_match(scenario, clients=3)
+    assert len(server.matches) == 1
+    assert {client.match_id for client in clients} == set(server.matches)
+    assert sorted(client.slot for client in clients) == [0, 1, 2]
+    for client in clients:
+        assert len(client.world.players) == net.MATCH_PLAYERS
+        assert client.player is client.world.players[client.slot]
+
+
+def test_snapshots_are_deltas_of_acknowledged_ones():
+    async def scenario(server, clients):
+        await play(clients, 60)
+        match = next(iter(server.matches.values()))
+        return server, match, clients
+
+    server, match, clients = run_match(scenario)
+    assert all(client.snapshots > 10 for client in clients)
+    # After the first full one, snapshots are sent against the client's ack
+    assert server.delta_snapshots > server.snapshots_sent / 2
+    # ... and decode to exactly what the server quantized
+    for client in clients:
+        for sent, received in zip(match.history[client.ack], client.baselines[client.ack]):
+            assert np.array_equal(sent, received)
+
+
+def test_delta_encoding_round_trip():
+    game = world.World(seed=1)
+    base = net.quantize(game, 1)
+    for _ in range(10):
+        game.step(world.Inputs(right=True))
+    sections = net.quantize(game, 1)
+    delta = net.encode(sections, base)
+    assert len(delta) < len(net.encode(sections))
+    for expected, decoded in zip(sections, net.decode(delta, base)):
+        assert np.array_equal(expected, decoded)
+
+
+def test_prediction_matches_the_server():
+    async def scenario(server, clients):
+        await play(clients, 90, lambda: world.Inputs(right=True))
+        return clients
+
+    for client in run_match(scenario):
+        # Replaying the unacknowledged inputs lands where the server will;
+        # only the 1/8 px quantization of the snapshot is left
+        assert client.max_correction <= 1 / net.POSITION_SCALE
+        assert client.player.x > world.PLAYER_START[0]
+
+
+def test_misprediction_is_corrected():
+    async def scenario(server, clients):
+        await play(clients, 30)
+        client = clients[0]
+        client.player.x += 50.0
+        client.max_correction = 0.0
+        await play(clients, 30)
+        match = next(iter(server.matches.values()))
+        return client, match.world.players[client.slot]
+
+    client, authority = run_match(scenario)
+    assert client.max_correction >= 49.0
+    assert abs(client.player.x - authority.x) <= 1 / net.POSITION_SCALE
+
+
+def test_input_bytes_outside_the_key_masks_are_dropped():
+    peer = net.Peer(("127.0.0.1", 1), None, 0, 0.0)
+    peer.receive(net.NO_TICK, 3, bytes([1, 200, 2]), 0.0)
+    assert not peer.inputs and peer.received == 0
+    peer.receive(net.NO_TICK, 3, bytes([1, 7, 2]), 0.0)
+    assert [peer.next_inputs() for _ in range(3)] == [net.INPUTS[i] for i in (1, 7, 2)]
+
+
+def test_long_input_gap_skips_ahead():
+    peer = net.Peer(("127.0.0.1", 1), None, 0, 0.0)
+    peer.receive(net.NO_TICK, 0xFFFFFFFF, bytes([5]), 0.0)
+    assert peer.received == 0xFFFFFFFF
+    assert len(peer.inputs) == net.INPUT_BUFFER
+    assert peer.applied == peer.received - net.INPUT_BUFFER
+    assert [peer.next_inputs() for _ in range(net.INPUT_BUFFER)][-2:] == [net.INPUTS[0], net.INPUTS[5]]
+
+
+def test_server_survives_garbage_inputs():
+    async def scenario(server, clients):
+        client = clients[0]
+        client.send(net.INPUT_HEADER.pack(net.INPUT, net.NO_TICK, client.seq + 1) + bytes([200]))
+        client.send(net.INPUT_HEADER.pack(net.INPUT, net.NO_TICK, 0xFFFFFFFF) + bytes([0]))
+        match = next(iter(server.matches.values()))
+        tick = match.tick
+        await play(clients, 30)
+        return match.tick - tick
+
+    assert run_match(scenario) > 10
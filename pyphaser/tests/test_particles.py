@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from pyphaser.particles import BURSTS, Effects, Emitter
+
+
+def columns(rows):
+    # The particles as a set: columns sorted by every field
+    return rows[:, np.lexsort(rows[::-1])]
+
+
+def expected_after(emitter, dt):
+    # The same update, then plain boolean compaction
+    rows = emitter._data[:, :emitter.count].copy()
+    rows[3] += emitter.gravity * dt
+    rows[0] += rows[2] * dt
+    rows[1] += rows[3] * dt
+    rows[4] += dt
+    return rows[:, rows[4] < rows[5]]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_update_keeps_exactly_the_live_particles(seed):
+    rng = np.random.default_rng(seed)
+    emitter = Emitter(random=rng, capacity=64, **BURSTS["hit"])
+    for frame in range(120):
+        if frame % 7 == 0:
+            emitter.burst(*rng.uniform(0, 800, 2), int(rng.integers(1, 200)))
+        dt = float(rng.uniform(0.0, 0.1))
+        expected = expected_after(emitter, dt)
+        emitter.update(dt)
+        assert emitter.count == expected.shape[1]
+        assert np.array_equal(columns(emitter._data[:, :emitter.count]), columns(expected))
+        assert np.all(emitter.age < emitter.life)
+
+
+@pytest.mark.parametrize("dead", [
+    [], [0], [9], [0, 1, 2], [7, 8, 9], [1, 3, 5, 7, 9], [0, 2, 4, 6, 8], list(range(10)),
+])
+def test_update_fills_holes_wherever_they_are(dead):
+    emitter = Emitter(random=np.random.default_rng(0), **BURSTS["star"])
+    emitter.burst(100.0, 100.0, 10)
+    emitter.life[:] = 1.0
+    emitter.life[dead] = 0.01
+    # Mark every particle by its starting row, in a field update() leaves alone
+    emitter.vx[:] = np.arange(10)
+    emitter.update(0.05)
+    assert emitter.count == 10 - len(dead)
+    assert sorted(emitter.vx.tolist()) == [i for i in range(10) if i not in dead]
+
+
+def test_effects_burst_per_event():
+    effects = Effects(seed=1)
+    effects.emit([("star", 10.0, 20.0), ("hit", 30.0, 40.0), ("unknown", 0.0, 0.0)])
+    assert effects.count == BURSTS["star"]["count"] + BURSTS["hit"]["count"]
+    for _ in range(100):
+        effects.update(1 / 60)
+    assert effects.count == 0
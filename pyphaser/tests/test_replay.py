@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from pyphaser import world
+from pyphaser.batch import chase_policy
+from pyphaser.replay import Recording, Replay
+
+SEED = 28
+STEPS = 1500
+
+
+def live_run(path):
+    # A chase bot played live and recorded; the world's state is kept at a
+    # few frames to compare seeks against
+    game = world.World(seed=SEED)
+    rng = random.Random(SEED)
+    recording = Recording(SEED)
+    states = {0: game.snapshot()}
+    while not game.game_over and len(recording) < STEPS:
+        inputs = chase_policy(game, rng)
+        recording.record(inputs)
+        game.step(inputs)
+        states[len(recording)] = game.snapshot()
+    recording.save(path)
+    return game, states
+
+
+@pytest.fixture(scope="module")
+def recorded(tmp_path_factory):
+    path = tmp_path_factory.mktemp("replay") / "session.rec"
+    game, states = live_run(path)
+    return path, game, states
+
+
+def test_recording_round_trip(recorded):
+    path, game, _ = recorded
+    recording = Recording.load(path)
+    assert recording.seed == SEED
+    assert len(recording) == game.frame
+
+
+def test_replay_ends_in_the_live_state(recorded):
+    path, game, _ = recorded
+    replayed = Replay(Recording.load(path)).run()
+    assert replayed.snapshot() == game.snapshot()
+    assert replayed.score == game.score > 0
+
+
+def test_seek_back_and_forth(recorded):
+    path, _, states = recorded
+    replay = Replay(Recording.load(path), snapshot_every=200)
+    replay.run()
+    last = max(states)
+    for frame in (last, 100, 777, 0, 450, last // 2, last):
+        assert replay.seek(frame).snapshot() == states[frame], frame
+
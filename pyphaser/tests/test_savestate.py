@@ -0,0 +1,90 @@
+import random
+
+import numpy as np
+import pytest
+
+from pyphaser import savestate, world
+from pyphaser.animation import DUDE, Animator
+from pyphaser.level import load
+
+
+def inputs(rng, players):
+    return [world.Inputs(rng.random() < 0.3, rng.random() < 0.6, rng.random() < 0.1) for _ in range(players)]
+
+
+def played(level, players=2, steps=600):
+    game = world.World(seed=5, level=load(level), players=players)
+    rng = random.Random(2)
+    for _ in range(steps):
+        game.step(inputs(rng, players))
+    return game, rng
+
+
+@pytest.mark.parametrize("level", ["default", "long"])
+def test_load_continues_where_save_left_off(level):
+    game, rng = played(level)
+    state = savestate.save(game)
+    script = [inputs(rng, 2) for _ in range(600)]
+    for step in script:
+        game.step(step)
+    end = game.snapshot()
+    player = game.players[0]
+    savestate.load(game, state)
+    # Restored in place: the same objects, back at the saved state
+    assert game.players[0] is player
+    assert savestate.save(game) == state
+    for step in script:
+        game.step(step)
+    assert game.snapshot() == end
+
+
+def test_animator_round_trip():
+    game, _ = played("default", steps=10)
+    animator = Animator(DUDE, 3)
+    animator.play(2, [1])
+    animator.update(0.37)
+    state = savestate.save(game, animator)
+    restored = Animator(DUDE, 1)
+    savestate.load(game, state, restored)
+    assert len(restored) == 3
+    for column in ("clip", "time", "frame"):
+        assert np.array_equal(getattr(restored, column), getattr(animator, column))
+
+
+def test_rewind_pops_newest_first():
+    game, rng = played("default", steps=10)
+    rewind = savestate.Rewind(steps=5)
+    states = []
+    for frame in range(8):
+        states.append(savestate.save(game))
+        rewind.push(states[-1], frame)
+        game.step(inputs(rng, 2))
+    assert len(rewind) == 5
+    for frame in reversed(range(3, 8)):
+        state, mark = rewind.pop()
+        assert mark == frame
+        savestate.load(game, state)
+        assert savestate.save(game) == states[frame]
+    assert len(rewind) == 0
+
+
+def test_truncated_state_is_refused_and_changes_nothing():
+    game, rng = played("long")
+    animator = Animator(DUDE, 2)
+    state = savestate.save(game, animator)
+    for _ in range(60):
+        game.step(inputs(rng, 2))
+    current = savestate.save(game)
+    for size in (0, 10, savestate.HEADER.size + 100, len(state) // 2, len(state) - 1):
+        with pytest.raises(ValueError):
+            savestate.load(game, state[:size], animator)
+        assert savestate.save(game) == current, size
+
+
+def test_state_of_another_world_is_refused():
+    state = savestate.save(played("default", players=1, steps=10)[0])
+    game, _ = played("default", steps=10)
+    with pytest.raises(ValueError):
+        savestate.load(game, state)
+    with pytest.raises(ValueError):
+        savestate.load(game, b"NOPE" + state[4:])
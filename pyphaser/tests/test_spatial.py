@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from pyphaser.spatial import UniformGrid, earliest, overlap_mask, sweep
+
+
+def boxes(rng, count, size):
+    # Spread over a few cells either side of the origin, some exactly on
+    # cell edges, a few zero-sized and a few spanning many cells
+    x = rng.uniform(-600, 600, count)
+    y = rng.uniform(-400, 400, count)
+    x[::7] = np.round(x[::7] / 128) * 128
+    w = rng.uniform(0, size, count)
+    h = rng.uniform(0, size / 4, count)
+    w[::11] = 0
+    w[::13] = rng.uniform(300, 900, len(w[::13]))
+    return x, y, w, h
+
+
+def brute_force(query, grid):
+    qx, qy, qw, qh = (np.asarray(column, dtype=np.float64) for column in query)
+    return np.nonzero(overlap_mask(qx[:, None], qy[:, None], np.broadcast_to(qw, qx.shape)[:, None],
+                                   np.broadcast_to(qh, qx.shape)[:, None], grid.x, grid.y, grid.w, grid.h))
+
+
+def same_pairs(grid, query):
+    expected = brute_force(query, grid)
+    actual = grid.pairs(*query)
+    for a, b in zip(actual, expected):
+        assert np.array_equal(a, b)
+
+
+@pytest.mark.parametrize("cell_size", [32, 128, 500])
+@pytest.mark.parametrize("count, queries", [(5, 20), (400, 3000), (3000, 400)])
+def test_pairs_match_brute_force(cell_size, count, queries):
+    rng = np.random.default_rng(cell_size * count)
+    grid = UniformGrid(cell_size)
+    grid.build(*boxes(rng, count, 150))
+    same_pairs(grid, boxes(rng, queries, 40))
+    # Fixed-size queries pass their size as scalars
+    x, y, _, _ = boxes(rng, queries, 40)
+    same_pairs(grid, (x, y, 14.0, 14.0))
+
+
+def test_pairs_of_tall_boxes_match_brute_force():
+    # Boxes taller than wide are sorted along x instead
+    rng = np.random.default_rng(3)
+    grid = UniformGrid(64)
+    x, y, w, h = boxes(rng, 500, 150)
+    grid.build(x, y, h, w)
+    same_pairs(grid, boxes(rng, 2000, 40))
+
+
+def test_pairs_follow_moved_boxes():
+    rng = np.random.default_rng(4)
+    grid = UniformGrid(64)
+    x, y, w, h = boxes(rng, 500, 100)
+    grid.build(x, y, w, h)
+    query = boxes(rng, 2000, 40)
+    same_pairs(grid, query)
+    # Within their cells, then across them
+    grid.update(x + 0.5, y - 0.5, w, h)
+    same_pairs(grid, query)
+    grid.update(x + 200, y, w, h)
+    same_pairs(grid, query)
+
+
+def test_pairs_of_an_adopted_grid_match_brute_force():
+    rng = np.random.default_rng(5)
+    built = UniformGrid(128)
+    built.build(*boxes(rng, 400, 150))
+    grid = UniformGrid.from_arrays(128, built.arrays())
+    same_pairs(grid, boxes(rng, 3000, 40))
+
+
+def test_touching_boxes_do_not_pair():
+    grid = UniformGrid(128)
+    grid.build(np.arange(0, 12800, 128.0), np.zeros(100), 128, 16)
+    x = np.arange(0, 12800, 64.0)
+    pairs = grid.pairs(x, np.full(len(x), 16.0), 64, 10)
+    assert all(len(column) == 0 for column in pairs)
+    query, box = grid.pairs(x, np.full(len(x), 15.0), 64, 10)
+    assert np.array_equal(box, query // 2)
+
+
+def test_query_matches_brute_force():
+    rng = np.random.default_rng(6)
+    grid = UniformGrid(128)
+    grid.build(*boxes(rng, 400, 150))
+    for x, y, w, h in zip(*boxes(rng, 200, 40)):
+        assert grid.query(x, y, w, h) == brute_force(([x], [y], [w], [h]), grid)[1].tolist()
+
+
+def test_sweep_times_of_impact():
+    # A 10 x 10 box against a 100 x 20 ledge at (0, 100)
+    ledge = (0.0, 100.0, 100.0, 20.0)
+    cases = [
+        # x, y, dx, dy -> time of impact, side
+        ((40, 60, 0, 60), (0.5, False)),  # falling onto the top
+        ((40, 200, 0, -160), (0.5, False)),  # rising into the underside
+        ((-30, 105, 40, 0), (0.5, True)),  # running into the left side
+        ((40, 60, 0, 30), (np.inf, False)),  # stops short
+        ((40, 60, 0, 500), (0.06, False)),  # far past it in one step: still caught
+        ((40, 90, 0, 5), (0.0, False)),  # resting on the top and pressing into it
+        ((40, 95, 0, 5), (np.inf, False)),  # already overlapping
+        ((150, 60, 0, 100), (np.inf, False)),  # beside it
+        ((40, 60, 0, 0), (np.inf, False)),  # not moving
+    ]
+    for (x, y, dx, dy), (expected, side) in cases:
+        toi, on_side = sweep(np.array([x], float), np.array([y], float), 10.0, 10.0, np.array([dx], float),
+                             np.array([dy], float), *ledge)
+        assert toi[0] == pytest.approx(expected), (x, y, dx, dy)
+        if np.isfinite(expected):
+            assert on_side[0] == side
+
+
+def test_earliest_picks_the_first_contact_of_each_query():
+    query = np.array([0, 0, 0, 2, 2, 5])
+    toi = np.array([0.5, 0.25, 0.25, 0.75, 0.125, 0.0])
+    assert earliest(query, toi).tolist() == [1, 4, 5]
+    assert len(earliest(query[:0], toi[:0])) == 0
@@ -0,0 +1,47 @@
+import pytest
+
+from pyphaser.timestep import MAX_FRAME_TIME, FixedStep
+from pyphaser.world import DT
+
+
+@pytest.mark.parametrize("frame_time, frames, steps", [
+    (1 / 60, 60, 60),
+    (1 / 30, 30, 60),
+    (1 / 144, 144, 60),
+    (0.1, 10, 60),
+    (0, 10, 0),
+])
+def test_steps_follow_real_time(frame_time, frames, steps):
+    stepper = FixedStep()
+    assert sum(stepper.advance(frame_time) for _ in range(frames)) == steps
+    assert stepper.accumulator < DT
+
+
+def test_frames_at_the_tick_rate_step_once_despite_jitter():
+    stepper = FixedStep()
+    jitter = [1e-7, -1e-7, 3e-7, -2e-7]
+    assert [stepper.advance(DT + jitter[i % 4]) for i in range(120)] == [1] * 120
+
+
+def test_remainder_carries_over():
+    stepper = FixedStep()
+    assert stepper.advance(DT * 0.75) == 0
+    assert stepper.alpha == pytest.approx(0.75)
+    assert stepper.advance(DT * 0.5) == 1
+    assert stepper.alpha == pytest.approx(0.25)
+    stepper.reset()
+    assert stepper.alpha == 0.0
+
+
+def test_long_stall_is_clamped():
+    stepper = FixedStep()
+    # A 3 s stall feeds only MAX_FRAME_TIME, then play goes on as before
+    assert stepper.advance(3.0) == int(MAX_FRAME_TIME / DT)
+    assert stepper.accumulator < DT
+    assert stepper.advance(DT) == 1
+
+
+def test_clamp_is_configurable():
+    stepper = FixedStep(dt=0.01, max_frame_time=0.05)
+    assert stepper.advance(1.0) == 5
+    assert stepper.advance(0.03) == 3
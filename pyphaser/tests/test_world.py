@@ -0,0 +1,90 @@
+from pyphaser import world
+
+
+def run(seed, steps):
+    game = world.World(seed=seed)
+    for frame in range(steps):
+        game.step(world.Inputs(left=(frame // 90) % 2 == 1, right=(frame // 90) % 2 == 0, up=frame % 45 == 0))
+    return game
+
+
+def test_same_seed_same_state():
+    assert run(7, 600).snapshot() == run(7, 600).snapshot()
+
+
+def test_different_seed_different_state():
+    assert run(7, 600).snapshot() != run(8, 600).snapshot()
+
+
+def test_collecting_a_star_scores():
+    game = world.World(seed=1)
+    player = game.player
+    stars = game.stars.count
+    game.stars.spawn(player.x, player.y)
+    game.step(world.Inputs())
+    assert game.score == world.STAR_SCORE
+    assert player.score == world.STAR_SCORE
+    assert game.stars.count == stars
+    assert [kind for kind, _, _ in game.events] == ["star"]
+
+
+def test_collecting_every_star_spawns_a_new_row_and_a_bomb():
+    game = world.World(seed=1)
+    game.stars.clear()
+    game.stars.spawn(game.player.x, game.player.y)
+    game.step(world.Inputs())
+    assert game.stars.count == world.STAR_COUNT
+    assert game.bombs.count == 1
+
+
+def test_bomb_hit_ends_the_round():
+    game = world.World(seed=1)
+    player = game.player
+    game.bombs.spawn(player.x, player.y)
+    game.step(world.Inputs())
+    assert game.game_over
+    assert not player.alive
+    assert [kind for kind, _, _ in game.events] == ["hit"]
+    # Nothing moves once the round is over
+    frame = game.frame
+    x = player.x
+    game.step(world.Inputs(right=True))
+    assert game.frame == frame
+    assert player.x == x
+
+
+def test_reset_starts_the_same_round_again():
+    game = run(3, 300)
+    game.reset(3)
+    assert game.snapshot() == world.World(seed=3).snapshot()
+
+
+def test_falling_player_lands_on_the_first_ledge_at_large_dt():
+    game = world.World(seed=1)
+    player = game.player
+    player.x, player.y, player.vy = 600.0, 100.0, 600.0
+    tops = [p.top for p in game.platforms if p.left < player.right and player.x < p.right and p.top > 100]
+    # Falling through several ledges in one step
+    game.step(world.Inputs(), 0.5)
+    assert player.bottom == min(tops)
+    assert player.on_ground and player.vy == 0.0
+
+
+def test_rising_player_bumps_the_first_underside_at_large_dt():
+    game = world.World(seed=1)
+    player = game.player
+    player.x, player.y, player.vy = 600.0, 500.0, -3000.0
+    undersides = [p.bottom for p in game.platforms if p.left < player.right and player.x < p.right
+                  and p.bottom <= 500]
+    game.step(world.Inputs(), 0.3)
+    assert player.y == max(undersides)
+    assert player.vy == 0.0
+
+
+def test_fast_bomb_bounces_off_the_first_ledge_at_large_dt():
+    game = world.World(seed=1)
+    game.bombs.spawn(600.0, 100.0, 0.0, 600.0)
+    tops = [p.top for p in game.platforms if p.left < 614 and 600 < p.right and p.top > 100]
+    game.step(world.Inputs(), 0.5)
+    assert game.bombs.y[0] + game.bombs.h == min(tops)
+    assert game.bombs.vy[0] < 0